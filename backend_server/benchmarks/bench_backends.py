@@ -0,0 +1,121 @@
+"""
+Compares solve time and objective of the solver backends (Gurobi, HiGHS) on
+the same monolithic instances, and suggests the HIGHS_MAX_VARS threshold
+below which "auto" can send models to HiGHS.
+
+Instances are the rolling horizon benchmark's profiles plus, with --users, a
+synthetic population (see bench_pipeline). Models beyond a size-limited
+Gurobi license show up as errors in the gurobi column.
+
+The suggested threshold is the largest model size such that HiGHS found the
+same objective (within 0.1%) no slower than --tolerance times Gurobi's
+runtime on every instance up to that size.
+
+Run from `backend_server/`:
+    python -m benchmarks.bench_backends --horizons 3 7 --users 20 --json
+"""
+import argparse
+import json
+import logging
+import time
+
+from benchmarks.bench_pipeline import synthetic_users
+from benchmarks.bench_rolling_horizon import benchmark_users, plan_objective
+from data.preprocessing import DIET_CATALOG, EXERCISE_CATALOG, select_diets, select_exercises
+from optimization.optimizer import solve_optimization, model_parameters
+from optimization.presolve import presolve_meals, max_daily_burn
+from utils.calculations import compute_user_metrics
+
+BACKENDS = ("gurobi", "highs")
+
+
+def model_size(user: dict) -> int:
+    """Variables of the user's presolved monolithic model."""
+    params = model_parameters(user, compute_user_metrics(user))
+    diets = DIET_CATALOG.view(select_diets(user))
+    exercises = EXERCISE_CATALOG.view(select_exercises(user))
+    rows, _ = presolve_meals(diets, params, max_daily_burn(exercises['calories_burned_per_min'], params["FT_day"]))
+    return (len(rows) + 2 * len(exercises) + 1) * params["T"] + 1
+
+
+def run(user: dict, backend: str, metrics: dict, time_limit: float) -> dict:
+    start = time.perf_counter()
+    try:
+        result = solve_optimization(user, use_cache=False, mode="monolithic", backend=backend,
+                                    solver_params={"TimeLimit": time_limit})
+    except Exception as e:  # e.g. a size-limited Gurobi license
+        return {"error": str(e)}
+    return {
+        "status": result.status,
+        "runtime_s": round(time.perf_counter() - start, 3),
+        "objective": round(plan_objective(result, metrics), 2) if result.plan else None,
+    }
+
+
+def highs_matches(row: dict, tolerance: float) -> bool:
+    """HiGHS reached Gurobi's status and objective within `tolerance` x its runtime."""
+    gurobi, highs = row["gurobi"], row["highs"]
+    if "error" in gurobi:
+        return "error" not in highs
+    if "error" in highs or highs["status"] != gurobi["status"]:
+        return False
+    if gurobi["objective"] is not None and (
+            highs["objective"] is None
+            or highs["objective"] > gurobi["objective"] * 1.001 + 1e-6):
+        return False
+    return highs["runtime_s"] <= tolerance * max(gurobi["runtime_s"], 0.05)
+
+
+def suggest_threshold(rows, tolerance: float) -> int:
+    """Largest model size up to which HiGHS matched Gurobi on every instance."""
+    threshold = 0
+    for row in sorted(rows, key=lambda r: r["vars"]):
+        if not highs_matches(row, tolerance):
+            break
+        threshold = row["vars"]
+    return threshold
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--horizons", type=int, nargs="+", default=[3, 7])
+    parser.add_argument("--users", type=int, default=0, help="Synthetic users to add to the profiles")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--time-limit", type=float, default=120)
+    parser.add_argument("--tolerance", type=float, default=2.0)
+    parser.add_argument("--json", action="store_true", help="Emit results as JSON lines")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    users = list(benchmark_users(args.horizons)) + synthetic_users(args.users, args.seed, args.horizons)
+    rows = []
+    for user in users:
+        metrics = compute_user_metrics(user)
+        row = {
+            "goal": user["goalType"],
+            "diet": user["dietRestrictions"],
+            "variety": user["varietyPreferences"],
+            "T": metrics["days_to_target"],
+            "vars": model_size(user),
+        }
+        for backend in BACKENDS:
+            row[backend] = run(user, backend, metrics, args.time_limit)
+        gurobi, highs = row["gurobi"].get("runtime_s"), row["highs"].get("runtime_s")
+        row["highs_slowdown"] = round(highs / max(gurobi, 1e-3), 2) if gurobi and highs else None
+        rows.append(row)
+        if args.json:
+            print(json.dumps(row))
+        else:
+            print(f"{row['goal']:<11} {row['diet']}/{row['variety']} T={row['T']:>3} vars={row['vars']:>7} "
+                  f"gurobi={row['gurobi']} highs={row['highs']} slowdown={row['highs_slowdown']}")
+
+    summary = {
+        "instances": len(rows),
+        "highs_matched": sum(highs_matches(r, args.tolerance) for r in rows),
+        "suggested_HIGHS_MAX_VARS": suggest_threshold(rows, args.tolerance),
+    }
+    print(json.dumps(summary) if args.json else f"Summary: {summary}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Measures server startup and per-worker memory with the CSV catalogs versus
+the memory-mapped binary catalogs (CATALOG_FORMAT=csv / auto).
+
+For each format, --workers fresh processes start at the same time, like
+uvicorn workers. Each one imports `data.preprocessing` (the catalogs) and
+then `main` (the whole app), waits until every worker has loaded, and reports:
+    catalog_s / app_s   import time of the catalogs / of the app
+    rss_mb              resident memory
+    pss_mb              proportional set size: shared pages (e.g. the mapped
+                        catalog columns) are split between the processes
+    private_mb          memory no other process shares
+Memory is read from /proc/self/smaps_rollup (Linux only). Run the export
+first (`python -m data.export_catalog`), otherwise "auto" falls back to the CSV.
+
+Run from `backend_server/`:
+    python -m benchmarks.bench_catalog_load --workers 4 --json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+WORKER = r"""
+import json, sys, time
+start = time.perf_counter()
+import data.preprocessing
+catalog_s = time.perf_counter() - start
+import main
+app_s = time.perf_counter() - start
+print("ready", flush=True)
+sys.stdin.readline()
+memory = {}
+with open("/proc/self/smaps_rollup") as f:
+    for line in f:
+        key, _, value = line.partition(":")
+        if value.strip().endswith("kB"):
+            memory[key] = int(value.split()[0]) / 1024
+print(json.dumps({
+    "catalog_s": round(catalog_s, 4),
+    "app_s": round(app_s, 4),
+    "pandas_imported": "pandas" in sys.modules,
+    "rss_mb": round(memory["Rss"], 1),
+    "pss_mb": round(memory["Pss"], 1),
+    "private_mb": round(memory["Private_Clean"] + memory["Private_Dirty"], 1),
+}), flush=True)
+"""
+
+FORMATS = {"csv": "csv", "binary": "auto"}
+
+
+def start_workers(catalog_format: str, n: int):
+    """Launches `n` workers with CATALOG_FORMAT=catalog_format and returns their reports."""
+    env = dict(os.environ, CATALOG_FORMAT=catalog_format)
+    workers = [subprocess.Popen([sys.executable, "-c", WORKER], env=env, text=True,
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+               for _ in range(n)]
+    for worker in workers:
+        if worker.stdout.readline().strip() != "ready":
+            raise RuntimeError("A worker failed to start")
+    reports = []
+    for worker in workers:
+        worker.stdin.write("\n")
+        worker.stdin.flush()
+        reports.append(json.loads(worker.stdout.readline()))
+        worker.wait()
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--json", action="store_true", help="Emit results as JSON lines")
+    args = parser.parse_args()
+
+    for name, catalog_format in FORMATS.items():
+        reports = start_workers(catalog_format, args.workers)
+        row = {"format": name, "workers": args.workers,
+               "pandas_imported": any(r["pandas_imported"] for r in reports)}
+        for key in ("catalog_s", "app_s", "rss_mb", "pss_mb", "private_mb"):
+            row[key] = round(statistics.median(r[key] for r in reports), 4)
+        row["total_pss_mb"] = round(sum(r["pss_mb"] for r in reports), 1)
+        print(json.dumps(row) if args.json else "  ".join(f"{k}={v}" for k, v in row.items()))
+
+
+if __name__ == "__main__":
+    main()
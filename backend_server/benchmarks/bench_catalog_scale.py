@@ -0,0 +1,86 @@
+"""
+Measures the memory a worker needs for a diet catalog scaled far beyond the
+shipped one, loaded lazily (memory-mapped, names decoded on access) versus
+eagerly (CatalogStore.load(mmap=False)).
+
+The shipped diet CSV is repeated --scale times (recipe names numbered per
+copy) and exported with CatalogWriter in --chunksize rows, which also reports
+the export's peak memory. Then, for each load mode, a fresh process loads
+the catalog, selects the rows of a few users' filters and gathers the
+columns the optimizer reads for them, and reports:
+    load_s / request_s   time to load / to select and gather
+    rss_mb               resident memory after the requests
+    rows                 rows the requests selected
+
+Run from `backend_server/`:
+    python -m benchmarks.bench_catalog_scale --scale 100 --json
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from data.preprocessing import DIETS_CSV, export_catalog
+
+WORKER = r"""
+import json, sys, time
+import numpy as np
+from data.catalog import CatalogStore
+from data.preprocessing import diet_filters
+start = time.perf_counter()
+store = CatalogStore.load(sys.argv[1], mmap=sys.argv[2] == "lazy")
+load_s = time.perf_counter() - start
+start = time.perf_counter()
+rows = 0
+for diet, cuisines in (("dash", ["indian", "middle eastern"]), ("keto", ["japanese"]), ("vegan", ["american"])):
+    view = store.view(store.select(diet_filters({"dietRestrictions": [diet], "varietyPreferences": cuisines})))
+    for name in ("recipe", "calories", "fat", "carbs", "protein", "total_time_in_minutes"):
+        view[name]
+    rows += len(view)
+request_s = time.perf_counter() - start
+with open("/proc/self/status") as f:
+    rss = next(int(line.split()[1]) for line in f if line.startswith("VmRSS")) / 1024
+print(json.dumps({"load_s": round(load_s, 3), "request_s": round(request_s, 3), "rss_mb": round(rss, 1), "rows": rows}))
+"""
+
+
+def write_scaled_csv(path: str, scale: int) -> int:
+    base = pd.read_csv(DIETS_CSV)
+    for i in range(scale):
+        copy = base.assign(recipe=base["recipe"].astype(str) + f" #{i}")
+        copy.to_csv(path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+    return len(base) * scale
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=100)
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--json", action="store_true", help="Emit results as JSON lines")
+    args = parser.parse_args()
+
+    def emit(row):
+        print(json.dumps(row) if args.json else "  ".join(f"{k}={v}" for k, v in row.items()))
+
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = os.path.join(directory, DIETS_CSV.name)
+        rows = write_scaled_csv(csv_path, args.scale)
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        start = time.perf_counter()
+        export_catalog("diets", csv_path, directory, chunksize=args.chunksize)
+        emit({"stage": "export", "catalog_rows": rows, "export_s": round(time.perf_counter() - start, 3),
+              "peak_rss_mb": round(max(before, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024), 1)})
+        for mode in ("lazy", "eager"):
+            report = subprocess.run([sys.executable, "-c", WORKER, os.path.join(directory, "diets"), mode],
+                                    capture_output=True, text=True, check=True).stdout
+            emit({"stage": "load", "mode": mode, "catalog_rows": rows, **json.loads(report)})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Times the macro-space index (data.macro_index) against scanning the user's
+filtered catalog view, for the lookups it serves:
+    band_count   meals whose macro shares fit a goal's bands (diagnose_model)
+    range        meals inside a calorie / fat share / prep time box
+    nearest      the 5 meals closest to a recipe (the /optimize/swap lookup)
+Each is repeated --repeat times over a few users' filters, reporting the
+mean time per lookup in microseconds and the index build time. The diet
+catalog can be scaled --scale times (copies with numbered recipe names) to
+see how the gap grows.
+
+Run from `backend_server/`:
+    python -m benchmarks.bench_macro_index --scale 1 10 --json
+"""
+import argparse
+import json
+import logging
+import time
+
+import numpy as np
+
+from data.catalog import CatalogStore
+from data.macro_index import FEATURES, FEATURE_SCALE, MacroIndex
+from data.preprocessing import DIET_CATALOG, catalog_frame, diet_filters, with_derived_columns
+from optimization.matrix_builder import macro_bands
+
+USERS = [
+    {"dietRestrictions": ["vegan"], "varietyPreferences": ["american"]},
+    {"dietRestrictions": ["dash", "keto"], "varietyPreferences": ["none"]},
+    {"dietRestrictions": ["none"], "varietyPreferences": ["none"]},
+]
+BOX = {"calories": (450, 500), "fat_pct": (0.25, 0.30), "total_time_in_minutes": (0, 20)}
+
+
+def scaled_store(scale: int) -> CatalogStore:
+    if scale == 1:
+        return DIET_CATALOG
+    import pandas as pd
+
+    base = catalog_frame("diets")
+    df = pd.concat([base.assign(recipe=base["recipe"].astype(str) + f" #{i}") for i in range(scale)],
+                   ignore_index=True)
+    return CatalogStore.from_frame(with_derived_columns("diets", df), categorical=["diet_type", "cuisine_type"])
+
+
+def scan_band_count(view, bands) -> int:
+    shares = np.column_stack([view['fat_pct'], view['carb_pct'], view['protein_pct']])
+    return int(np.count_nonzero(np.all((shares >= bands[:, 0]) & (shares <= bands[:, 1]), axis=1)))
+
+
+def scan_range(view) -> np.ndarray:
+    inside = np.ones(len(view), dtype=bool)
+    for name, (low, high) in BOX.items():
+        values = view[name]
+        inside &= (values >= low) & (values <= high)
+    return view.rows[inside]
+
+
+def scan_nearest(view, point: np.ndarray, k: int) -> np.ndarray:
+    values = np.column_stack([view[name] for name in FEATURES]) / FEATURE_SCALE
+    distance = np.linalg.norm(values - point / FEATURE_SCALE, axis=1)
+    distance[np.isnan(distance)] = np.inf
+    return view.rows[np.argsort(distance, kind="stable")[:k]]
+
+
+def timed(func, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 10])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--json", action="store_true", help="Emit results as JSON lines")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    def emit(row):
+        print(json.dumps(row) if args.json else "  ".join(f"{k}={v}" for k, v in row.items()))
+
+    bands = np.array(macro_bands("weight loss"))
+    band_box = dict(zip(("fat_pct", "carb_pct", "protein_pct"), map(tuple, bands)))
+    for scale in args.scale:
+        store = scaled_store(scale)
+        start = time.perf_counter()
+        index = MacroIndex(store)
+        emit({"scale": scale, "catalog_rows": len(index), "build_ms": round((time.perf_counter() - start) * 1e3, 2)})
+        for user in USERS:
+            view = store.view(store.select(diet_filters(user)))
+            row = int(view.rows[np.isfinite(np.column_stack([view[n] for n in FEATURES])).all(axis=1)][0])
+            point = index.features(row)
+            vector = np.array([point[name] for name in FEATURES])
+            assert index.count(band_box, view.rows) == scan_band_count(view, bands)
+            assert np.array_equal(index.within(BOX, view.rows), scan_range(view))
+            lookups = {
+                "band_count": (lambda: index.count(band_box, view.rows), lambda: scan_band_count(view, bands)),
+                "range": (lambda: index.within(BOX, view.rows), lambda: scan_range(view)),
+                "nearest": (lambda: index.nearest(point, 5, view.rows), lambda: scan_nearest(view, vector, 5)),
+            }
+            for lookup, (indexed, scan) in lookups.items():
+                emit({"scale": scale, "user": "+".join(user["dietRestrictions"]), "rows": len(view),
+                      "lookup": lookup, "index_us": round(timed(indexed, args.repeat), 1),
+                      "scan_us": round(timed(scan, args.repeat), 1)})
+
+
+if __name__ == "__main__":
+    main()
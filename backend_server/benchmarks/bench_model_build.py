@@ -0,0 +1,199 @@
+"""
+Compares model build time of the reference loop builder against the matrix
+builder as the planning horizon T and the catalog size grow.
+
+Run from `backend_server/`:
+    python -m benchmarks.bench_model_build --sizes 250 1000 4000 --horizons 7 30 60
+"""
+import argparse
+import json
+import time
+from collections import Counter
+import numpy as np
+import pandas as pd
+from gurobipy import GRB
+
+from data.preprocessing import catalog_frame
+from optimization.optimizer import build_model, model_parameters, max_exercise_time
+from optimization.matrix_builder import build_model_matrix, matrix_problem
+
+SAMPLE_USER = {
+    "goalType": "weight_loss",
+    "freeTime": 3,
+    "mealPrepTime": 15,
+    "mealsPerDay": 3,
+    "daysWeek": 3,
+}
+# The equivalence check's user: longer meal prep, so its instances are feasible.
+EQUIVALENCE_USER = dict(SAMPLE_USER, mealPrepTime=30)
+
+
+def sample_catalog(n_meals: int, seed: int = 0):
+    """Samples (with replacement past the catalog size) n_meals recipes."""
+    diets = catalog_frame("diets")
+    return diets.sample(n=n_meals, replace=n_meals > len(diets),
+                        random_state=seed).reset_index(drop=True)
+
+
+def _inputs(diets, exercises, T: int, target: float = 1800.0, user: dict = SAMPLE_USER):
+    metrics = {"days_to_target": T, "target_calorie_per_day": target}
+    params = model_parameters(user, metrics)
+    arrays = {
+        "cal": diets["calories"].to_numpy(dtype=float),
+        "fat": diets["fat"].to_numpy(dtype=float),
+        "carb": diets["carbs"].to_numpy(dtype=float),
+        "protein": diets["protein"].to_numpy(dtype=float),
+        "prep_time": diets["total_time_in_minutes"].to_numpy(dtype=float),
+        "burn_rate": exercises["calories_burned_per_min"].to_numpy(dtype=float),
+        "max_time": np.array([max_exercise_time(a) for a in exercises["activity_type"]], dtype=float),
+    }
+    return params, arrays
+
+
+def _build(builder: str, params: dict, arrays: dict):
+    if builder == "matrix":
+        model = build_model_matrix(params=params, **arrays)[0]
+    else:
+        meals_idx = list(range(len(arrays["cal"])))
+        ex_idx = list(range(len(arrays["burn_rate"])))
+        as_dict = {k: dict(enumerate(v)) for k, v in arrays.items()}
+        model = build_model(meals_idx, ex_idx, as_dict["cal"], as_dict["fat"], as_dict["carb"],
+                            as_dict["protein"], as_dict["prep_time"], as_dict["burn_rate"],
+                            as_dict["max_time"], params)[0]
+    model.update()
+    return model
+
+
+def time_build(builder: str, params: dict, arrays: dict) -> dict:
+    start = time.perf_counter()
+    model = _build(builder, params, arrays)
+    elapsed = time.perf_counter() - start
+    result = {"build_s": round(elapsed, 4), "vars": model.NumVars,
+              "constrs": model.NumConstrs, "nonzeros": model.NumNZs}
+    model.dispose()
+    return result
+
+
+def same_structure(loop_model, matrix_model) -> bool:
+    """True when both models have identical constraint matrices, senses and right-hand sides."""
+    A, B = loop_model.getA(), matrix_model.getA()
+    return (A.shape == B.shape and (A != B).nnz == 0
+            and loop_model.getAttr("Sense") == matrix_model.getAttr("Sense")
+            and loop_model.getAttr("RHS") == matrix_model.getAttr("RHS")
+            and loop_model.getAttr("VType") == matrix_model.getAttr("VType"))
+
+
+def row_families(model, arrays: dict) -> Counter:
+    """
+    Rows per constraint family of a built model, told apart by the variable
+    blocks each row touches and, for meal rows, by which per-meal array its
+    coefficients are. Independent of how the builder labels its rows.
+    """
+    A = model.getA().tocsr()
+    names = model.getAttr("VarName")
+    blocks = np.array([name.split("[")[0] for name in names])
+    items = np.array([int(name.split("[")[1].split(",")[0]) if "," in name else -1 for name in names])
+    meal_coefs = {
+        "meals": np.ones(len(arrays["cal"])),
+        "prep_time": arrays["prep_time"],
+        "fat": arrays["fat"] * 9,
+        "carbs": arrays["carb"] * 4,
+        "protein": arrays["protein"] * 4,
+    }
+    families = Counter()
+    for r in range(A.shape[0]):
+        cols, coefs = A.indices[A.indptr[r]:A.indptr[r + 1]], A.data[A.indptr[r]:A.indptr[r + 1]]
+        touched = set(blocks[cols])
+        x = blocks[cols] == "x"
+        if "Z" in touched:
+            family = "objective"
+        elif touched == {"x", "t"}:
+            family = "calories" if np.allclose(coefs[x], arrays["cal"][items[cols[x]]]) else "free_time"
+        elif touched == {"x"}:
+            family = "meal_repeats" if len(cols) == 2 and len(set(items[cols])) == 1 else next(
+                (name for name, ref in meal_coefs.items() if np.allclose(coefs, ref[items[cols]])), "unknown")
+        else:
+            family = {frozenset({"y", "s"}): "workout_link", frozenset({"y", "t"}): "duration",
+                      frozenset({"y"}): "exercise_repeats", frozenset({"s"}): "workout_frequency"}.get(
+                frozenset(touched), "unknown")
+        families[family] += 1
+    return families
+
+
+def check_equivalence(n_meals: int = 40, n_ex: int = 5, T: int = 7, target: float = 1500.0,
+                      gap_kcal: float = 25.0) -> dict:
+    """
+    Builds and solves one feasible instance per goal with both builders and
+    asserts they agree: same status, objectives within `gap_kcal` (the
+    absolute MIP gap both solve to) and the same rows per constraint family,
+    which must also match the matrix builder's own labels. The meals mix
+    protein-heavy, carb-heavy and random quick recipes so every goal's macro
+    bands can be met at `target` kcal a day.
+    """
+    diets = catalog_frame("diets")
+    quick = diets[diets["total_time_in_minutes"] <= EQUIVALENCE_USER["mealPrepTime"]]
+    share = lambda col, kcal: quick[col] * kcal / quick["calories"]
+    diets = pd.concat([
+        quick[share("protein", 4) >= 0.35].sample(n=3 * n_meals // 8, random_state=1),
+        quick[share("carbs", 4) >= 0.6].sample(n=3 * n_meals // 8, random_state=1),
+        quick.sample(n=n_meals - 2 * (3 * n_meals // 8), random_state=1),
+    ]).reset_index(drop=True)
+    exercises = catalog_frame("exercises").head(n_ex).reset_index(drop=True)
+    summary = {}
+    for goal in ("weight_loss", "weight_gain", "endurance"):
+        params, arrays = _inputs(diets, exercises, T, target, EQUIVALENCE_USER)
+        params["goal"] = goal.replace("_", " ")
+        arrays = {k: np.nan_to_num(v) for k, v in arrays.items()}
+        models = {builder: _build(builder, params, arrays) for builder in ("loop", "matrix")}
+        for model in models.values():
+            model.Params.OutputFlag = 0
+            model.Params.MIPGapAbs = gap_kcal
+            model.optimize()
+        status = [m.status for m in models.values()]
+        objective = [m.ObjVal if m.SolCount else None for m in models.values()]
+        families = [row_families(m, arrays) for m in models.values()]
+        labels = Counter(matrix_problem(params=params, **arrays).families.tolist())
+        assert status[0] == status[1] == GRB.OPTIMAL, f"{goal}: statuses {status}, expected both optimal"
+        assert abs(objective[0] - objective[1]) <= gap_kcal, f"{goal}: objectives {objective} differ"
+        assert families[0] == families[1] == labels, f"{goal}: rows per family {families} vs {labels}"
+        summary[goal] = {
+            "same_structure": same_structure(models["loop"], models["matrix"]),
+            "status": status,
+            "objective": [round(v, 3) for v in objective],
+            "rows_per_family": dict(families[0]),
+        }
+        for model in models.values():
+            model.dispose()
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[250, 1000, 4000])
+    parser.add_argument("--horizons", type=int, nargs="+", default=[7, 30, 60])
+    parser.add_argument("--json", action="store_true", help="Emit results as JSON lines")
+    args = parser.parse_args()
+
+    print(json.dumps({"equivalence": check_equivalence()}) if args.json
+          else f"Equivalence check: {check_equivalence()}")
+
+    exercises = catalog_frame("exercises")
+    for n_meals in args.sizes:
+        diets = sample_catalog(n_meals)
+        for T in args.horizons:
+            params, arrays = _inputs(diets, exercises, T)
+            row = {"meals": n_meals, "T": T}
+            for builder in ("loop", "matrix"):
+                row[builder] = time_build(builder, params, arrays)
+            row["speedup"] = round(row["loop"]["build_s"] / max(row["matrix"]["build_s"], 1e-9), 1)
+            if args.json:
+                print(json.dumps(row))
+            else:
+                print(f"meals={n_meals:>6} T={T:>4} vars={row['matrix']['vars']:>9} "
+                      f"constrs={row['matrix']['constrs']:>9} "
+                      f"loop={row['loop']['build_s']:>8.3f}s matrix={row['matrix']['build_s']:>8.3f}s "
+                      f"speedup={row['speedup']}x")
+
+
+if __name__ == "__main__":
+    main()
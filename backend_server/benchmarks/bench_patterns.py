@@ -0,0 +1,61 @@
+"""
+Compares the "patterns" solver mode with and without the precomputed
+day-pattern libraries (see optimization.pattern_library).
+
+Export the libraries of the benchmark profiles first, e.g.
+    python -m optimization.export_patterns --out /tmp/patterns
+then, for every profile and horizon:
+    search_s / search_obj    patterns found per request (enumeration or pricing MIPs)
+    library_s / library_obj  patterns loaded from --patterns
+
+Run from `backend_server/`:
+    python -m benchmarks.bench_patterns --patterns /tmp/patterns --horizons 7 14 --json
+"""
+import argparse
+import json
+import logging
+import time
+from pathlib import Path
+
+from benchmarks.bench_rolling_horizon import benchmark_users, plan_objective
+from optimization import optimizer
+from optimization.optimizer import solve_optimization
+from optimization.pattern_library import PATTERN_DIR, PatternLibraries
+from utils.calculations import compute_user_metrics
+
+
+def run(user: dict, libraries: PatternLibraries, metrics: dict, time_limit: float) -> tuple:
+    optimizer.LIBRARIES = libraries
+    start = time.perf_counter()
+    result = solve_optimization(dict(user, solverMode="patterns"), use_cache=False,
+                                solver_params={"TimeLimit": time_limit})
+    objective = round(plan_objective(result, metrics), 2) if result.plan else None
+    return result.status, round(time.perf_counter() - start, 3), objective
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patterns", type=Path, default=PATTERN_DIR, help="Directory of the exported libraries")
+    parser.add_argument("--horizons", type=int, nargs="+", default=[7, 14])
+    parser.add_argument("--time-limit", type=float, default=60)
+    parser.add_argument("--json", action="store_true", help="Emit results as JSON lines")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    search, library = PatternLibraries(Path("/nonexistent")), PatternLibraries(args.patterns)
+    if not library.names:
+        parser.error(f"No current pattern libraries in {args.patterns}")
+    for user in benchmark_users(args.horizons):
+        metrics = compute_user_metrics(user)
+        row = {"diet": user["dietRestrictions"], "variety": user["varietyPreferences"],
+               "T": metrics["days_to_target"]}
+        try:
+            row["search_status"], row["search_s"], row["search_obj"] = run(user, search, metrics, args.time_limit)
+            row["library_status"], row["library_s"], row["library_obj"] = run(user, library, metrics, args.time_limit)
+        except Exception as e:  # e.g. a size-limited Gurobi license
+            row["error"] = str(e)
+        print(json.dumps(row) if args.json else "  ".join(f"{k}={v}" for k, v in row.items()))
+
+
+if __name__ == "__main__":
+    main()
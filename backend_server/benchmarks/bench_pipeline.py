@@ -0,0 +1,322 @@
+"""
+Times every stage of the optimization pipeline on a synthetic population of
+users and reports model size, MIP gap and peak memory per user.
+
+Stages (timed separately, in seconds):
+    filter     catalog selection for the user's diet and workout preferences
+    metrics    BMR/TDEE/target metrics and the model parameters
+    presolve   meal reductions of optimization.presolve
+    warm_start greedy start of optimization.warm_start
+    build      vectorized model construction
+    solve      Gurobi, or the stand-in solver (see below)
+    output     conversion of the solution into an OptimizationResult
+
+Solvers:
+    gurobi   always solve with Gurobi (size-limited licenses fail on big models)
+    greedy   the warm start heuristic's plan, no MIP solve; runs anywhere. It
+             cannot prove infeasibility: `incomplete_days` counts the days
+             it could not fill with M meals
+    auto     Gurobi, falling back to the greedy stand-in when the model has more
+             than --max-size variables or constraints, or Gurobi rejects it as
+             too large for the license
+
+Every row is one JSON object (with --json, or in the --out file); the first
+row describes the run (commit, versions, arguments) so results of different
+commits can be compared with any JSON lines tool.
+
+Run from `backend_server/`:
+    python -m benchmarks.bench_pipeline --users 50 --seed 1 --solver auto --max-size 2000 --out bench.jsonl
+"""
+import argparse
+import json
+import logging
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import gurobipy
+from gurobipy import GurobiError
+
+from data.preprocessing import (DIET_CATALOG, EXERCISE_CATALOG, catalog_frame,
+                                select_diets, select_exercises)
+from models.input_schema import UserData
+from models.output_schema import OptimizationResult
+from optimization.matrix_builder import build_model_matrix
+from optimization.optimizer import (generate_optimization_output, model_parameters,
+                                    max_exercise_time, plan_from_solution)
+from optimization.presolve import presolve_meals, max_daily_burn
+from optimization.warm_start import warm_start, apply_start
+from utils.calculations import compute_user_metrics
+
+GOALS = ("weight_loss", "weight_gain", "endurance")
+ACTIVITY_LEVELS = ("Sedentary", "Lightly Active", "Moderately Active", "Very Active", "Extra Active")
+FITNESS_LEVELS = ("beginner", "intermediate", "advanced")
+DIET_TYPES = sorted(catalog_frame("diets")["diet_type"].dropna().str.lower().unique())
+CUISINES = sorted(catalog_frame("diets")["cuisine_type"].dropna().str.lower().unique())
+LOCATIONS = sorted(catalog_frame("exercises")["workout_location"].dropna().str.lower().unique())
+WORKOUT_TYPES = sorted(catalog_frame("exercises")["activity_type"].dropna().str.lower().unique())
+STAGES = ("filter", "metrics", "presolve", "warm_start", "build", "solve", "output")
+# Gurobi's error code for models beyond a size-limited license
+SIZE_LIMIT_ERROR = 10010
+
+
+#####################################################
+# Synthetic Population
+#####################################################
+def synthetic_user(rng: random.Random, horizons=None) -> dict:
+    """
+    One plausible user: the goal weight moves 0.1-1 kg/week in the goal's
+    direction, and about a quarter of users have no diet, cuisine or workout
+    preference. Validated against the API's UserData schema.
+    """
+    goal = rng.choice(GOALS)
+    T = rng.choice(horizons) if horizons else rng.randint(7, 120)
+    weight = rng.randint(45, 120)
+    change = round(rng.uniform(0.1, 1.0) * T / 7)
+    goal_weight = {"weight_loss": weight - change, "weight_gain": weight + change}.get(goal, weight)
+
+    def maybe(values, k_max):
+        return ["none"] if rng.random() < 0.25 else rng.sample(values, rng.randint(1, k_max))
+
+    user = {
+        "name": "bench",
+        "age": rng.randint(18, 70),
+        "gender": rng.choice(("male", "female", "other")),
+        "height": rng.randint(150, 200),
+        "weight": weight,
+        "activityLevel": rng.choice(ACTIVITY_LEVELS),
+        "freeTime": rng.randint(1, 4),
+        "daysWeek": rng.randint(1, 7),
+        "goalType": goal,
+        "goalWeight": max(goal_weight, 1),
+        "goalTargetDate": (datetime.now(timezone.utc) + timedelta(days=T, hours=-1)).isoformat(),
+        "fitnessLevel": rng.choice(FITNESS_LEVELS + ("none",)),
+        "preferredLocation": rng.choice(LOCATIONS + ["none"]),
+        "preferredWorkoutType": rng.choice(WORKOUT_TYPES + ["none"]),
+        "dietRestrictions": maybe(DIET_TYPES, 1),
+        "mealPrepTime": rng.choice((15, 30, 45, 60, 90, 120)),
+        "mealsPerDay": rng.randint(2, 5),
+        "varietyPreferences": maybe(CUISINES, 3),
+    }
+    return UserData(**user).model_dump()
+
+
+def synthetic_users(n: int, seed: int = 0, horizons=None):
+    rng = random.Random(seed)
+    return [synthetic_user(rng, horizons) for _ in range(n)]
+
+
+#####################################################
+# Stand-in Solver
+#####################################################
+def greedy_solution(start: dict, arrays: dict, params: dict):
+    """
+    Solution values of the warm start heuristic: its meals and exercises, each
+    workout lasting as long as the exercise allows within the day's free time
+    left after meal prep. Returns (x, t) as (items, T) arrays.
+    """
+    prep = np.nan_to_num(np.asarray(arrays["prep_time"], dtype=float)) @ start["x"]
+    left = np.maximum(params["FT_day"] - prep, 0.0)
+    t = start["y"] * np.minimum(arrays["max_time"][:, None], left[None, :])
+    return start["x"], t
+
+
+#####################################################
+# Pipeline Run
+#####################################################
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far (ru_maxrss is KB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_pipeline(user: dict, solver: str = "auto", max_size: int = 0, time_limit: float = 300) -> dict:
+    """Runs one user through every stage; returns the timings and model statistics."""
+    timings = {}
+    clock = time.perf_counter()
+
+    def lap(stage):
+        nonlocal clock
+        now = time.perf_counter()
+        timings[stage] = round(now - clock, 4)
+        clock = now
+
+    diets = DIET_CATALOG.view(select_diets(user))
+    exercises = EXERCISE_CATALOG.view(select_exercises(user))
+    lap("filter")
+    metrics = compute_user_metrics(user)
+    params = model_parameters(user, metrics)
+    lap("metrics")
+    diets_filtered = diets
+    diets = DIET_CATALOG.view(presolve_meals(
+        diets, params, max_daily_burn(exercises['calories_burned_per_min'], params["FT_day"])
+    )[0])
+    lap("presolve")
+
+    meals_idx, exercises_idx = diets.rows.tolist(), exercises.rows.tolist()
+    arrays = {
+        "cal": diets['calories'],
+        "fat": diets['fat'],
+        "carb": diets['carbs'],
+        "protein": diets['protein'],
+        "prep_time": diets['total_time_in_minutes'],
+        "burn_rate": exercises['calories_burned_per_min'],
+        "max_time": np.array([max_exercise_time(a) for a in exercises['activity_type']], dtype=float),
+    }
+    shares = np.column_stack([diets['fat_pct'], diets['carb_pct'], diets['protein_pct']])
+    start = warm_start(arrays, shares, params, diets['recipe'], exercises['exercise_name'],
+                       None, datetime.now().date())
+    lap("warm_start")
+
+    model, x_m, y_m, t_m, s_m, _ = build_model_matrix(params=params, **arrays)
+    model.update()
+    lap("build")
+    row = {
+        "T": params["T"],
+        "meals_filtered": len(diets_filtered),
+        "meals": len(meals_idx),
+        "exercises": len(exercises_idx),
+        "vars": model.NumVars,
+        "constrs": model.NumConstrs,
+        "nonzeros": model.NumNZs,
+    }
+
+    too_large = max_size and max(model.NumVars, model.NumConstrs) > max_size
+    used = "greedy" if solver == "greedy" or (solver == "auto" and too_large) else "gurobi"
+    if used == "gurobi":
+        apply_start(model, {"x": x_m, "y": y_m, "s": s_m}, start)
+        model.Params.OutputFlag = 0
+        model.setParam('TimeLimit', time_limit)
+        try:
+            model.optimize()
+        except GurobiError as e:
+            if solver != "auto" or e.errno != SIZE_LIMIT_ERROR:
+                raise
+            used = "greedy"
+    lap("solve")
+    row["solver"] = used
+
+    days = range(params["T"])
+    output_args = dict(
+        meals=meals_idx,
+        exercises=exercises_idx,
+        recipe=dict(zip(meals_idx, diets['recipe'])),
+        cal=dict(zip(meals_idx, diets['calories'])),
+        fat=dict(zip(meals_idx, diets['fat'])),
+        carb=dict(zip(meals_idx, diets['carbs'])),
+        protein=dict(zip(meals_idx, diets['protein'])),
+        prep_time=dict(zip(meals_idx, diets['total_time_in_minutes'])),
+        ex_name=dict(zip(exercises_idx, exercises['exercise_name'])),
+        workout_type=dict(zip(exercises_idx, exercises['activity_type'])),
+        location=dict(zip(exercises_idx, exercises['workout_location'])),
+        burn_rate=dict(zip(exercises_idx, exercises['calories_burned_per_min'])),
+        user_params=user,
+    )
+    if used == "gurobi":
+        result = generate_optimization_output(
+            model=model, days=days, x=x_m, t=t_m,
+            metrics=metrics, diets_view=diets_filtered, exercises_view=exercises, **output_args
+        )
+        row["status"] = result.status
+        row["mip_gap"] = model.MIPGap if model.SolCount else None
+        row["nodes"] = int(model.NodeCount)
+    else:
+        x, t = greedy_solution(start, arrays, params)
+        plan, weekly_info = plan_from_solution(x, t, days, start_date=datetime.now().date(), **output_args)
+        result = OptimizationResult(plan=plan, weekly_info=weekly_info,
+                                    status="HEURISTIC", recommendations=[])
+        row["status"] = result.status
+        # The heuristic cannot prove infeasibility; count the days it left short.
+        row["incomplete_days"] = sum(len(day.selected_meals) < params["M"] for day in plan)
+        row["mip_gap"] = None
+        row["nodes"] = 0
+    lap("output")
+    model.dispose()
+
+    if result.plan:
+        net = sum(day.total_net_calories for day in result.plan)
+        row["objective"] = round(abs(net - params["T"] * params["target_calorie_pd"]), 2)
+    row["timings"] = timings
+    row["total_s"] = round(sum(timings.values()), 4)
+    row["peak_rss_mb"] = peak_rss_mb()
+    return row
+
+
+def run_info(args) -> dict:
+    """Header row identifying the code and environment the results came from."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "run": datetime.now(timezone.utc).isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "gurobi": ".".join(map(str, gurobipy.gurobi.version())),
+        "args": vars(args),
+    }
+
+
+def summarize(rows) -> dict:
+    """Median and 95th percentile of every stage and of the total, over the users that ran."""
+    summary = {}
+    for stage in STAGES + ("total",):
+        values = sorted(r["total_s"] if stage == "total" else r["timings"][stage]
+                        for r in rows if "timings" in r)
+        if values:
+            summary[stage] = {"median": round(statistics.median(values), 4),
+                              "p95": round(values[min(len(values) - 1, int(0.95 * len(values)))], 4)}
+    return {"summary": summary, "users": len(rows), "errors": sum("error" in r for r in rows)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--horizons", type=int, nargs="+", help="Sample horizons (days) from these")
+    parser.add_argument("--solver", choices=("auto", "gurobi", "greedy"), default="auto")
+    parser.add_argument("--max-size", type=int, default=0,
+                        help="With --solver auto, use the stand-in above this many vars/constrs (0: no limit)")
+    parser.add_argument("--time-limit", type=float, default=300)
+    parser.add_argument("--json", action="store_true", help="Emit results as JSON lines")
+    parser.add_argument("--out", help="Also write the JSON lines to this file")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    out = open(args.out, "w") if args.out else None
+    rows = []
+
+    def emit(record: dict, text: str):
+        if out:
+            out.write(json.dumps(record) + "\n")
+        print(json.dumps(record) if args.json else text)
+
+    info = run_info(args)
+    emit(info, f"commit={info['commit']} gurobi={info['gurobi']} args={info['args']}")
+    for n, user in enumerate(synthetic_users(args.users, args.seed, args.horizons)):
+        row = {"user": n, "goal": user["goalType"], "M": user["mealsPerDay"],
+               "diet": user["dietRestrictions"], "location": user["preferredLocation"]}
+        try:
+            row.update(run_pipeline(user, args.solver, args.max_size, args.time_limit))
+        except Exception as e:
+            row["error"] = str(e)
+        rows.append(row)
+        emit(row, f"#{n:<3} {row['goal']:<11} T={row.get('T', '?'):>4} meals={row.get('meals', '?'):>5} "
+                  f"vars={row.get('vars', '?'):>7} {row.get('solver', '')}/{row.get('status', row.get('error'))} "
+                  f"gap={row.get('mip_gap')} total={row.get('total_s')}s rss={row.get('peak_rss_mb')}MB "
+                  f"{row.get('timings', '')}")
+    summary = summarize(rows)
+    emit(summary, f"{summary['users']} users, {summary['errors']} errors: {summary['summary']}")
+    if out:
+        out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Compares a full re-solve with the re-plan endpoint's incremental re-plan
+(optimization.replan) for users who follow their plan day by day.
+
+For each user: one full solve, then a re-plan on each of the next --days
+days with that day's workout skipped. The first re-plan builds the window
+model; the later ones reuse it through bounds and right-hand sides.
+    full_s          solve_optimization without the result cache
+    first_replan_s  first re-plan (new model)
+    kept_replan_s   median of the later re-plans (kept-alive model)
+    ratio           kept_replan_s / full_s
+
+Run from `backend_server/`:
+    python -m benchmarks.bench_replan --horizons 14 21 28 --days 5 --json
+"""
+import argparse
+import json
+import logging
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+from models.input_schema import PlanChange
+from optimization.optimizer import solve_optimization
+from optimization.replan import replan_optimization
+
+BASE_USER = {
+    "activityLevel": "Moderately Active",
+    "age": 30,
+    "daysWeek": 3,
+    "fitnessLevel": "intermediate",
+    "freeTime": 3,
+    "gender": "male",
+    "height": 175,
+    "mealPrepTime": 60,
+    "mealsPerDay": 3,
+    "name": "bench",
+    "preferredLocation": "gym",
+    "preferredWorkoutType": "general",
+    "weight": 80,
+}
+
+# (dietRestrictions, varietyPreferences, goalType, goalWeight) of the benchmark set
+PROFILES = [
+    (["dash"], ["indian", "middle eastern"], "endurance", 78),
+    (["vegan"], ["japanese", "chinese"], "endurance", 79),
+    (["mediterranean"], ["middle eastern", "mexican"], "weight_loss", 77),
+]
+
+
+def benchmark_users(horizons):
+    now = datetime.now(timezone.utc)
+    for diet, variety, goal, goal_weight in PROFILES:
+        for T in horizons:
+            yield dict(
+                BASE_USER,
+                dietRestrictions=diet,
+                varietyPreferences=variety,
+                goalType=goal,
+                goalWeight=goal_weight,
+                goalTargetDate=(now + timedelta(days=T, hours=-1)).isoformat(),
+            )
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, round(time.perf_counter() - start, 4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--horizons", type=int, nargs="+", default=[14, 21, 28])
+    parser.add_argument("--days", type=int, default=5, help="Re-plans per user, one per day")
+    parser.add_argument("--json", action="store_true", help="Emit results as JSON lines")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    for user in benchmark_users(args.horizons):
+        row = {"diet": user["dietRestrictions"], "goal": user["goalType"]}
+        try:
+            full, row["full_s"] = timed(solve_optimization, user, use_cache=False)
+            row["T"], row["status"] = len(full.plan), full.status
+            replans = []
+            for k in range(1, min(args.days, len(full.plan) - 1) + 1):
+                today = full.plan[k].day
+                result, seconds = timed(replan_optimization, user, full,
+                                        [PlanChange(day=today, skipWorkout=True)], today)
+                replans.append((result.status, seconds))
+        except Exception as e:  # e.g. a size-limited Gurobi license
+            row["error"] = str(e)
+            print(json.dumps(row) if args.json else row)
+            continue
+        if replans:
+            row["replan_statuses"] = sorted({status for status, _ in replans})
+            row["first_replan_s"] = replans[0][1]
+            if len(replans) > 1:
+                row["kept_replan_s"] = statistics.median(seconds for _, seconds in replans[1:])
+                row["ratio"] = round(row["kept_replan_s"] / max(row["full_s"], 1e-9), 3)
+        print(json.dumps(row) if args.json else "  ".join(f"{k}={v}" for k, v in row.items()))
+
+
+if __name__ == "__main__":
+    main()
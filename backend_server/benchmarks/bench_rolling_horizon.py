@@ -0,0 +1,103 @@
+"""
+Reports the objective gap and runtime of the rolling horizon solver against
+the monolithic model on a small benchmark set of users and horizons.
+
+The objective is the model's Z: |total net calories - T * target kcal/day|.
+Gap = (rolling - monolithic) / max(monolithic, 1).
+
+Run from `backend_server/`:
+    python -m benchmarks.bench_rolling_horizon --horizons 14 28 56 --json
+"""
+import argparse
+import json
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+
+from optimization.optimizer import solve_optimization
+from utils.calculations import compute_user_metrics
+
+BASE_USER = {
+    "activityLevel": "Moderately Active",
+    "age": 30,
+    "daysWeek": 3,
+    "fitnessLevel": "intermediate",
+    "freeTime": 3,
+    "gender": "male",
+    "goalType": "weight_loss",
+    "height": 175,
+    "mealPrepTime": 60,
+    "mealsPerDay": 3,
+    "name": "bench",
+    "preferredLocation": "gym",
+    "preferredWorkoutType": "general",
+    "weight": 70,
+}
+
+# (dietRestrictions, varietyPreferences, goalWeight) triples of the benchmark set
+PROFILES = [
+    (["dash"], ["indian", "middle eastern"], 70),
+    (["vegan"], ["japanese", "chinese"], 69),
+    (["mediterranean"], ["middle eastern", "mexican"], 68),
+    (["none"], ["none"], 67),
+]
+
+
+def benchmark_users(horizons):
+    now = datetime.now(timezone.utc)
+    for diet, variety, goal_weight in PROFILES:
+        for T in horizons:
+            yield dict(
+                BASE_USER,
+                dietRestrictions=diet,
+                varietyPreferences=variety,
+                goalWeight=goal_weight,
+                goalTargetDate=(now + timedelta(days=T, hours=-1)).isoformat(),
+            )
+
+
+def plan_objective(result, metrics) -> float:
+    net = sum(day.total_net_calories for day in result.plan)
+    return abs(net - metrics["days_to_target"] * metrics["target_calorie_per_day"])
+
+
+def run(user: dict, mode: str, metrics: dict) -> dict:
+    start = time.perf_counter()
+    try:
+        result = solve_optimization(user, use_cache=False, mode=mode)
+    except Exception as e:  # e.g. a size-limited Gurobi license
+        return {"error": str(e)}
+    return {
+        "status": result.status,
+        "runtime_s": round(time.perf_counter() - start, 3),
+        "objective": round(plan_objective(result, metrics), 2) if result.plan else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--horizons", type=int, nargs="+", default=[14, 28, 56])
+    parser.add_argument("--json", action="store_true", help="Emit results as JSON lines")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    for user in benchmark_users(args.horizons):
+        metrics = compute_user_metrics(user)
+        row = {
+            "diet": user["dietRestrictions"],
+            "variety": user["varietyPreferences"],
+            "T": metrics["days_to_target"],
+            "monolithic": run(user, "monolithic", metrics),
+            "rolling": run(user, "rolling", metrics),
+        }
+        mono, roll = row["monolithic"].get("objective"), row["rolling"].get("objective")
+        row["gap"] = round((roll - mono) / max(mono, 1.0), 4) if None not in (mono, roll) else None
+        if args.json:
+            print(json.dumps(row))
+        else:
+            print(f"{row['diet']}/{row['variety']} T={row['T']:>4} "
+                  f"monolithic={row['monolithic']} rolling={row['rolling']} gap={row['gap']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Compares the latency and payload size of the ways an OptimizationResult can
+be serialized, for plans of 7, 30 and 180 days (--days).
+
+Encoders (median milliseconds over --repeat runs):
+    fastapi     what FastAPI does with a returned model and a response_model:
+                dump to a dict, validate it against OptimizationResult again,
+                dump it in JSON mode and encode it with the json module
+    orjson      orjson.dumps(result.model_dump()) (with the orjson package)
+    pydantic    result.model_dump_json(), which utils.serialization.json_response
+                sends as is
+    gzip, br    compression of the encoded body at the levels json_response
+                uses (br only with the brotli package)
+
+Plans are built by plan_from_solution from random catalog meals and exercises,
+with --meals meals and one exercise per day, so no solver is needed.
+
+Run from `backend_server/`:
+    python -m benchmarks.bench_serialization --days 7 30 180 --json
+"""
+import argparse
+import gzip
+import json
+import statistics
+import time
+from datetime import date
+
+import numpy as np
+from pydantic import TypeAdapter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from data.preprocessing import DIET_CATALOG, EXERCISE_CATALOG
+from models.output_schema import OptimizationResult
+from optimization.optimizer import plan_from_solution
+from utils.serialization import BROTLI_QUALITY, GZIP_LEVEL, brotli
+
+RESULT_ADAPTER = TypeAdapter(OptimizationResult)
+
+
+def synthetic_result(days: int, meals_per_day: int, rng: np.random.Generator) -> OptimizationResult:
+    """A plan of `days` days over random catalog rows."""
+    meals = rng.choice(DIET_CATALOG.n_rows, size=min(200, DIET_CATALOG.n_rows), replace=False).tolist()
+    exercises = rng.choice(EXERCISE_CATALOG.n_rows, size=min(20, EXERCISE_CATALOG.n_rows), replace=False).tolist()
+    x = np.zeros((len(meals), days))
+    t = np.zeros((len(exercises), days))
+    for d in range(days):
+        x[rng.choice(len(meals), size=meals_per_day, replace=False), d] = 1.0
+        t[rng.integers(len(exercises)), d] = float(rng.integers(10, 60))
+
+    def column(catalog, name, rows):
+        return dict(zip(rows, catalog.column(name, np.array(rows))))
+
+    plan, weekly_info = plan_from_solution(
+        x, t, range(days), meals, exercises,
+        recipe=column(DIET_CATALOG, "recipe", meals),
+        cal=column(DIET_CATALOG, "calories", meals),
+        fat=column(DIET_CATALOG, "fat", meals),
+        carb=column(DIET_CATALOG, "carbs", meals),
+        protein=column(DIET_CATALOG, "protein", meals),
+        prep_time=column(DIET_CATALOG, "total_time_in_minutes", meals),
+        ex_name=column(EXERCISE_CATALOG, "exercise_name", exercises),
+        workout_type=column(EXERCISE_CATALOG, "activity_type", exercises),
+        location=column(EXERCISE_CATALOG, "workout_location", exercises),
+        burn_rate=column(EXERCISE_CATALOG, "calories_burned_per_min", exercises),
+        user_params={"freeTime": 3, "daysWeek": 4, "mealsPerDay": meals_per_day},
+        start_date=date.today()
+    )
+    return OptimizationResult(plan=plan, weekly_info=weekly_info, status="OPTIMAL", recommendations=[])
+
+
+def fastapi_encode(result: OptimizationResult) -> bytes:
+    content = RESULT_ADAPTER.validate_python(result.model_dump())
+    return json.dumps(RESULT_ADAPTER.dump_python(content, mode="json"),
+                      ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def timed(fn, arg, repeat: int):
+    """(median milliseconds, last output) of `repeat` calls of fn(arg)."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn(arg)
+        times.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(times), 3), out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, nargs="+", default=[7, 30, 180])
+    parser.add_argument("--meals", type=int, default=3, help="Meals per day")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Emit results as JSON lines")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    for days in args.days:
+        result = synthetic_result(days, args.meals, rng)
+        row = {"days": days}
+        row["fastapi_ms"], reference = timed(fastapi_encode, result, args.repeat)
+        if orjson is not None:
+            row["orjson_ms"], body = timed(lambda r: orjson.dumps(r.model_dump()), result, args.repeat)
+            if json.loads(body) != json.loads(reference):
+                raise AssertionError(f"orjson disagrees on the {days}-day plan")
+        row["pydantic_ms"], body = timed(lambda r: r.model_dump_json().encode(), result, args.repeat)
+        if json.loads(body) != json.loads(reference):
+            raise AssertionError(f"model_dump_json disagrees on the {days}-day plan")
+        row["bytes"] = len(body)
+        row["gzip_ms"], packed = timed(lambda b: gzip.compress(b, compresslevel=GZIP_LEVEL), body, args.repeat)
+        row["gzip_bytes"] = len(packed)
+        if brotli is not None:
+            row["br_ms"], packed = timed(lambda b: brotli.compress(b, quality=BROTLI_QUALITY), body, args.repeat)
+            row["br_bytes"] = len(packed)
+        row["speedup_vs_fastapi"] = round(row["fastapi_ms"] / max(row["pydantic_ms"], 1e-3), 1)
+        print(json.dumps(row) if args.json else
+              "  ".join(f"{k}={v}" for k, v in row.items()))
+
+
+if __name__ == "__main__":
+    main()
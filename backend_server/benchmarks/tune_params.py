@@ -0,0 +1,184 @@
+"""
+Learns the adaptive Gurobi parameters of optimization.tuning and writes them
+as the lookup table the server loads from TUNED_PARAMS_PATH.
+
+Instances are the rolling horizon benchmark's profiles plus, with --users, a
+synthetic population (see bench_pipeline), solved as monolithic Gurobi
+models. Each instance falls in the bucket instance_key(T, presolved meals,
+goalType, mealsPerDay).
+
+Candidate settings of MIPGap, MIPFocus, Heuristics, Presolve and Threads:
+    grid   every combination of GRID
+    tune   Gurobi's defaults plus the best setting Gurobi's tuner finds for
+           each instance within --tune-time-limit
+
+Every candidate solves every instance. A run scores its runtime if it proved
+the instance's status (OPTIMAL or INFEASIBLE) with an objective within
+--tolerance of the best plan found, and --time-limit otherwise. Per bucket,
+and per horizon and catalog bucket with any goal and M, the candidate with
+the lowest mean score wins. Its TimeLimit is --time-limit-factor times its
+slowest proving run in the bucket, clamped to [--min-time-limit,
+DEFAULT_TIME_LIMIT]. Instances outside every bucket keep the defaults.
+
+Run from `backend_server/`:
+    python -m benchmarks.tune_params --horizons 7 14 28 --users 30 --out optimization/tuned_params.json --json
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import statistics
+import time
+from collections import defaultdict
+
+from benchmarks.bench_pipeline import synthetic_users
+from benchmarks.bench_rolling_horizon import benchmark_users, plan_objective
+from data.preprocessing import DIET_CATALOG, EXERCISE_CATALOG, select_diets, select_exercises
+from optimization.matrix_builder import build_model_matrix
+from optimization.optimizer import model_arrays, model_parameters, solve_optimization
+from optimization.presolve import presolve_meals, max_daily_burn
+from optimization.tuning import ANY, DEFAULT_TIME_LIMIT, TUNED_PARAMS, ParamTable, instance_key
+from utils.calculations import compute_user_metrics
+
+# Gurobi's defaults come first, so ties keep them.
+GRID = {
+    "MIPGap": (1e-4, 1e-3),
+    "MIPFocus": (0, 1, 3),
+    "Heuristics": (0.05, 0.2),
+    "Presolve": (-1, 2),
+    "Threads": sorted({0, 1, os.cpu_count() or 1}),
+}
+DEFAULTS = {name: values[0] for name, values in GRID.items()}
+PROVEN = ("OPTIMAL", "INFEASIBLE")
+
+
+#####################################################
+# Instances and Candidates
+#####################################################
+def presolved_instance(user: dict):
+    """(instance_key, model parameters, filtered views) of a user's presolved monolithic model."""
+    params = model_parameters(user, compute_user_metrics(user))
+    diets = DIET_CATALOG.view(select_diets(user))
+    exercises = EXERCISE_CATALOG.view(select_exercises(user))
+    rows, _ = presolve_meals(diets, params, max_daily_burn(exercises['calories_burned_per_min'], params["FT_day"]))
+    key = instance_key(params["T"], len(rows), user["goalType"], params["M"])
+    return key, params, DIET_CATALOG.view(rows), exercises
+
+
+def grid_candidates():
+    return [dict(zip(GRID, values)) for values in itertools.product(*GRID.values())]
+
+
+def tuned_candidate(user: dict, tune_time_limit: float):
+    """Setting Gurobi's tuner finds for the user's model (None if it finds none)."""
+    _, params, diets, exercises = presolved_instance(user)
+    model = build_model_matrix(params=params, **model_arrays(diets, exercises))[0]
+    try:
+        model.Params.OutputFlag = 0
+        model.Params.TuneTimeLimit = tune_time_limit
+        model.Params.TuneResults = 1
+        model.tune()
+        if model.TuneResultCount == 0:
+            return None
+        model.getTuneResult(0)
+        return {name: model.getParamInfo(name)[2] for name in TUNED_PARAMS if name != "TimeLimit"}
+    finally:
+        model.dispose()
+
+
+#####################################################
+# Evaluation and Selection
+#####################################################
+def run(user: dict, metrics: dict, candidate: dict, time_limit: float) -> dict:
+    start = time.perf_counter()
+    result = solve_optimization(user, use_cache=False, mode="monolithic", backend="gurobi",
+                                solver_params=dict(candidate, TimeLimit=time_limit))
+    return {
+        "status": result.status,
+        "runtime_s": round(time.perf_counter() - start, 3),
+        "objective": plan_objective(result, metrics) if result.plan else None,
+    }
+
+
+def scores(runs, time_limit: float, tolerance: float):
+    """Score of every candidate's run on one instance (see the module docstring)."""
+    objectives = [r["objective"] for r in runs if r["objective"] is not None]
+    best = min(objectives) if objectives else None
+
+    def proving(r):
+        return r["status"] in PROVEN and (r["objective"] is None or r["objective"] <= best * (1 + tolerance) + 1e-6)
+
+    return [r["runtime_s"] if proving(r) else time_limit for r in runs]
+
+
+def select(instances, candidates, args) -> dict:
+    """Winning candidate, with its TimeLimit, of one bucket's instances."""
+    mean_scores = [statistics.mean(inst["scores"][c] for inst in instances) for c in range(len(candidates))]
+    winner = min(range(len(candidates)), key=mean_scores.__getitem__)
+    proven = [inst["runs"][winner]["runtime_s"] for inst in instances
+              if inst["scores"][winner] < args.time_limit]
+    time_limit = args.time_limit_factor * max(proven) if proven else DEFAULT_TIME_LIMIT
+    return dict(candidates[winner], TimeLimit=round(min(max(time_limit, args.min_time_limit), DEFAULT_TIME_LIMIT), 1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--horizons", type=int, nargs="+", default=[7, 14, 28])
+    parser.add_argument("--users", type=int, default=0, help="Synthetic users to add to the profiles")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--method", choices=("grid", "tune"), default="grid")
+    parser.add_argument("--tune-time-limit", type=float, default=60, help="Seconds of Gurobi's tuner per instance")
+    parser.add_argument("--time-limit", type=float, default=120, help="Time limit of every evaluation run")
+    parser.add_argument("--tolerance", type=float, default=1e-3, help="Relative objective tolerance of a proving run")
+    parser.add_argument("--time-limit-factor", type=float, default=5.0)
+    parser.add_argument("--min-time-limit", type=float, default=10.0)
+    parser.add_argument("--out", help="Write the lookup table to this file")
+    parser.add_argument("--json", action="store_true", help="Emit results as JSON lines")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    def emit(record: dict):
+        print(json.dumps(record) if args.json else "  ".join(f"{k}={v}" for k, v in record.items()))
+
+    users = list(benchmark_users(args.horizons)) + synthetic_users(args.users, args.seed, args.horizons)
+    if args.method == "grid":
+        candidates = grid_candidates()
+    else:
+        candidates = [DEFAULTS]
+        for user in users:
+            try:
+                candidate = tuned_candidate(user, args.tune_time_limit)
+            except Exception as e:  # e.g. a size-limited Gurobi license
+                emit({"tune_error": str(e)})
+                continue
+            if candidate is not None and candidate not in candidates:
+                candidates.append(candidate)
+
+    buckets = defaultdict(list)
+    for user in users:
+        key = presolved_instance(user)[0]
+        metrics = compute_user_metrics(user)
+        try:
+            runs = [run(user, metrics, candidate, args.time_limit) for candidate in candidates]
+        except Exception as e:  # e.g. a size-limited Gurobi license
+            emit({"key": key, "error": str(e)})
+            continue
+        instance = {"runs": runs, "scores": scores(runs, args.time_limit, args.tolerance)}
+        horizon, catalog, _, _ = key.split("|")
+        buckets[key].append(instance)
+        buckets["|".join((horizon, catalog, ANY, ANY))].append(instance)
+        best = min(range(len(candidates)), key=instance["scores"].__getitem__)
+        emit({"key": key, "default_s": instance["scores"][0], "best_s": instance["scores"][best],
+              "best": candidates[best]})
+
+    table = ParamTable({key: select(instances, candidates, args) for key, instances in sorted(buckets.items())})
+    for key, entry in table.entries.items():
+        emit({"bucket": key, "instances": len(buckets[key]), "params": entry})
+    if args.out:
+        table.save(args.out, method=args.method, instances=len(users), horizons=args.horizons,
+                   tolerance=args.tolerance, time_limit=args.time_limit)
+
+
+if __name__ == "__main__":
+    main()
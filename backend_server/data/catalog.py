@@ -0,0 +1,333 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+
+# Version of the on-disk layout written by CatalogStore.save.
+CATALOG_FORMAT_VERSION = 1
+# Rows copied per block when CatalogWriter finalizes its columns.
+COPY_BLOCK_ROWS = 1 << 20
+
+
+#####################################################
+# Text Columns: decoded on access
+#####################################################
+class StringColumn:
+    """
+    A saved text column: the UTF-8 table and its offsets, memory-mapped.
+    Indexing decodes only the requested rows into an object array, so a
+    request touches the pages of the names it outputs and nothing else.
+    """
+
+    dtype = np.dtype(object)
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, rows):
+        if np.isscalar(rows):
+            return self._decode(int(rows))
+        rows = np.arange(len(self))[rows] if isinstance(rows, slice) else np.asarray(rows)
+        return np.array([self._decode(int(row)) for row in rows.ravel()], dtype=object).reshape(rows.shape)
+
+    def __iter__(self):
+        return (self._decode(row) for row in range(len(self)))
+
+    def _decode(self, row: int) -> str:
+        return self.blob[self.offsets[row]:self.offsets[row + 1]].tobytes().decode()
+
+
+#####################################################
+# Columnar Catalog Store
+#####################################################
+class CatalogStore:
+    """
+    Read-only, column-oriented copy of a catalog built once at startup.
+
+    - Numeric columns are contiguous float64 arrays.
+    - Categorical columns are small-int codes plus their category table.
+    - Every categorical value has a precomputed packed row bitmap, keyed by
+      the lowercased value, so a filter is a handful of bitwise ORs/ANDs.
+    - Any other column (recipe and exercise names) is kept as an object array,
+      or a StringColumn decoded on access when loaded from disk.
+    - `save` (or CatalogWriter, chunk by chunk) writes it as one file per
+      column, which `load` memory-maps.
+    Filters return row indices; callers read columns through those indices
+    instead of copying the whole catalog per request.
+    """
+
+    def __init__(self, names: List[str],
+                 columns: Dict[str, np.ndarray],
+                 codes: Dict[str, np.ndarray],
+                 categories: Dict[str, np.ndarray]):
+        self.names = names
+        self.columns = columns
+        self.codes = codes
+        self.categories = categories
+        self.n_rows = len(next(iter({**columns, **codes}.values())))
+        self.bitmaps: Dict[str, Dict[str, np.ndarray]] = {}
+        for name, col_codes in codes.items():
+            per_value: Dict[str, np.ndarray] = {}
+            for code, value in enumerate(categories[name]):
+                bits = np.packbits(col_codes == code)
+                key = str(value).lower()
+                per_value[key] = per_value[key] | bits if key in per_value else bits
+            self.bitmaps[name] = per_value
+        self._all = np.packbits(np.ones(self.n_rows, dtype=bool))
+
+    @classmethod
+    def from_frame(cls, df, categorical: Iterable[str]) -> "CatalogStore":
+        # pandas is only imported on this path; loading a saved store does not need it.
+        import pandas as pd
+
+        categorical = list(categorical)
+        columns, codes, categories = {}, {}, {}
+        for name in df.columns:
+            if name in categorical:
+                cat = pd.Categorical(df[name])  # missing values get code -1
+                codes[name] = np.ascontiguousarray(cat.codes, dtype=np.int16)
+                categories[name] = np.asarray(cat.categories, dtype=object)
+            elif pd.api.types.is_numeric_dtype(df[name]):
+                columns[name] = np.ascontiguousarray(df[name].to_numpy(dtype=np.float64))
+            else:
+                columns[name] = df[name].to_numpy(dtype=object)
+        return cls(list(df.columns), columns, codes, categories)
+
+    def save(self, directory: Path, source: str = ""):
+        """
+        Writes the store as one file per column under `directory`:
+          - numeric columns and categorical codes as .npy arrays;
+          - text columns as a UTF-8 string table (<name>.utf8) with int64
+            offsets (<name>.offsets.npy);
+          - meta.json with the column names, kinds, category tables and
+            `source`, an identifier (e.g. a checksum) of the data it came from.
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        strings = []
+        for name, values in self.columns.items():
+            if values.dtype == object:
+                encoded = [str(v).encode() for v in values]
+                offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+                np.cumsum([len(b) for b in encoded], out=offsets[1:])
+                (directory / f"{name}.utf8").write_bytes(b"".join(encoded))
+                np.save(directory / f"{name}.offsets.npy", offsets)
+                strings.append(name)
+            else:
+                np.save(directory / f"{name}.npy", values)
+        for name, col_codes in self.codes.items():
+            np.save(directory / f"{name}.npy", col_codes)
+        meta = {
+            "version": CATALOG_FORMAT_VERSION,
+            "source": source,
+            "names": self.names,
+            "numeric": [name for name in self.columns if name not in strings],
+            "strings": strings,
+            "categories": {name: cats.tolist() for name, cats in self.categories.items()},
+        }
+        (directory / "meta.json").write_text(json.dumps(meta, indent=1))
+
+    @staticmethod
+    def saved_source(directory: Path) -> Optional[str]:
+        """The `source` a saved store was written with, or None if there is no usable store."""
+        try:
+            meta = json.loads((Path(directory) / "meta.json").read_text())
+        except (OSError, ValueError):
+            return None
+        return meta.get("source") if meta.get("version") == CATALOG_FORMAT_VERSION else None
+
+    @classmethod
+    def load(cls, directory: Path, mmap: bool = True) -> "CatalogStore":
+        """
+        Reads a store written by `save`. With `mmap`, numeric columns, codes
+        and text columns are read-only memory maps, so processes that load
+        the same files share their pages and only the pages of rows that are
+        read become resident: a catalog may be larger than memory. Without
+        it, text columns are decoded into object arrays.
+        """
+        directory = Path(directory)
+        meta = json.loads((directory / "meta.json").read_text())
+        mode = "r" if mmap else None
+
+        def array(name: str) -> np.ndarray:
+            return np.asarray(np.load(directory / f"{name}.npy", mmap_mode=mode))
+
+        columns = {name: array(name) for name in meta["numeric"]}
+        for name in meta["strings"]:
+            offsets = array(f"{name}.offsets")
+            blob_path = directory / f"{name}.utf8"
+            blob = (np.memmap(blob_path, dtype=np.uint8, mode="r") if mmap and blob_path.stat().st_size
+                    else np.frombuffer(blob_path.read_bytes(), dtype=np.uint8))
+            column = StringColumn(blob, offsets)
+            columns[name] = column if mmap else column[:]
+        codes = {name: array(name) for name in meta["categories"]}
+        categories = {name: np.asarray(cats, dtype=object) for name, cats in meta["categories"].items()}
+        return cls(meta["names"], columns, codes, categories)
+
+    def column(self, name: str, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Column values (for `rows` only, if given); categorical columns are
+        decoded back to their original values, None where missing.
+        """
+        if name in self.codes:
+            codes = self.codes[name] if rows is None else self.codes[name][rows]
+            values = self.categories[name][codes]
+            # Code -1 marks a missing value; as an index it would pick the last category.
+            missing = codes < 0
+            return np.where(missing, None, values)[()] if np.any(missing) else values
+        return self.columns[name] if rows is None else self.columns[name][rows]
+
+    def bitmap(self, name: str, values: Iterable[str]) -> np.ndarray:
+        """Packed bitmap of rows whose `name` matches any of `values` (case-insensitive)."""
+        per_value = self.bitmaps[name]
+        bits = np.zeros_like(self._all)
+        for value in values:
+            match = per_value.get(value.lower())
+            if match is not None:
+                bits |= match
+        return bits
+
+    def select(self, filters: Dict[str, List[str]]) -> np.ndarray:
+        """
+        Row indices matching every filter. `filters` maps a categorical column
+        to the allowed values; an empty mapping selects every row.
+        """
+        bits = self._all.copy()
+        for name, values in filters.items():
+            bits &= self.bitmap(name, values)
+        return np.flatnonzero(np.unpackbits(bits, count=self.n_rows))
+
+    def view(self, rows: Optional[np.ndarray] = None) -> "CatalogView":
+        return CatalogView(self, np.arange(self.n_rows) if rows is None else rows)
+
+
+class CatalogView:
+    """A set of selected rows of a CatalogStore; columns are gathered on access."""
+
+    def __init__(self, store: CatalogStore, rows: np.ndarray):
+        self.store = store
+        self.rows = rows
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.store.column(name, self.rows)
+
+    def to_frame(self):
+        import pandas as pd
+
+        return pd.DataFrame({name: self[name] for name in self.store.names}, index=self.rows)
+
+
+#####################################################
+# Chunked Export: catalogs larger than memory
+#####################################################
+class CatalogWriter:
+    """
+    Writes a saved store (the layout of CatalogStore.save) from DataFrame
+    chunks, holding one chunk at a time. Column kinds are taken from the
+    first chunk; categorical codes are remapped to sorted category tables on
+    `close`, so the result matches saving CatalogStore.from_frame of the
+    concatenated chunks.
+    """
+
+    def __init__(self, directory: Path, categorical: Iterable[str]):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # No meta.json until `close`, so an unfinished export is never loaded.
+        for stale in [*self.directory.glob("*.raw"), self.directory / "meta.json"]:
+            stale.unlink(missing_ok=True)
+        self.categorical = list(categorical)
+        self.names: Optional[List[str]] = None
+        self.numeric: List[str] = []
+        self.strings: List[str] = []
+        self.categories: Dict[str, Dict[str, int]] = {name: {} for name in self.categorical}
+        self.string_bytes: Dict[str, int] = {}
+        self.n_rows = 0
+
+    def _raw(self, name: str) -> Path:
+        return self.directory / f"{name}.raw"
+
+    def append(self, df) -> None:
+        import pandas as pd
+
+        if self.names is None:
+            self.names = list(df.columns)
+            for name in self.names:
+                if name not in self.categorical:
+                    (self.numeric if pd.api.types.is_numeric_dtype(df[name]) else self.strings).append(name)
+            for name in self.strings:
+                self.string_bytes[name] = 0
+                (self.directory / f"{name}.utf8").write_bytes(b"")
+                self._append_raw(f"{name}.offsets", np.zeros(1, dtype=np.int64))
+        elif list(df.columns) != self.names:
+            raise ValueError(f"Chunk columns {list(df.columns)} differ from {self.names}")
+        for name in self.numeric:
+            self._append_raw(name, df[name].to_numpy(dtype=np.float64))
+        for name in self.categorical:
+            # Codes index the values in first-seen order until `close` sorts them.
+            table = self.categories[name]
+            values = df[name].to_numpy(dtype=object)
+            for value in pd.unique(values[pd.notna(values)]):
+                table.setdefault(value, len(table))
+            self._append_raw(name, pd.Categorical(values, categories=list(table)).codes.astype(np.int16))
+        for name in self.strings:
+            encoded = [str(v).encode() for v in df[name].to_numpy(dtype=object)]
+            lengths = np.cumsum([len(b) for b in encoded], dtype=np.int64)
+            with open(self.directory / f"{name}.utf8", "ab") as f:
+                f.write(b"".join(encoded))
+            self._append_raw(f"{name}.offsets", self.string_bytes[name] + lengths)
+            self.string_bytes[name] += int(lengths[-1]) if len(lengths) else 0
+        self.n_rows += len(df)
+
+    def _append_raw(self, name: str, values: np.ndarray) -> None:
+        with open(self._raw(name), "ab") as f:
+            f.write(np.ascontiguousarray(values).tobytes())
+
+    def _finish_raw(self, name: str, dtype, mapping: Optional[np.ndarray] = None) -> None:
+        """Copies <name>.raw into <name>.npy block by block (through `mapping` for codes)."""
+        raw_path = self._raw(name)
+        n = raw_path.stat().st_size // np.dtype(dtype).itemsize
+        out = np.lib.format.open_memmap(self.directory / f"{name}.npy", mode="w+", dtype=dtype, shape=(n,))
+        if n:
+            raw = np.memmap(raw_path, dtype=dtype, mode="r")
+            for start in range(0, n, COPY_BLOCK_ROWS):
+                block = raw[start:start + COPY_BLOCK_ROWS]
+                out[start:start + len(block)] = block if mapping is None else np.where(block >= 0, mapping[block], -1)
+            del raw
+        out.flush()
+        del out
+        os.remove(raw_path)
+
+    def close(self, source: str = "") -> int:
+        """Finalizes the columns and writes meta.json; returns the row count."""
+        if self.names is None:
+            raise ValueError("No chunks were written")
+        for name in self.numeric:
+            self._finish_raw(name, np.float64)
+        sorted_categories = {}
+        for name, table in self.categories.items():
+            values = sorted(table)
+            mapping = np.empty(max(len(table), 1), dtype=np.int16)
+            for code, value in enumerate(values):
+                mapping[table[value]] = code
+            self._finish_raw(name, np.int16, mapping)
+            sorted_categories[name] = values
+        for name in self.strings:
+            self._finish_raw(f"{name}.offsets", np.int64)
+        meta = {
+            "version": CATALOG_FORMAT_VERSION,
+            "source": source,
+            "names": self.names,
+            "numeric": self.numeric,
+            "strings": self.strings,
+            "categories": sorted_categories,
+        }
+        (self.directory / "meta.json").write_text(json.dumps(meta, indent=1))
+        return self.n_rows
@@ -0,0 +1,36 @@
+"""
+Exports the diet and exercise catalogs as binary catalogs (see
+CatalogStore.save) that the server memory-maps at startup instead of parsing
+the CSVs. Each export records a checksum of its CSV; the server falls back
+to the CSV when they no longer match.
+
+Run from `backend_server/` (the Docker build does this):
+    python -m data.export_catalog
+or, for the CSVs of the preprocessing pipeline:
+    python -m data.export_catalog --csv-dir ../data/final --out ../data/final/catalog
+Add --chunksize 500000 for catalogs that don't fit in memory.
+"""
+import argparse
+from pathlib import Path
+
+from data.preprocessing import CATALOG_CSV, CATALOG_DIR, export_catalog
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv-dir", type=Path, default=None,
+                        help="Directory with the catalog CSVs (default: the server's)")
+    parser.add_argument("--out", type=Path, default=CATALOG_DIR)
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="Stream the CSVs this many rows at a time (catalogs larger than memory)")
+    args = parser.parse_args()
+
+    for name, csv_path in CATALOG_CSV.items():
+        if args.csv_dir is not None:
+            csv_path = args.csv_dir / csv_path.name
+        export_catalog(name, csv_path, args.out, args.chunksize)
+        print(f"Exported {csv_path} to {args.out / name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+import numpy as np
+from scipy.spatial import cKDTree
+
+from data.catalog import CatalogStore
+from data.preprocessing import DIET_CATALOG, catalog_version
+
+# Dimensions of macro space: calories, the fat/carb/protein calorie shares and
+# prep time, with the difference that counts as one unit of nearest-meal
+# distance in each.
+FEATURES = ["calories", "fat_pct", "carb_pct", "protein_pct", "total_time_in_minutes"]
+FEATURE_SCALE = np.array([100.0, 0.05, 0.05, 0.05, 15.0])
+# Row masks of query boxes `MacroIndex.count` keeps, least recently used
+# dropped first (the goals' macro bands need one each).
+MASK_CACHE_SIZE = int(os.environ.get("MASK_CACHE_SIZE", 8))
+
+
+#####################################################
+# Macro-space Index: range and nearest-meal queries
+#####################################################
+class MacroIndex:
+    """
+    Spatial index of the meals of a diet catalog in macro space (FEATURES).
+    Queries return catalog row ids and can be restricted to a set of rows,
+    such as a user's filtered view:
+      - `within`: the rows inside a box, e.g. "at most 600 kcal with a fat
+        share between 20% and 35%". Every feature is also kept sorted, so a
+        box only scans the rows of its most selective feature's range;
+      - `count`: how many of some rows are inside a box; the row masks of
+        the last MASK_CACHE_SIZE boxes are kept, so the goals' fixed macro
+        bands cost one lookup per request;
+      - `nearest`: the k rows closest to a point in distance scaled by
+        FEATURE_SCALE, closest first, from a KD-tree. Meals missing a
+        feature (NaN) are left out of it.
+    Safe to share between threads.
+    """
+
+    def __init__(self, store: CatalogStore):
+        self.values = np.column_stack([np.asarray(store.column(name), dtype=float) for name in FEATURES])
+        # Per feature, the rows by value (NaN last) and those values
+        self.order = np.argsort(self.values, axis=0, kind="stable")
+        self.sorted = np.take_along_axis(self.values, self.order, axis=0)
+        self.rows = np.flatnonzero(np.isfinite(self.values).all(axis=1))
+        self.tree = cKDTree(self.values[self.rows] / FEATURE_SCALE)
+        self._masks: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def _box(self, bounds: Dict[str, Tuple[float, float]]) -> Tuple[np.ndarray, np.ndarray]:
+        """(low, high) arrays over FEATURES from {feature: (low, high)}; missing features are unbounded."""
+        unknown = set(bounds) - set(FEATURES)
+        if unknown:
+            raise ValueError(f"Unknown macro-space features: {sorted(unknown)}")
+        low = np.array([bounds.get(name, (-np.inf, np.inf))[0] for name in FEATURES], dtype=float)
+        high = np.array([bounds.get(name, (-np.inf, np.inf))[1] for name in FEATURES], dtype=float)
+        return low, high
+
+    def within(self, bounds: Dict[str, Tuple[float, float]], rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Sorted catalog rows (of `rows`, if given) whose features lie inside
+        `bounds` {feature: (low, high)}, bounds included. Unbounded features
+        are not checked, so a meal missing only those still matches.
+        """
+        low, high = self._box(bounds)
+        bounded = np.flatnonzero(np.isfinite(low) | np.isfinite(high))
+        candidates = np.arange(len(self.values)) if rows is None else np.asarray(rows)
+        if len(bounded):
+            starts = np.array([np.searchsorted(self.sorted[:, j], low[j], "left") for j in bounded])
+            ends = np.array([np.searchsorted(self.sorted[:, j], high[j], "right") for j in bounded])
+            k = int(np.argmin(ends - starts))
+            # Check the rows of the narrowest feature range, or `rows` if fewer.
+            if ends[k] - starts[k] < len(candidates):
+                in_range = self.order[starts[k]:ends[k], bounded[k]]
+                candidates = in_range if rows is None else in_range[self._member(rows)[in_range]]
+        values = self.values[candidates][:, bounded]
+        return np.sort(candidates[np.all((values >= low[bounded]) & (values <= high[bounded]), axis=1)])
+
+    def count(self, bounds: Dict[str, Tuple[float, float]], rows: np.ndarray) -> int:
+        """Number of `rows` inside `bounds` (see `within`)."""
+        key = tuple(map(tuple, self._box(bounds)))
+        with self._lock:
+            mask = self._masks.get(key)
+            if mask is not None:
+                self._masks.move_to_end(key)
+        if mask is None:
+            mask = self._member(self.within(bounds))
+            with self._lock:
+                self._masks[key] = mask
+                while len(self._masks) > max(MASK_CACHE_SIZE, 0):
+                    self._masks.popitem(last=False)
+        return int(np.count_nonzero(mask[rows]))
+
+    def nearest(self, point: Dict[str, float], k: int, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Up to `k` catalog rows (of `rows`, if given) closest to `point`
+        {feature: value, for every feature} in scaled distance, closest first.
+        """
+        q = np.array([point[name] for name in FEATURES], dtype=float) / FEATURE_SCALE
+        if not np.isfinite(q).all():
+            raise ValueError("A nearest-meal query needs a finite value for every feature")
+        allowed = np.ones(len(self.rows), dtype=bool) if rows is None else self._member(rows)[self.rows]
+        n_allowed = int(np.count_nonzero(allowed))
+        k = min(k, n_allowed)
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64)
+        # Ask the tree for enough neighbours that k are likely allowed ...
+        m = -(-2 * k * len(self.rows) // n_allowed)
+        if m <= len(self.rows) // 8:
+            _, hits = self.tree.query(q, k=m)
+            hits = np.atleast_1d(hits)
+            hits = hits[allowed[hits]]
+            if len(hits) >= k:
+                return self.rows[hits[:k]]
+        # ... unless the restriction is that selective: then rank its rows directly.
+        candidates = np.flatnonzero(allowed)
+        distance = np.linalg.norm(self.tree.data[candidates] - q, axis=1)
+        best = np.argpartition(distance, k - 1)[:k] if k < len(candidates) else np.arange(len(candidates))
+        return self.rows[candidates[best[np.argsort(distance[best], kind="stable")]]]
+
+    def features(self, row: int) -> Dict[str, float]:
+        """The macro-space point of a catalog row (NaN for missing features)."""
+        return dict(zip(FEATURES, self.values[row].tolist()))
+
+    def _member(self, rows: np.ndarray) -> np.ndarray:
+        mask = np.zeros(len(self.values), dtype=bool)
+        mask[rows] = True
+        return mask
+
+
+@lru_cache(maxsize=None)
+def diet_index() -> MacroIndex:
+    """The MacroIndex of DIET_CATALOG, built on first use: once per loaded catalog version."""
+    index = MacroIndex(DIET_CATALOG)
+    logging.info("Built the macro-space index of %d meals (catalog version %s)", len(index), catalog_version())
+    return index
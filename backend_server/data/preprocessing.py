@@ -1,42 +1,174 @@
-import pandas as pd
+import hashlib
+import json
+import os
+import numpy as np
 import logging
+from functools import lru_cache
 from pathlib import Path
+from typing import Optional
+
+from data.catalog import CatalogStore, CatalogWriter
+from utils.calculations import macro_shares
 
 # --- Determine the directory this file lives in ---
 DATA_DIR = Path(__file__).resolve().parent
+# DIETS_CSV overrides the diet catalog (e.g. to benchmark another build of it)
+DIETS_CSV = Path(os.environ.get("DIETS_CSV", DATA_DIR / "processed_final_diets.csv"))
+# Near-duplicate recipes the preprocessing dedup stage removed from DIETS_CSV,
+# each with the "canonical" recipe that stands for it (optional)
+DIET_VARIANTS_CSV = DIETS_CSV.with_name(DIETS_CSV.stem + "_variants.csv")
+EXERCISES_CSV = DATA_DIR / "processed_final_exercises.csv"
+# Binary catalogs written by `python -m data.export_catalog`
+CATALOG_DIR = DATA_DIR / "catalog"
+# "auto" memory-maps the binary catalog when it was exported from the current
+# CSV and falls back to the CSV otherwise; "csv" always parses the CSV.
+CATALOG_FORMAT = os.environ.get("CATALOG_FORMAT", "auto")
+
+CATEGORICAL = {
+    "diets": ["diet_type", "cuisine_type"],
+    "exercises": ["difficulty_level", "workout_location", "activity_type"],
+}
+CATALOG_CSV = {"diets": DIETS_CSV, "exercises": EXERCISES_CSV}
+# Written next to the final CSVs by preprocessing/scripts/prepare_data.py;
+# deploy it with them to report the catalog version.
+CATALOG_MANIFEST = DATA_DIR / "manifest.json"
+
+
+# --- Catalog construction: CSV parsing, binary export and loading ---
+def csv_checksum(path: Path) -> str:
+    """Identifies the CSV a binary catalog was exported from."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def with_derived_columns(name: str, df):
+    """Catalog rows with the columns the server derives: diets also carry each meal's fat/carb/protein calorie shares."""
+    if name == "diets":
+        shares = macro_shares(df["fat"], df["carbs"], df["protein"])
+        df = df.assign(fat_pct=shares[:, 0], carb_pct=shares[:, 1], protein_pct=shares[:, 2])
+    return df
+
+def catalog_from_csv(name: str, path: Path) -> CatalogStore:
+    """Builds catalog `name` ("diets" or "exercises") from its CSV."""
+    import pandas as pd
+
+    return CatalogStore.from_frame(with_derived_columns(name, pd.read_csv(path)), categorical=CATEGORICAL[name])
+
+def export_catalog(name: str, csv_path: Path, directory: Path, chunksize: Optional[int] = None):
+    """
+    Writes catalog `name`, built from `csv_path`, as a binary catalog under
+    `directory`. With `chunksize`, the CSV is streamed that many rows at a
+    time (see CatalogWriter), for catalogs that don't fit in memory.
+    """
+    if chunksize is None:
+        catalog_from_csv(name, csv_path).save(Path(directory) / name, source=csv_checksum(csv_path))
+        return
+    import pandas as pd
+
+    writer = CatalogWriter(Path(directory) / name, categorical=CATEGORICAL[name])
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+        writer.append(with_derived_columns(name, chunk))
+    writer.close(source=csv_checksum(csv_path))
 
-# --- Load your CSVs from that directory, no matter where you run from ---
-_diets_df = pd.read_csv(DATA_DIR / "processed_final_diets.csv")
-_ex_df    = pd.read_csv(DATA_DIR / "processed_final_exercises.csv")
+def load_catalog(name: str) -> CatalogStore:
+    """
+    Catalog `name`, memory-mapped from CATALOG_DIR when its binary export
+    matches the CSV (see CATALOG_FORMAT), else parsed from the CSV.
+    """
+    csv_path = CATALOG_CSV[name]
+    directory = CATALOG_DIR / name
+    if CATALOG_FORMAT != "csv":
+        source = CatalogStore.saved_source(directory)
+        if source is not None and source == csv_checksum(csv_path):
+            return CatalogStore.load(directory)
+        logging.warning("No current binary %s catalog in %s, parsing %s", name, directory, csv_path.name)
+    return catalog_from_csv(name, csv_path)
 
-def filter_diets(user_params: dict) -> pd.DataFrame:
-    df = _diets_df.copy()
+@lru_cache(maxsize=None)
+def catalog_version():
+    """
+    catalog_version of CATALOG_MANIFEST if it lists the CSVs the server
+    loads with their current checksums, else None (no or a stale manifest).
+    """
+    try:
+        manifest = json.loads(CATALOG_MANIFEST.read_text())
+    except (OSError, ValueError):
+        return None
+    for csv_path in CATALOG_CSV.values():
+        if manifest.get("files", {}).get(csv_path.name, {}).get("sha256") != csv_checksum(csv_path):
+            return None
+    return manifest.get("catalog_version")
+
+@lru_cache(maxsize=None)
+def catalog_frame(name: str):
+    """Catalog `name` as read from its CSV, as a DataFrame (legacy filters and benchmarks)."""
+    import pandas as pd
+
+    return pd.read_csv(CATALOG_CSV[name])
+
+@lru_cache(maxsize=None)
+def diet_variants():
+    """DIET_VARIANTS_CSV as a DataFrame, or None when the catalog was built without dedup."""
+    import pandas as pd
+
+    if not DIET_VARIANTS_CSV.exists():
+        return None
+    return pd.read_csv(DIET_VARIANTS_CSV)
+
+# --- Columnar stores built once; requests filter these by row index ---
+DIET_CATALOG = load_catalog("diets")
+EXERCISE_CATALOG = load_catalog("exercises")
+
+def diet_filters(user_params: dict) -> dict:
+    """Maps the user's diet preferences to catalog column filters."""
+    filters = {}
     # dietRestrictions → diet_type
     dr = [d.lower() for d in user_params.get("dietRestrictions", [])]
     if "none" not in dr:
-        df = df[df["diet_type"].str.lower().isin(dr)]
+        filters["diet_type"] = dr
     # varietyPreferences → cuisine_type
     vp = [v.lower() for v in user_params.get("varietyPreferences", [])]
     if "none" not in vp:
-        df = df[df["cuisine_type"].str.lower().isin(vp)]
-    logging.info("Filtered diets (%d rows):\n%s", len(df), df.head().to_dict(orient="records"))
+        filters["cuisine_type"] = vp
+    return filters
+
+def exercise_filters(user_params: dict) -> dict:
+    """Maps the user's workout preferences to catalog column filters."""
+    filters = {}
+    for param, column in (("fitnessLevel", "difficulty_level"),
+                          ("preferredLocation", "workout_location"),
+                          ("preferredWorkoutType", "activity_type")):
+        value = user_params.get(param, "").lower()
+        if value and value != "none":
+            filters[column] = [value]
+    return filters
+
+def select_diets(user_params: dict) -> np.ndarray:
+    """Row indices of DIET_CATALOG that match the user's diet preferences."""
+    rows = DIET_CATALOG.select(diet_filters(user_params))
+    logging.info("Filtered diets: %d rows", len(rows))
+    return rows
+
+def select_exercises(user_params: dict) -> np.ndarray:
+    """Row indices of EXERCISE_CATALOG that match the user's workout preferences."""
+    rows = EXERCISE_CATALOG.select(exercise_filters(user_params))
+    logging.info("Filtered exercises: %d rows", len(rows))
+    return rows
+
+def filter_diets(user_params: dict):
+    df = catalog_frame("diets").iloc[DIET_CATALOG.select(diet_filters(user_params))]
+    logging.info("Filtered diets: %d rows", len(df))
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug("First filtered diets: %s", df.head().to_dict(orient="records"))
     return df
 
-def filter_exercises(user_params: dict) -> pd.DataFrame:
-    df = _ex_df.copy()
-    # fitnessLevel → difficulty_level
-    fl = user_params.get("fitnessLevel", "").lower()
-    if fl and fl != "none":
-        df = df[df["difficulty_level"].str.lower() == fl]
-    # preferredLocation → workout_location
-    pl = user_params.get("preferredLocation", "").lower()
-    if pl and pl != "none":
-        df = df[df["workout_location"].str.lower() == pl]
-    # preferredWorkoutType → activity_type
-    wt = user_params.get("preferredWorkoutType", "").lower()
-    if wt and wt != "none":
-        df = df[df["activity_type"].str.lower() == wt]
-    logging.info("Filtered exercises (%d rows):\n%s", len(df), df.head().to_dict(orient="records"))
+def filter_exercises(user_params: dict):
+    df = catalog_frame("exercises").iloc[EXERCISE_CATALOG.select(exercise_filters(user_params))]
+    logging.info("Filtered exercises: %d rows", len(df))
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug("First filtered exercises: %s", df.head().to_dict(orient="records"))
     return df
 
 # --- Main test harness ---
@@ -1,9 +1,11 @@
 from fastapi import FastAPI
 from routers.optimize import router as optimize_router
+from routers.metrics import router as metrics_router
 
 app = FastAPI()
 
 app.include_router(optimize_router, prefix="", tags=["optimize"])
+app.include_router(metrics_router, prefix="", tags=["metrics"])
 
 @app.get("/")
 async def root():
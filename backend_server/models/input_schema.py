@@ -1,7 +1,9 @@
 # app/models/input_schema.py
 
-from pydantic import BaseModel, conint, confloat, field_validator, Field
-from typing import List, Annotated
+from pydantic import BaseModel, conint, confloat, field_validator, model_validator, Field
+from datetime import date
+from typing import List, Annotated, Literal, Optional
+from models.output_schema import DailyPlan, OptimizationResult
 class UserData(BaseModel):
     name: str
     age: Annotated[int, Field(strict=True, gt=0)]
@@ -21,9 +23,39 @@ class UserData(BaseModel):
     mealPrepTime: Annotated[int, Field(strict=True, gt=0, le=120)]
     mealsPerDay: Annotated[int, Field(strict=True, gt=0)]
     varietyPreferences: List[str]
+    solverMode: Literal["auto", "monolithic", "rolling", "patterns"] = "auto"
+    solverBackend: Optional[Literal["auto", "gurobi", "highs"]] = None  # None: the server's SOLVER_BACKEND
+    explainInfeasibility: bool = False  # Add the minimum relaxation to infeasible results
+    previousPlan: Optional[List[DailyPlan]] = None  # Plan returned earlier; used as a warm start
+    maxLatencyMs: Optional[Annotated[int, Field(strict=True, gt=0)]] = None  # Return the best plan found within this budget
 
     @field_validator("gender")
     def validate_gender(cls, v):
         if v.lower() not in ["male", "female", "other"]:
             raise ValueError("Invalid gender value")
         return v
+
+    @model_validator(mode="after")
+    def validate_solver(self):
+        if self.solverBackend == "highs" and self.solverMode in ("rolling", "patterns"):
+            raise ValueError(f"The {self.solverMode} solver requires the gurobi backend")
+        return self
+
+class PlanChange(BaseModel):
+    day: date
+    lock: bool = False              # Keep the day as planned (after the edits below)
+    skipWorkout: bool = False       # Drop the day's workout
+    removeMeals: List[str] = []     # Recipes taken off the day
+    addMeals: List[str] = []        # Recipes put on the day instead
+
+class ReplanRequest(BaseModel):
+    user: UserData                  # Current profile; `weight` is the latest logged weight
+    previous: OptimizationResult    # The plan being edited
+    changes: List[PlanChange] = []
+    today: Optional[date] = None    # Days before it are completed (default: the server's date)
+
+class SwapRequest(BaseModel):
+    user: UserData                  # Current profile; its diet filters bound the suggestions
+    recipe: str                     # The meal to swap out
+    count: Annotated[int, Field(strict=True, ge=1, le=50)] = 5  # Suggestions to return
+    exclude: List[str] = []         # Recipes not to suggest, e.g. the rest of the day's meals
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import date
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 class Meal(BaseModel):
     recipe: str
@@ -33,4 +33,16 @@ class OptimizationResult(BaseModel):
     plan: List[DailyPlan]
     weekly_info: WeeklyInfo
     status: str                     # The Gurobi model status (e.g., "OPTIMAL", "TIME_LIMIT", "INFEASIBLE")
-    recommendations: List[str]      # List of recommendations to adjust backend inputs if needed
\ No newline at end of file
+    recommendations: List[str]      # List of recommendations to adjust backend inputs if needed
+class SolveJobStatus(BaseModel):
+    job_id: str
+    state: str                      # "queued", "running", "done", "failed" or "cancelled"
+    incumbents: int                 # Number of improving plans found so far
+    result: Optional[OptimizationResult] = None  # Latest incumbent, or the final result once done
+    error: Optional[str] = None
+
+class BatchItemResult(BaseModel):
+    index: int                      # Position of the user in the batch request
+    status: str                     # The result's status, or "ERROR" if the solve failed
+    result: Optional[OptimizationResult] = None
+    error: Optional[str] = None
@@ -0,0 +1,227 @@
+import logging
+import os
+import threading
+from typing import Callable, Dict, Optional
+import numpy as np
+from gurobipy import Model, GRB, GurobiError
+
+try:
+    import highspy
+except ImportError:  # optional: only needed for the HiGHS backend
+    highspy = None
+
+from optimization.environment import thread_env
+from optimization.matrix_builder import MatrixProblem
+from optimization.tuning import time_left
+
+# Backend of requests that do not pick one: "auto", "gurobi" or "highs".
+SOLVER_BACKEND = os.environ.get("SOLVER_BACKEND", "auto")
+# With "auto", monolithic models with at most this many variables go to HiGHS
+# (0 keeps every model on Gurobi while it is licensed).
+HIGHS_MAX_VARS = int(os.environ.get("HIGHS_MAX_VARS", 0))
+
+SOLVER_BACKENDS = ("auto", "gurobi", "highs")
+# Gurobi error codes for a missing license and for a model beyond a
+# size-limited license; "auto" re-solves those requests with HiGHS.
+LICENSE_ERRORS = (10009, 10010)
+# Gurobi parameters the HiGHS backend understands, by HiGHS option name
+HIGHS_OPTIONS = {"TimeLimit": "time_limit", "MIPGap": "mip_rel_gap", "Seed": "random_seed"}
+# HiGHS model statuses as Gurobi status codes, which the rest of the
+# pipeline (and the API's `status` strings) speak.
+HIGHS_STATUS = {
+    "kOptimal": GRB.OPTIMAL,
+    "kInfeasible": GRB.INFEASIBLE,
+    "kUnboundedOrInfeasible": GRB.INF_OR_UNBD,
+    "kUnbounded": GRB.UNBOUNDED,
+    "kObjectiveBound": GRB.USER_OBJ_LIMIT,
+    "kObjectiveTarget": GRB.USER_OBJ_LIMIT,
+    "kTimeLimit": GRB.TIME_LIMIT,
+    "kIterationLimit": GRB.ITERATION_LIMIT,
+    "kSolutionLimit": GRB.SOLUTION_LIMIT,
+    "kInterrupt": GRB.INTERRUPTED,
+    "kHighsInterrupt": GRB.INTERRUPTED,
+    "kMemoryLimit": GRB.MEM_LIMIT,
+}
+
+_gurobi_licensed: Optional[bool] = None
+_license_lock = threading.Lock()
+
+
+#####################################################
+# Backend Selection
+#####################################################
+def gurobi_licensed() -> bool:
+    """Whether a Gurobi environment can start here (checked once per process)."""
+    global _gurobi_licensed
+    with _license_lock:
+        if _gurobi_licensed is None:
+            try:
+                thread_env()
+                _gurobi_licensed = True
+            except GurobiError as e:
+                logging.warning("Gurobi is unavailable: %s", e)
+                _gurobi_licensed = False
+        return _gurobi_licensed
+
+
+def resolve_backend(requested: str, mode: str, n_vars: int) -> str:
+    """
+    Picks the solver for a request: "gurobi" or "highs". "auto" sends
+    monolithic models of at most HIGHS_MAX_VARS variables, and every model
+    when Gurobi has no license, to HiGHS. The rolling horizon and day-pattern
+    modes drive Gurobi directly and always run there.
+    """
+    if requested not in SOLVER_BACKENDS:
+        raise ValueError(f"Unsupported solver backend: {requested}")
+    if requested == "auto":
+        if highspy is None or mode != "monolithic":
+            return "gurobi"
+        return "highs" if n_vars <= HIGHS_MAX_VARS or not gurobi_licensed() else "gurobi"
+    if requested == "highs":
+        if highspy is None:
+            raise ValueError("The highs solver backend requires the highspy package")
+        if mode != "monolithic":
+            raise ValueError(f"The {mode} solver requires the gurobi backend")
+    return requested
+
+
+def can_fall_back(requested: str, error: GurobiError) -> bool:
+    """Whether an "auto" request that Gurobi rejected for licensing can re-run on HiGHS."""
+    return requested == "auto" and highspy is not None and error.errno in LICENSE_ERRORS
+
+
+#####################################################
+# Matrix Problem Solves
+#####################################################
+class SolveOutcome:
+    """
+    Backend-neutral solve result: a Gurobi status code, the stacked solution
+    vector (None without a feasible solution), objective, MIP gap, runtime
+    and branch-and-bound node count.
+    """
+
+    def __init__(self, status: int, values: Optional[np.ndarray], objective: Optional[float],
+                 mip_gap: Optional[float], runtime: float, node_count: Optional[int] = None):
+        self.status = status
+        self.values = values
+        self.objective = objective
+        self.mip_gap = mip_gap
+        self.runtime = runtime
+        self.node_count = node_count
+
+
+def solve_matrix(problem: MatrixProblem, backend: str = "auto", time_limit: float = 300,
+                 solver_params: Optional[Dict] = None) -> SolveOutcome:
+    """
+    Solves a MatrixProblem on `backend`. "auto" uses Gurobi when it is
+    licensed and HiGHS otherwise, or when Gurobi rejects the model for licensing.
+    """
+    if backend == "gurobi" or (backend == "auto" and (highspy is None or gurobi_licensed())):
+        try:
+            return solve_gurobi(problem, time_limit, solver_params)
+        except GurobiError as e:
+            if not can_fall_back(backend, e):
+                raise
+            logging.warning("Gurobi rejected the model (%s), solving with HiGHS", e)
+    if highspy is None:
+        raise ValueError("The highs solver backend requires the highspy package")
+    return solve_highs(problem, time_limit=time_limit, solver_params=solver_params)
+
+
+def solve_gurobi(problem: MatrixProblem, time_limit: float = 300,
+                 solver_params: Optional[Dict] = None) -> SolveOutcome:
+    """Solves a MatrixProblem with Gurobi, loaded as one MVar and one matrix constraint."""
+    model = Model("FitPlannerMatrix", env=thread_env())
+    try:
+        model.Params.OutputFlag = 0
+        model.setParam('TimeLimit', time_limit)
+        for name, value in (solver_params or {}).items():
+            model.setParam(name, value)
+        v = model.addMVar(problem.n_vars, lb=problem.lb, ub=problem.ub, obj=problem.obj,
+                          vtype=np.where(problem.integer, GRB.INTEGER, GRB.CONTINUOUS))
+        model.addMConstr(problem.A, v, problem.sense, problem.rhs)
+        model.optimize()
+        has_solution = model.SolCount > 0
+        return SolveOutcome(
+            status=model.status,
+            values=v.X if has_solution else None,
+            objective=model.ObjVal if has_solution else None,
+            mip_gap=model.MIPGap if has_solution and model.IsMIP else None,
+            runtime=model.Runtime,
+            node_count=int(model.NodeCount) if model.IsMIP else None
+        )
+    finally:
+        model.dispose()
+
+
+def solve_highs(problem: MatrixProblem,
+                start: Optional[Dict[str, np.ndarray]] = None,
+                time_limit: float = 300,
+                solver_params: Optional[Dict] = None,
+                on_incumbent: Optional[Callable[[np.ndarray], None]] = None,
+                should_stop: Optional[Callable[[], bool]] = None,
+                deadline: Optional[float] = None) -> SolveOutcome:
+    """
+    Solves a MatrixProblem with HiGHS.
+    `start` holds per-block start values (NaN: unset), like `warm_start`'s.
+    Gurobi `solver_params` listed in HIGHS_OPTIONS are translated; the
+    others (e.g. Threads) have no HiGHS counterpart and are ignored.
+    `on_incumbent(values)` is called with every improving solution and
+    `should_stop()` is polled to interrupt the solve. A `deadline` (a
+    time.monotonic() time) caps the time limit at the time left once the
+    model is loaded, right before HiGHS runs.
+    """
+    h = highspy.Highs()
+    h.setOptionValue("output_flag", False)
+    h.setOptionValue("time_limit", float(time_limit))
+    for name, value in (solver_params or {}).items():
+        if name in HIGHS_OPTIONS:
+            h.setOptionValue(HIGHS_OPTIONS[name], value)
+
+    A = problem.A.tocsc()
+    lp = highspy.HighsLp()
+    lp.num_col_ = problem.n_vars
+    lp.num_row_ = A.shape[0]
+    lp.col_cost_ = problem.obj
+    lp.col_lower_ = problem.lb
+    lp.col_upper_ = problem.ub
+    lp.row_lower_ = np.where(problem.sense == GRB.LESS_EQUAL, -highspy.kHighsInf, problem.rhs)
+    lp.row_upper_ = np.where(problem.sense == GRB.GREATER_EQUAL, highspy.kHighsInf, problem.rhs)
+    lp.a_matrix_.format_ = highspy.MatrixFormat.kColwise
+    lp.a_matrix_.num_col_ = problem.n_vars
+    lp.a_matrix_.num_row_ = A.shape[0]
+    lp.a_matrix_.start_ = A.indptr
+    lp.a_matrix_.index_ = A.indices
+    lp.a_matrix_.value_ = A.data
+    lp.integrality_ = np.where(problem.integer, highspy.HighsVarType.kInteger,
+                               highspy.HighsVarType.kContinuous).tolist()
+    h.passModel(lp)
+
+    if start:
+        v = problem.stack(start)
+        given = np.flatnonzero(~np.isnan(v))
+        if len(given):
+            h.setSolution(len(given), given.astype(np.int32), v[given])
+    if on_incumbent is not None:
+        h.cbMipImprovingSolution.subscribe(lambda e: on_incumbent(np.array(e.data_out.mip_solution)))
+    if should_stop is not None:
+        def interrupt(e):
+            if should_stop():
+                e.data_in.user_interrupt = True
+        h.cbMipInterrupt.subscribe(interrupt)
+
+    if deadline is not None:
+        limit = float((solver_params or {}).get("TimeLimit", time_limit))
+        h.setOptionValue("time_limit", min(limit, time_left(deadline)))
+    h.run()
+    status = HIGHS_STATUS.get(h.getModelStatus().name, GRB.NUMERIC)
+    info = h.getInfo()
+    has_solution = info.primal_solution_status == 2  # kSolutionStatusFeasible
+    return SolveOutcome(
+        status=status,
+        values=np.array(h.getSolution().col_value) if has_solution else None,
+        objective=info.objective_function_value if has_solution else None,
+        mip_gap=info.mip_gap if has_solution else None,
+        runtime=h.getRunTime(),
+        node_count=int(info.mip_node_count)
+    )
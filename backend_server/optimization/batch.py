@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import os
+from typing import AsyncIterator, Dict, List, Optional
+
+import numpy as np
+
+from data.preprocessing import DIET_CATALOG, EXERCISE_CATALOG, select_diets, select_exercises
+from models.output_schema import BatchItemResult
+from optimization.optimizer import solve_optimization
+from optimization.presolve import MealPool
+from optimization.solve_pool import SOLVE_POOL, SolvePool, SolvePoolFull
+
+# Most users one batch request may hold.
+BATCH_MAX_USERS = int(os.environ.get("BATCH_MAX_USERS", 100))
+# Solves of one batch admitted to the solve pool at a time (0: one per worker).
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", 0))
+# Gurobi time limit (seconds) of each user's solve in a batch.
+BATCH_TIME_LIMIT = float(os.environ.get("BATCH_TIME_LIMIT", 60))
+# Seconds to wait before re-submitting when the solve pool is full.
+BATCH_RETRY_INTERVAL = float(os.environ.get("BATCH_RETRY_INTERVAL", 0.5))
+
+
+#####################################################
+# Catalog Groups: users with the same filtered catalog
+#####################################################
+class CatalogGroup:
+    """
+    Users whose preferences select the same diet and exercise rows. They
+    share the filtered views and the presolve MealPool, which every solve of
+    the group passes to solve_optimization as `catalog`.
+    """
+
+    def __init__(self, diet_rows: np.ndarray, exercise_rows: np.ndarray):
+        self.diets = DIET_CATALOG.view(diet_rows)
+        self.exercises = EXERCISE_CATALOG.view(exercise_rows)
+        self.meal_pool = MealPool(self.diets)
+        self.members: List[int] = []
+
+
+def group_users(users: List[Dict]) -> List[CatalogGroup]:
+    """Groups users (by position in `users`) by their filtered catalog rows."""
+    groups: Dict[bytes, CatalogGroup] = {}
+    for index, user in enumerate(users):
+        diet_rows, exercise_rows = select_diets(user), select_exercises(user)
+        key = diet_rows.tobytes() + b"|" + exercise_rows.tobytes()
+        if key not in groups:
+            groups[key] = CatalogGroup(diet_rows, exercise_rows)
+        groups[key].members.append(index)
+    return list(groups.values())
+
+
+#####################################################
+# Batch Solve: parallel solves, results as they finish
+#####################################################
+async def solve_batch(users: List[Dict], pool: SolvePool = SOLVE_POOL,
+                      concurrency: int = BATCH_CONCURRENCY,
+                      solver_params: Optional[Dict] = None) -> AsyncIterator[BatchItemResult]:
+    """
+    Solves every user of a batch on `pool` and yields one BatchItemResult per
+    user in completion order. At most `concurrency` solves of the batch are in
+    the pool at once; when the pool is full, submissions wait and retry, so a
+    batch never fails for being larger than the pool. A user whose solve
+    fails yields status "ERROR" without affecting the others. Solves are
+    submitted group by group; if the consumer stops early, solves that have
+    not started are dropped.
+    """
+    groups = group_users(users)
+    logging.info("Batch of %d users in %d catalog groups", len(users), len(groups))
+    solver_params = {**pool.solver_params(), "TimeLimit": BATCH_TIME_LIMIT, **(solver_params or {})}
+    admitted = asyncio.Semaphore(concurrency or pool.workers)
+
+    async def solve(index: int, group: CatalogGroup) -> BatchItemResult:
+        async with admitted:
+            while True:
+                try:
+                    future = pool.submit(solve_optimization, users[index],
+                                         solver_params=solver_params, catalog=group)
+                    break
+                except SolvePoolFull:
+                    await asyncio.sleep(BATCH_RETRY_INTERVAL)
+            try:
+                result = await asyncio.wrap_future(future)
+            except Exception as e:
+                logging.error("Batch item %d failed: %s", index, e, exc_info=True)
+                return BatchItemResult(index=index, status="ERROR", error=str(e))
+        return BatchItemResult(index=index, status=result.status, result=result)
+
+    tasks = [asyncio.create_task(solve(index, group)) for group in groups for index in group.members]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        for task in tasks:
+            task.cancel()
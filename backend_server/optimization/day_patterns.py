@@ -0,0 +1,279 @@
+import itertools
+import logging
+import os
+from math import comb
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import scipy.sparse as sp
+from gurobipy import Model, GRB
+
+from optimization.environment import thread_env
+from optimization.matrix_builder import build_model_matrix, macro_bands
+
+# Enumerate every meal set when the catalog has at most this many M-subsets.
+PATTERN_ENUM_LIMIT = int(os.environ.get("PATTERN_ENUM_LIMIT", 100_000))
+# Column generation rounds when the meal sets are priced instead.
+PATTERN_CG_ROUNDS = int(os.environ.get("PATTERN_CG_ROUNDS", 20))
+# Meal sets each pricing MIP may return (from Gurobi's solution pool).
+PRICING_COLUMNS = int(os.environ.get("PRICING_COLUMNS", 10))
+# Time limit (seconds) of each pricing MIP.
+PRICING_TIME_LIMIT = float(os.environ.get("PRICING_TIME_LIMIT", 5))
+
+MEAL_KEYS = ("cal", "fat", "carb", "protein", "prep_time")
+
+
+#####################################################
+# Day Patterns: meal sets that satisfy the daily rules
+#####################################################
+class DayRules:
+    """
+    The per-day rules a meal set must meet on its own: M distinct meals, the
+    macro bands and the prep time budget. Calorie balance and free time also
+    involve exercise, so the master problem enforces those.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], params: Dict):
+        cal, fat, carb, protein, prep_time = (
+            np.nan_to_num(np.asarray(arrays[k], dtype=float)) for k in MEAL_KEYS
+        )
+        target = params["target_calorie_pd"]
+        bands = np.array(macro_bands(params["goal"]))
+        self.M = params["M"]
+        self.kcal = np.column_stack([fat * 9, carb * 4, protein * 4])
+        self.prep_time = prep_time
+        self.lo, self.hi = bands[:, 0] * target, bands[:, 1] * target
+        self.prep_cap = params["MPT_day"]
+
+    def feasible(self, meal_sets: np.ndarray) -> np.ndarray:
+        """Mask of the (k, M) meal sets that meet the macro and prep rules."""
+        if len(meal_sets) == 0:
+            return np.zeros(0, dtype=bool)
+        macro = self.kcal[meal_sets].sum(axis=1)
+        return (np.all((macro >= self.lo - 1e-6) & (macro <= self.hi + 1e-6), axis=1)
+                & (self.prep_time[meal_sets].sum(axis=1) <= self.prep_cap + 1e-6))
+
+
+def enumerate_patterns(rules: DayRules, n_meals: int,
+                       limit: int = PATTERN_ENUM_LIMIT) -> Optional[np.ndarray]:
+    """All feasible meal sets as a (k, M) array, or None if there are more than `limit` subsets."""
+    if comb(n_meals, rules.M) > limit:
+        return None
+    meal_sets = np.array(list(itertools.combinations(range(n_meals), rules.M)), dtype=int)
+    meal_sets = meal_sets.reshape(-1, rules.M)
+    return meal_sets[rules.feasible(meal_sets)]
+
+
+class PricingProblem:
+    """
+    Finds the feasible meal sets of least total weight: min w @ m subject to
+    sum(m) == M, the macro bands and the prep budget, m binary.
+    """
+
+    def __init__(self, rules: DayRules, solver_params: Optional[Dict] = None):
+        n = len(rules.prep_time)
+        self.model = Model("FitPlannerPricing", env=thread_env())
+        self.model.Params.OutputFlag = 0
+        self.model.setParam('TimeLimit', PRICING_TIME_LIMIT)
+        self.model.setParam('PoolSolutions', PRICING_COLUMNS)
+        for name, value in (solver_params or {}).items():
+            self.model.setParam(name, value)
+        self.m = self.model.addMVar(n, vtype=GRB.BINARY, name="m")
+        self.model.addConstr(self.m.sum() == rules.M)
+        self.model.addConstr(rules.kcal.T @ self.m >= rules.lo)
+        self.model.addConstr(rules.kcal.T @ self.m <= rules.hi)
+        self.model.addConstr(rules.prep_time @ self.m <= rules.prep_cap)
+
+    def solve(self, weights: np.ndarray) -> List[Tuple[np.ndarray, float]]:
+        """Up to PRICING_COLUMNS (meal set, weight) pairs, best first."""
+        self.model.setObjective(weights @ self.m, GRB.MINIMIZE)
+        self.model.optimize()
+        found = []
+        for k in range(self.model.SolCount):
+            self.model.Params.SolutionNumber = k
+            found.append((np.flatnonzero(self.m.Xn > 0.5), self.model.PoolObjVal))
+        return found
+
+    def dispose(self):
+        self.model.dispose()
+
+
+class LibraryPricing:
+    """
+    PricingProblem over a fixed list of feasible meal sets, such as a
+    complete pattern library (see optimization.pattern_library): the sets of
+    least weight are found by summing weights, without a MIP.
+    """
+
+    def __init__(self, patterns: np.ndarray):
+        self.patterns = patterns
+
+    def solve(self, weights: np.ndarray) -> List[Tuple[np.ndarray, float]]:
+        """Up to PRICING_COLUMNS (meal set, weight) pairs, best first."""
+        if len(self.patterns) == 0:
+            return []
+        costs = weights[self.patterns].sum(axis=1)
+        k = min(PRICING_COLUMNS, len(costs))
+        best = np.argpartition(costs, k - 1)[:k]
+        best = best[np.argsort(costs[best], kind="stable")]
+        return [(self.patterns[i], float(costs[i])) for i in best]
+
+    def dispose(self):
+        pass
+
+
+#####################################################
+# Master Problem: assign one pattern to every day
+#####################################################
+def build_master(arrays: Dict[str, np.ndarray], params: Dict, patterns: np.ndarray):
+    """
+    The FitPlanner model restricted to the meals of `patterns`, with a binary
+    z[p, d] per pattern and day, sum_p z[p, d] == 1 and x[i, d] == sum of
+    z[p, d] over the patterns p containing meal i. Exercise, calorie balance,
+    no-repeat and weekly rows are the ones `build_model_matrix` builds.
+    Returns (model, x, y, t, s, Z, z, pool) where `pool` holds the positions
+    (in `arrays`) of the meals x is indexed by. z is None without patterns.
+    """
+    T = params["T"]
+    pool = np.unique(patterns)
+    pool_arrays = dict(arrays, **{k: np.asarray(arrays[k])[pool] for k in MEAL_KEYS})
+    model, x, y, t, s, Z = build_model_matrix(params=params, **pool_arrays)
+    if len(patterns) == 0:
+        return model, x, y, t, s, Z, None, pool
+    z = model.addMVar((len(patterns), T), vtype=GRB.BINARY, name="z")
+    k = len(patterns)
+    members = sp.csr_matrix(
+        (np.ones(patterns.size), (np.searchsorted(pool, patterns.ravel()), np.repeat(np.arange(k), patterns.shape[1]))),
+        shape=(len(pool), k)
+    )
+    model.addConstr(z.sum(axis=0) == 1, name="pattern")
+    model.addConstr(x - members @ z == 0, name="link")
+    return model, x, y, t, s, Z, z, pool
+
+
+def price_patterns(arrays: Dict[str, np.ndarray], params: Dict, rules: DayRules,
+                   patterns: np.ndarray, rounds: int = PATTERN_CG_ROUNDS,
+                   solver_params: Optional[Dict] = None,
+                   library: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Column generation on the LP relaxation of the master. Each round solves the
+    relaxation and, for every day, prices the meal sets with the most negative
+    reduced cost -pi_d + sum_{i in set} rho_{i,d}, where pi_d and rho_{i,d} are
+    the duals of the day's pattern row and of the x-link rows. Meals outside the
+    pool have no link row yet and price at zero. Stops when no day has a
+    negative reduced cost, the relaxation is infeasible, or after `rounds`.
+    With a `library` holding every feasible meal set, pricing searches it
+    instead of solving pricing MIPs.
+    """
+    T = params["T"]
+    pricing = LibraryPricing(library) if library is not None else PricingProblem(rules, solver_params)
+    try:
+        for r in range(rounds):
+            model, *_, pool = build_master(arrays, params, patterns)
+            model.update()
+            relaxed = model.relax()
+            relaxed.Params.OutputFlag = 0
+            relaxed.optimize()
+            if relaxed.status != GRB.OPTIMAL:
+                logging.info("Pattern LP round %d: status %d, stopping", r, relaxed.status)
+                relaxed.dispose()
+                model.dispose()
+                break
+            duals = np.array(relaxed.getAttr("Pi", relaxed.getConstrs()))
+            link = duals[-len(pool) * T:].reshape(len(pool), T)
+            convexity = duals[-len(pool) * T - T:-len(pool) * T]
+            lp_value = relaxed.ObjVal
+            relaxed.dispose()
+            model.dispose()
+
+            known = {tuple(p) for p in patterns}
+            new = []
+            priced = {}
+            for d in range(T):
+                weights = np.zeros(len(rules.prep_time))
+                weights[pool] = link[:, d]
+                key = weights.round(9).tobytes()
+                if key not in priced:
+                    priced[key] = pricing.solve(weights)
+                for meal_set, cost in priced[key]:
+                    if cost - convexity[d] < -1e-6 and tuple(meal_set) not in known:
+                        known.add(tuple(meal_set))
+                        new.append(meal_set)
+            logging.info("Pattern LP round %d: %d patterns, LP bound %.2f, %d new",
+                         r, len(patterns), lp_value, len(new))
+            if not new:
+                break
+            patterns = np.vstack([patterns, np.array(new)])
+    finally:
+        pricing.dispose()
+    return patterns
+
+
+def build_pattern_model(arrays: Dict[str, np.ndarray], params: Dict,
+                        mip_start: Optional[Dict[str, np.ndarray]] = None,
+                        solver_params: Optional[Dict] = None,
+                        library: Optional[Tuple[np.ndarray, bool]] = None):
+    """
+    Builds the day-pattern formulation of the FitPlanner model.
+    Patterns are every feasible meal set when the catalog has at most
+    PATTERN_ENUM_LIMIT of them, which makes the master exactly equivalent to
+    the full model. Otherwise they start from the feasible days of
+    `mip_start` and grow by column generation; the master then solves over
+    the generated patterns only (price-and-branch), which may miss the optimum.
+    A precomputed `library` (meal sets as positions in `arrays` and whether
+    it holds every feasible set, see optimization.pattern_library) replaces
+    the enumeration, or the pricing MIPs, when it is complete; otherwise its
+    feasible sets join the starting patterns.
+    Returns (model, x, y, t, s, Z, z, pool, exhaustive); see `build_master`.
+    """
+    rules = DayRules(arrays, params)
+    n_meals = len(rules.prep_time)
+    known, complete = None, False
+    if library is not None:
+        known, complete = library[0][rules.feasible(library[0])], library[1]
+    if complete:
+        patterns, source = (known, "library") if comb(n_meals, rules.M) <= PATTERN_ENUM_LIMIT else (None, None)
+    else:
+        patterns, source = enumerate_patterns(rules, n_meals), "enumerated"
+    exhaustive = patterns is not None
+    if not exhaustive:
+        source = "generated"
+        patterns = np.zeros((0, rules.M), dtype=int)
+        if mip_start is not None:
+            patterns = patterns_from_start(mip_start["x"], rules)
+        if known is not None and not complete and len(known):
+            patterns = np.unique(np.vstack([patterns, known]), axis=0)
+        if len(patterns) == 0:
+            # Seed with the best set for an empty dual so the LP has a column.
+            pricing = LibraryPricing(known) if complete else PricingProblem(rules, solver_params)
+            found = pricing.solve(rules.prep_time)
+            pricing.dispose()
+            if found:
+                patterns = np.array([meal_set for meal_set, _ in found])
+        if len(patterns):
+            patterns = price_patterns(arrays, params, rules, patterns, solver_params=solver_params,
+                                      library=known if complete else None)
+    logging.info("Day patterns: %d (%s) over %d meals", len(patterns), source, n_meals)
+
+    model, x, y, t, s, Z, z, pool = build_master(arrays, params, patterns)
+    if mip_start is not None and z is not None:
+        start_patterns(patterns, z, mip_start["x"])
+    return model, x, y, t, s, Z, z, pool, exhaustive
+
+
+def patterns_from_start(x_start: np.ndarray, rules: DayRules) -> np.ndarray:
+    """The distinct feasible meal sets used by the days of a start's x (meals, T)."""
+    days = [np.flatnonzero(x_start[:, d] > 0.5) for d in range(x_start.shape[1])]
+    days = np.array([meals for meals in days if len(meals) == rules.M], dtype=int).reshape(-1, rules.M)
+    return np.unique(days[rules.feasible(days)], axis=0)
+
+
+def start_patterns(patterns: np.ndarray, z, x_start: np.ndarray):
+    """Starts z from the days of a start's x (meals, T) whose meal sets are patterns."""
+    index = {tuple(p): k for k, p in enumerate(patterns)}
+    z_start = np.full(z.shape, GRB.UNDEFINED)
+    for d in range(z.shape[1]):
+        k = index.get(tuple(np.flatnonzero(x_start[:, d] > 0.5)))
+        if k is not None:
+            z_start[:, d] = 0.0
+            z_start[k, d] = 1.0
+    z.Start = z_start
@@ -0,0 +1,101 @@
+import logging
+import os
+from typing import Dict, List
+import numpy as np
+import scipy.sparse as sp
+from gurobipy import GRB
+
+from optimization.backends import solve_matrix
+from optimization.matrix_builder import MatrixProblem, matrix_problem
+
+# The explanation solves one week, or one day when a week would have more
+# variables than this.
+EXPLAIN_MAX_VARS = int(os.environ.get("EXPLAIN_MAX_VARS", 20_000))
+# Time limit (seconds) of the explanation solve.
+EXPLAIN_TIME_LIMIT = float(os.environ.get("EXPLAIN_TIME_LIMIT", 10))
+# Violations below this (in the row's unit) are solver noise, not advice.
+MIN_VIOLATION = 0.5
+
+# Constraint families the relaxation may violate, with their label and unit.
+# The other families (objective, workout links, durations) only define variables.
+RELAXABLE_FAMILIES = {
+    "calories": ("Calorie balance", "kcal"),
+    "prep_time": ("Meal prep time", "min"),
+    "free_time": ("Free time", "min"),
+    "meals": ("Meals per day", "meals"),
+    "fat": ("Fat calories", "kcal"),
+    "carbs": ("Carb calories", "kcal"),
+    "protein": ("Protein calories", "kcal"),
+    "meal_repeats": ("No repeated meals on consecutive days", "meals"),
+    "exercise_repeats": ("No repeated exercises on consecutive days", "exercises"),
+    "workout_frequency": ("Workout days per week", "days"),
+}
+
+
+#####################################################
+# Infeasibility Explanation: minimum relaxation
+#####################################################
+def elastic_problem(problem: MatrixProblem, families=RELAXABLE_FAMILIES) -> MatrixProblem:
+    """
+    The problem with an overshoot p >= 0 and undershoot n >= 0 on every row of
+    `families` (A v - p + n (sense) rhs) and the objective of minimizing the
+    violations relative to each row's right-hand side: sum (p + n) / max(|rhs|, 1).
+    Its optimum is the smallest relaxation that makes the rules consistent;
+    blocks "p" and "n" are indexed by the relaxed rows `rows` (an attribute).
+    """
+    rows = np.flatnonzero(np.isin(problem.families, list(families)))
+    k = len(rows)
+    S = sp.csr_matrix((np.ones(k), (rows, np.arange(k))), shape=(problem.A.shape[0], k))
+    shapes = dict(problem.shapes, p=(k,), n=(k,))
+    elastic = MatrixProblem(sp.hstack([problem.A, -S, S], format="csr"), problem.sense,
+                            problem.rhs, shapes, problem.families, objective=None)
+    weight = 1.0 / np.maximum(np.abs(problem.rhs[rows]), 1.0)
+    elastic.block_slice(elastic.obj, "p")[:] = weight
+    elastic.block_slice(elastic.obj, "n")[:] = weight
+    elastic.rows = rows
+    return elastic
+
+
+def explain_infeasibility(arrays: Dict[str, np.ndarray], params: Dict, backend: str = "auto") -> List[str]:
+    """
+    Names the constraint families that block a plan and by how much each must
+    be relaxed, from the minimum relaxation (see `elastic_problem`) of the
+    model reduced to one week (or one day). Every rule except the weekly
+    workout requirement repeats daily, so the reduced model shows the same
+    conflicts as the full horizon.
+    """
+    n_vars_per_day = len(arrays["cal"]) + 2 * len(arrays["burn_rate"]) + 1
+    days = min(params["T"], 7)
+    if n_vars_per_day * days > EXPLAIN_MAX_VARS:
+        days = 1
+    problem = matrix_problem(params=dict(params, T=days, deviation_offset=0.0), **arrays)
+    elastic = elastic_problem(problem)
+    try:
+        outcome = solve_matrix(elastic, backend, EXPLAIN_TIME_LIMIT)
+    except Exception as e:
+        logging.error("Infeasibility explanation failed: %s", e, exc_info=True)
+        return []
+    if outcome.values is None:
+        return [f"No relaxation of the daily rules was found within {EXPLAIN_TIME_LIMIT:.0f}s."]
+
+    over = elastic.block(outcome.values, "p")
+    under = elastic.block(outcome.values, "n")
+    explanation = []
+    for family, (label, unit) in RELAXABLE_FAMILIES.items():
+        in_family = problem.families[elastic.rows] == family
+        for amount, direction in ((over, "rise"), (under, "drop")):
+            violated = np.flatnonzero(in_family & (amount >= MIN_VIOLATION))
+            if len(violated) == 0:
+                continue
+            worst = violated[np.argmax(amount[violated])]
+            row = elastic.rows[worst]
+            bound = {GRB.LESS_EQUAL: "upper limit", GRB.GREATER_EQUAL: "lower limit"}.get(
+                problem.sense[row], "requirement")
+            share = amount[worst] / max(abs(problem.rhs[row]), 1.0)
+            explanation.append(
+                f"{label}: the {bound} of {problem.rhs[row]:.0f} {unit} would have to {direction} "
+                f"by {amount[worst]:.0f} {unit} ({share:.0%}) on {len(violated)} of {days} days."
+            )
+    if not explanation:
+        return [f"A {days}-day plan meets every rule; the conflict only appears over the full horizon."]
+    return ["Minimum relaxation that makes a plan possible:"] + explanation
@@ -0,0 +1,19 @@
+import threading
+from gurobipy import Env
+
+_local = threading.local()
+
+
+def thread_env() -> Env:
+    """
+    Gurobi environment owned by the calling thread, created on first use.
+    Environments must not be shared by threads that solve concurrently, so
+    every model is built in its thread's own environment.
+    """
+    env = getattr(_local, "env", None)
+    if env is None:
+        env = Env(empty=True)
+        env.setParam("OutputFlag", 0)
+        env.start()
+        _local.env = env
+    return env
@@ -0,0 +1,56 @@
+"""
+Precomputes the day-pattern libraries (see optimization.pattern_library)
+that the "patterns" solver mode loads instead of enumerating or pricing
+feasible meal sets per request.
+
+Diet combinations are every diet type with every single cuisine, plus the
+dietRestrictions/varietyPreferences of each profile in --profiles (JSON
+lines of UserData, e.g. taken from request logs). Combinations that select
+the same catalog rows share one library. Libraries already written for the
+current diet CSV are kept; a stale directory is rebuilt.
+
+Run from `backend_server/` (after the catalog CSV changes):
+    python -m optimization.export_patterns --meals-per-day 3 4
+"""
+import argparse
+import json
+import logging
+from pathlib import Path
+
+from data.preprocessing import DIET_CATALOG, select_diets
+from optimization.pattern_library import PATTERN_DIR, export_libraries
+
+
+def diet_combinations(profiles_path=None):
+    diet_types = sorted({str(v).lower() for v in DIET_CATALOG.categories["diet_type"]})
+    cuisines = sorted({str(v).lower() for v in DIET_CATALOG.categories["cuisine_type"]})
+    combinations = [([diet], [cuisine]) for diet in diet_types for cuisine in cuisines]
+    if profiles_path is not None:
+        for line in Path(profiles_path).read_text().splitlines():
+            if line.strip():
+                profile = json.loads(line)
+                combinations.append((profile["dietRestrictions"], profile["varietyPreferences"]))
+    return combinations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", type=Path, default=None, help="JSON lines of user profiles")
+    parser.add_argument("--meals-per-day", type=int, nargs="+", default=[3])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=Path, default=PATTERN_DIR)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    views = {}
+    for diet, cuisines in diet_combinations(args.profiles):
+        rows = select_diets({"dietRestrictions": diet, "varietyPreferences": cuisines})
+        if len(rows):
+            views.setdefault(rows.tobytes(), DIET_CATALOG.view(rows))
+    libraries = export_libraries(views.values(), args.out, args.meals_per_day, seed=args.seed)
+    complete = sum(library["complete"] for library in libraries.values())
+    print(f"Wrote {len(libraries)} pattern libraries ({complete} complete) to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+from models.output_schema import OptimizationResult, SolveJobStatus
+
+# Seconds a finished job stays available for polling.
+JOB_TTL = float(os.environ.get("JOB_TTL", 3600))
+
+JOB_STATES = ("queued", "running", "done", "failed", "cancelled")
+FINAL_STATES = ("done", "failed", "cancelled")
+
+
+#####################################################
+# Solve Job: state of one asynchronous solve
+#####################################################
+class SolveJob:
+    """
+    One asynchronous solve. The worker thread reports progress through
+    `start`, `incumbent`, `finish` and `fail`; the API reads `status()` and
+    streams changes through `subscribe`. The job is also the `observer` of
+    `solve_optimization`: setting `cancelled` makes the solve call
+    model.terminate() from its callback.
+    """
+
+    def __init__(self, params: Dict):
+        self.id = uuid.uuid4().hex
+        self.params = params
+        self.state = "queued"
+        self.result: Optional[OptimizationResult] = None
+        self.incumbents = 0
+        self.error: Optional[str] = None
+        self.cancelled = False
+        self.created = time.time()
+        self.finished: Optional[float] = None
+        self.future: Optional[Future] = None
+        self._lock = threading.Lock()
+        self._subscribers: List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = []
+
+    # --- Worker side ---
+    def start(self) -> bool:
+        """Marks the job running; False if it was cancelled while queued."""
+        with self._lock:
+            if self.cancelled:
+                return False
+            self.state = "running"
+        self._publish("status")
+        return True
+
+    def incumbent(self, result: OptimizationResult) -> None:
+        with self._lock:
+            self.result = result
+            self.incumbents += 1
+        self._publish("incumbent")
+
+    def finish(self, result: OptimizationResult) -> None:
+        with self._lock:
+            if self.cancelled and not result.plan and self.result is not None:
+                # An interrupted solve reports no plan; keep the best incumbent.
+                result = self.result.model_copy(update={"status": result.status})
+            self.result = result
+            self.state = "cancelled" if self.cancelled else "done"
+            self.finished = time.time()
+        self._publish(self.state)
+
+    def fail(self, error: str) -> None:
+        with self._lock:
+            self.error = error
+            self.state = "failed"
+            self.finished = time.time()
+        self._publish("failed")
+
+    # --- API side ---
+    def cancel(self) -> None:
+        """Stops the solve; a queued job is dropped before it starts."""
+        with self._lock:
+            if self.state in FINAL_STATES:
+                return
+            self.cancelled = True
+            dropped = self.future is not None and self.future.cancel()
+            dropped = dropped or self.state == "queued"
+            if dropped:
+                self.state = "cancelled"
+                self.finished = time.time()
+        if dropped:
+            self._publish("cancelled")
+
+    def status(self) -> SolveJobStatus:
+        with self._lock:
+            return SolveJobStatus(
+                job_id=self.id,
+                state=self.state,
+                incumbents=self.incumbents,
+                result=self.result,
+                error=self.error
+            )
+
+    def subscribe(self) -> asyncio.Queue:
+        """
+        Queue of (event, SolveJobStatus) pairs for the calling event loop. It
+        starts with the current status, so late subscribers see the latest plan.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        with self._lock:
+            self._subscribers.append((asyncio.get_running_loop(), queue))
+        queue.put_nowait(("status", self.status()))
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        with self._lock:
+            self._subscribers = [(loop, q) for loop, q in self._subscribers if q is not queue]
+
+    def _publish(self, event: str) -> None:
+        status = self.status()
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, (event, status))
+            except RuntimeError:  # subscriber's loop already closed
+                self.unsubscribe(queue)
+
+
+def run_job(job: SolveJob, solve, **solve_kwargs) -> None:
+    """Worker-thread entry point: runs `solve(job.params, observer=job)` and records the outcome."""
+    if not job.start():
+        return
+    try:
+        job.finish(solve(job.params, observer=job, **solve_kwargs))
+    except Exception as e:
+        logging.error("Optimization job %s failed: %s", job.id, e, exc_info=True)
+        job.fail(str(e))
+
+
+#####################################################
+# Job Store: in-memory registry of solve jobs
+#####################################################
+class JobStore:
+    """Thread-safe registry of jobs; finished jobs are dropped after JOB_TTL seconds."""
+
+    def __init__(self, ttl: float = JOB_TTL):
+        self.ttl = ttl
+        self._jobs: Dict[str, SolveJob] = {}
+        self._lock = threading.Lock()
+
+    def create(self, params: Dict) -> SolveJob:
+        job = SolveJob(params)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[SolveJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def remove(self, job_id: str) -> None:
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        """Jobs held per state, and their count."""
+        with self._lock:
+            states = [job.state for job in self._jobs.values()]
+        return {**{state: states.count(state) for state in JOB_STATES}, "count": len(states)}
+
+    def _prune(self) -> None:
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished is not None and now - job.finished > self.ttl]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+JOB_STORE = JobStore()
@@ -0,0 +1,328 @@
+from typing import Dict, List, Optional
+import numpy as np
+import scipy.sparse as sp
+from gurobipy import Model, GRB, MVar, hstack
+
+from optimization.environment import thread_env
+
+# Nutrients of the daily macro bands, in `macro_bands` order
+MACROS = ("fat", "carbs", "protein")
+
+
+#####################################################
+# Matrix Builder: Vectorized Model Construction
+#####################################################
+def build_model_matrix(cal: np.ndarray,
+                       fat: np.ndarray,
+                       carb: np.ndarray,
+                       protein: np.ndarray,
+                       prep_time: np.ndarray,
+                       burn_rate: np.ndarray,
+                       max_time: np.ndarray,
+                       params: Dict):
+    """
+    Builds the FitPlanner model from per-meal and per-exercise NumPy arrays.
+    Every constraint family is assembled as a sparse block (see
+    `matrix_problem`) and the blocks are added with a single `addMConstr` call.
+    Variables, rows, senses and coefficients come out in exactly the order the
+    reference loop builder (`optimizer.build_model`) produces them, so both
+    builders hand Gurobi the same model and get the same solution back.
+    An optional params["deviation_offset"] adds a constant (kcal) to the
+    deviation inside Z, which lets a horizon window carry the deviation
+    accumulated by earlier windows.
+    Returns (model, x, y, t, s, Z) where x, y and t are (items, days) MVars.
+    """
+    problem = matrix_problem(cal, fat, carb, protein, prep_time, burn_rate, max_time, params)
+    n_meals, T = problem.shapes["x"]
+    n_ex = problem.shapes["y"][0]
+
+    model = Model("FitPlanner", env=thread_env())
+
+    # Decision variables
+    x = model.addMVar((n_meals, T), vtype=GRB.BINARY, name="x")
+    y = model.addMVar((n_ex, T), vtype=GRB.BINARY, name="y")
+    t = model.addMVar((n_ex, T), vtype=GRB.CONTINUOUS, name="t")
+    s = model.addMVar(T, vtype=GRB.BINARY, name="s")
+    Z = model.addVar(vtype=GRB.CONTINUOUS, name="Z")
+    model.setObjective(Z, GRB.MINIMIZE)
+
+    v = hstack([x.reshape(-1), y.reshape(-1), t.reshape(-1), s, MVar.fromvar(Z)])
+    model.addMConstr(problem.A, v, problem.sense, problem.rhs)
+
+    return model, x, y, t, s, Z
+
+
+class MatrixProblem:
+    """
+    A MIP in solver-neutral form: minimize obj @ v subject to A @ v (sense)
+    rhs, lb <= v <= ub, with v the stacked vector of named variable blocks
+    (row-major, in the order of `shapes`) and `integer` marking the integer
+    columns. `families` labels each row with its constraint family (e.g.
+    "calories", "fat"). For the FitPlanner model the blocks are x, y, t, s
+    and Z, x, y and s are binary and the objective is Z.
+    """
+
+    def __init__(self, A: sp.csr_matrix, sense: np.ndarray, rhs: np.ndarray, shapes: Dict[str, tuple],
+                 families: Optional[np.ndarray] = None, binary=("x", "y", "s"), objective: Optional[str] = "Z"):
+        self.A, self.sense, self.rhs = A, sense, rhs
+        self.shapes = dict(shapes)
+        self.families = families if families is not None else np.full(A.shape[0], "", dtype=object)
+        sizes = [int(np.prod(shape)) for shape in self.shapes.values()]
+        self.offsets = dict(zip(self.shapes, np.cumsum([0] + sizes[:-1]).tolist()))
+        self.n_vars = sum(sizes)
+        self.obj = np.zeros(self.n_vars)
+        if objective is not None:
+            self.block_slice(self.obj, objective)[:] = 1.0
+        self.lb = np.zeros(self.n_vars)
+        self.ub = np.full(self.n_vars, np.inf)
+        self.integer = np.zeros(self.n_vars, dtype=bool)
+        for b in binary:
+            self.block_slice(self.ub, b)[:] = 1.0
+            self.block_slice(self.integer, b)[:] = True
+
+    def block_slice(self, v: np.ndarray, name: str) -> np.ndarray:
+        """View of block `name` inside the stacked vector `v`."""
+        start = self.offsets[name]
+        return v[start:start + int(np.prod(self.shapes[name]))]
+
+    def block(self, v: np.ndarray, name: str) -> np.ndarray:
+        """Block `name` of the stacked vector `v`, in its (items, days) shape."""
+        return self.block_slice(v, name).reshape(self.shapes[name])
+
+    def stack(self, blocks: Dict[str, np.ndarray]) -> np.ndarray:
+        """Stacked vector from per-block values; missing blocks and entries are NaN."""
+        v = np.full(self.n_vars, np.nan)
+        for name, values in blocks.items():
+            self.block_slice(v, name)[:] = np.asarray(values, dtype=float).reshape(-1)
+        return v
+
+
+def matrix_problem(cal: np.ndarray,
+                   fat: np.ndarray,
+                   carb: np.ndarray,
+                   protein: np.ndarray,
+                   prep_time: np.ndarray,
+                   burn_rate: np.ndarray,
+                   max_time: np.ndarray,
+                   params: Dict) -> MatrixProblem:
+    """
+    Assembles the constraint matrix of the FitPlanner model over the stacked
+    variable vector; `build_model_matrix` loads it into Gurobi and
+    optimization.backends into other solvers.
+    """
+    T = params["T"]
+    target_calorie_pd = params["target_calorie_pd"]
+    goal = params["goal"]
+    FT_day = params["FT_day"]
+    MPT_day = params["MPT_day"]
+    M = params["M"]
+    W = params["W"]
+    offset = params.get("deviation_offset", 0.0)
+    # Gurobi silently drops NaN terms from `quicksum`; zero them to match.
+    cal, fat, carb, protein, prep_time, burn_rate, max_time = (
+        np.nan_to_num(np.asarray(a, dtype=float))
+        for a in (cal, fat, carb, protein, prep_time, burn_rate, max_time)
+    )
+    n_meals = len(cal)
+    n_ex = len(burn_rate)
+
+    # Column offsets of each variable block in the stacked vector v
+    ox = 0
+    oy = ox + n_meals * T
+    ot = oy + n_ex * T
+    os_ = ot + n_ex * T
+    oz = os_ + T
+    rows = _RowBlocks(oz + 1)
+
+    days = np.arange(T)
+    meal_day = daily_sum_matrix(np.ones(n_meals), T)
+    ex_day = daily_sum_matrix(np.ones(n_ex), T)
+    intake = daily_sum_matrix(cal, T)
+    burn = daily_sum_matrix(burn_rate, T)
+    prep = daily_sum_matrix(prep_time, T)
+    eye_T = sp.eye(T, format="csr")
+
+    # Objective rows: Z >= ±(total intake - total burn + offset - T * target)
+    total = sp.csr_matrix(np.concatenate([
+        np.repeat(cal, T), np.zeros(n_ex * T), -np.repeat(burn_rate, T), np.zeros(T), [0.0]
+    ]))
+    z_col = _place(sp.csr_matrix([[1.0]]), oz, rows.n_cols)
+    rows.add(z_col - total, GRB.GREATER_EQUAL, [offset - T * target_calorie_pd], day=[-1], pos=0,
+             family="objective")
+    rows.add(z_col + total, GRB.GREATER_EQUAL, [T * target_calorie_pd - offset], day=[-1], pos=1,
+             family="objective")
+
+    # Calorie balance
+    net = rows.block((intake, ox), (-burn, ot))
+    if goal == "weight loss":
+        rows.add(net, GRB.LESS_EQUAL, np.full(T, target_calorie_pd), day=days, pos=0, family="calories")
+    elif goal == "weight gain":
+        rows.add(net, GRB.GREATER_EQUAL, np.full(T, target_calorie_pd), day=days, pos=0, family="calories")
+    else:  # endurance
+        rows.add(net, GRB.LESS_EQUAL, np.full(T, target_calorie_pd + 50), day=days, pos=0, family="calories")
+        rows.add(net, GRB.GREATER_EQUAL, np.full(T, target_calorie_pd - 50), day=days, pos=1, family="calories")
+
+    # Time
+    rows.add(rows.block((prep, ox)), GRB.LESS_EQUAL, np.full(T, MPT_day), day=days, pos=2,
+             family="prep_time")
+    rows.add(rows.block((prep, ox), (ex_day, ot)), GRB.LESS_EQUAL, np.full(T, FT_day),
+             day=days, pos=3, family="free_time")
+
+    # Meals count
+    rows.add(rows.block((meal_day, ox)), GRB.EQUAL, np.full(T, M), day=days, pos=4, family="meals")
+
+    # Link s[d] with y[j,d]: sum_j y[j,d] >= s[d] and y[j,d] <= s[d]
+    rows.add(rows.block((ex_day, oy), (-eye_T, os_)), GRB.GREATER_EQUAL, np.zeros(T),
+             day=days, pos=5, family="workout_link")
+    ex_rows = np.arange(n_ex * T)
+    rows.add(rows.block((sp.eye(n_ex * T), oy), (-sp.kron(np.ones((n_ex, 1)), eye_T), os_)),
+             GRB.LESS_EQUAL, np.zeros(n_ex * T), day=ex_rows % T, pos=6, sub=ex_rows // T,
+             family="workout_link")
+
+    # Max durations: t[j,d] <= y[j,d] * max_time[j]
+    rows.add(rows.block((sp.eye(n_ex * T), ot), (-sp.diags(np.repeat(max_time, T)), oy)),
+             GRB.LESS_EQUAL, np.zeros(n_ex * T), day=ex_rows % T, pos=7, sub=ex_rows // T,
+             family="duration")
+
+    # No repeats
+    if T > 1:
+        meal_pairs = np.arange(n_meals * (T - 1))
+        rows.add(rows.block((no_repeat_matrix(n_meals, T), ox)), GRB.LESS_EQUAL,
+                 np.ones(len(meal_pairs)), day=meal_pairs % (T - 1), pos=8,
+                 sub=meal_pairs // (T - 1), family="meal_repeats")
+        ex_pairs = np.arange(n_ex * (T - 1))
+        rows.add(rows.block((no_repeat_matrix(n_ex, T), oy)), GRB.LESS_EQUAL,
+                 np.ones(len(ex_pairs)), day=ex_pairs % (T - 1), pos=9,
+                 sub=ex_pairs // (T - 1), family="exercise_repeats")
+
+    # Macronutrients
+    bands = [(kcal, lo, hi) for kcal, (lo, hi) in zip((fat * 9, carb * 4, protein * 4), macro_bands(goal))]
+    for k, ((kcal, lo, hi), nutrient) in enumerate(zip(bands, MACROS)):
+        macro = rows.block((daily_sum_matrix(kcal, T), ox))
+        rows.add(macro, GRB.GREATER_EQUAL, np.full(T, lo * target_calorie_pd),
+                 day=days, pos=10 + 2 * k, family=nutrient)
+        rows.add(macro, GRB.LESS_EQUAL, np.full(T, hi * target_calorie_pd),
+                 day=days, pos=11 + 2 * k, family=nutrient)
+
+    # Weekly workout frequency, partial final week → min(|D_last|, W)
+    A, b = weekly_frequency_matrix(T, W)
+    rows.add(rows.block((sp.csr_matrix(A), os_)), GRB.EQUAL, b,
+             day=np.full(len(b), T), pos=0, sub=np.arange(len(b)), family="workout_frequency")
+
+    A, sense, rhs, families = rows.assemble()
+    shapes = {"x": (n_meals, T), "y": (n_ex, T), "t": (n_ex, T), "s": (T,), "Z": (1,)}
+    return MatrixProblem(A, sense, rhs, shapes, families)
+
+
+def problem_rhs(problem: MatrixProblem, params: Dict) -> np.ndarray:
+    """
+    Right-hand sides `matrix_problem` gives a problem of the same structure
+    (T, goal, M, W and items) under other calorie target, prep and free time
+    and deviation offset. A kept-alive model is re-targeted by setting these
+    instead of being rebuilt.
+    """
+    T = params["T"]
+    target = params["target_calorie_pd"]
+    offset = params.get("deviation_offset", 0.0)
+    families, sense = problem.families, problem.sense
+    rhs = problem.rhs.copy()
+    objective = np.flatnonzero(families == "objective")
+    rhs[objective] = [offset - T * target, T * target - offset]
+    calories = families == "calories"
+    if params["goal"] == "endurance":
+        rhs[calories & (sense == GRB.LESS_EQUAL)] = target + 50
+        rhs[calories & (sense == GRB.GREATER_EQUAL)] = target - 50
+    else:
+        rhs[calories] = target
+    rhs[families == "prep_time"] = params["MPT_day"]
+    rhs[families == "free_time"] = params["FT_day"]
+    for nutrient, (lo, hi) in zip(MACROS, macro_bands(params["goal"])):
+        rows = families == nutrient
+        rhs[rows & (sense == GRB.GREATER_EQUAL)] = lo * target
+        rhs[rows & (sense == GRB.LESS_EQUAL)] = hi * target
+    return rhs
+
+
+class _RowBlocks:
+    """
+    Collects constraint blocks over the stacked variable vector together with
+    a (day, position, item) key per row, so the final matrix can be sorted into
+    the loop builder's row order.
+    """
+
+    def __init__(self, n_cols: int):
+        self.n_cols = n_cols
+        self.blocks, self.senses, self.rhs, self.keys, self.families = [], [], [], [], []
+
+    def block(self, *parts) -> sp.csr_matrix:
+        """Sums (local matrix, column offset) parts into one full-width block."""
+        return sum(_place(A, offset, self.n_cols) for A, offset in parts)
+
+    def add(self, A, sense: str, rhs, day, pos: int, sub=None, family: str = ""):
+        n = A.shape[0]
+        self.blocks.append(sp.csr_matrix(A))
+        self.senses.append(np.full(n, sense))
+        self.families.append(np.full(n, family, dtype=object))
+        self.rhs.append(np.asarray(rhs, dtype=float))
+        sub = np.zeros(n, dtype=int) if sub is None else sub
+        self.keys.append(np.column_stack([
+            np.broadcast_to(day, n), np.full(n, pos), np.broadcast_to(sub, n)
+        ]))
+
+    def assemble(self):
+        keys = np.vstack(self.keys)
+        order = np.lexsort((keys[:, 2], keys[:, 1], keys[:, 0]))
+        A = sp.vstack(self.blocks, format="csr")[order]
+        A.eliminate_zeros()
+        return (A, np.concatenate(self.senses)[order], np.concatenate(self.rhs)[order],
+                np.concatenate(self.families)[order])
+
+
+def macro_bands(goal: str) -> List[tuple]:
+    """
+    Daily (min, max) fat, carb and protein calories as fractions of the daily
+    calorie target for a model goal ("weight loss", "weight gain", "endurance").
+    """
+    if goal in {"weight loss", "endurance"}:
+        return [(0.20, 0.35), (0.45, 0.65), (0.10, 0.35)]
+    return [(0.15, 0.30), (0.45, 0.60), (0.30, 0.35)]  # weight gain
+
+
+def _place(A, offset: int, n_cols: int) -> sp.csr_matrix:
+    """Shifts the columns of a local block to start at `offset` in an n_cols-wide matrix."""
+    A = sp.coo_matrix(A)
+    return sp.csr_matrix((A.data, (A.row, A.col + offset)), shape=(A.shape[0], n_cols))
+
+
+def daily_sum_matrix(coef: np.ndarray, T: int) -> sp.csr_matrix:
+    """
+    Returns the (T x items*T) matrix A such that A @ x.reshape(-1) gives, for
+    each day d, the sum over items i of coef[i] * x[i, d].
+    """
+    return sp.kron(np.asarray(coef, dtype=float).reshape(1, -1), sp.eye(T), format="csr")
+
+
+def no_repeat_matrix(n_items: int, T: int) -> sp.csr_matrix:
+    """
+    Returns the (items*(T-1) x items*T) matrix whose rows pair x[i, d] with
+    x[i, d+1], so that A @ x.reshape(-1) <= 1 forbids consecutive repeats.
+    """
+    pair = sp.diags([np.ones(T - 1), np.ones(T - 1)], [0, 1], shape=(T - 1, T))
+    return sp.kron(sp.eye(n_items), pair, format="csr")
+
+
+def weekly_frequency_matrix(T: int, W: int):
+    """
+    Returns the 0/1 week-membership matrix A (weeks x T) and right-hand side b
+    such that A @ s == b encodes the weekly workout-day requirement.
+    """
+    num_weeks = T // 7
+    rows = num_weeks + (1 if T % 7 > 0 else 0)
+    A = np.zeros((rows, T))
+    b = np.zeros(rows)
+    for w in range(rows):
+        week_days = slice(w * 7, min((w + 1) * 7, T))
+        A[w, week_days] = 1.0
+        b[w] = W if w < num_weeks else min(T - num_weeks * 7, W)
+    return A, b
+
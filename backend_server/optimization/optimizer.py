@@ -1,10 +1,25 @@
-from datetime import datetime, timedelta, timezone
-from typing import List, Dict
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Dict, Optional
 import logging
-from gurobipy import Model, GRB, quicksum
-
-from data.preprocessing import filter_diets, filter_exercises
+import numpy as np
+from gurobipy import Model, GRB, GurobiError, MVar, quicksum
+
+from data.macro_index import diet_index
+from data.preprocessing import DIET_CATALOG, EXERCISE_CATALOG, select_diets, select_exercises
+from optimization.environment import thread_env
+from optimization.backends import SOLVER_BACKEND, resolve_backend, can_fall_back, solve_highs
+from optimization.diagnostics import explain_infeasibility
+from optimization.matrix_builder import build_model_matrix, matrix_problem, macro_bands
+from optimization.presolve import presolve_meals, max_daily_burn
+from optimization.day_patterns import build_pattern_model
+from optimization.pattern_library import LIBRARIES
+from optimization.result_cache import RESULT_CACHE, fingerprint
+from optimization.rolling_horizon import ROLLING_WINDOW_DAYS, ROLLING_WINDOW_TIME_LIMIT, resolve_solver_mode, solve_windows
+from optimization.tuning import DEFAULT_TIME_LIMIT, latency_deadline, solve_params
+from optimization.variety import restore_variety
+from optimization.warm_start import warm_start, apply_start
 from utils.calculations import compute_user_metrics
+from utils.instrumentation import current_trace, traced
 from models.output_schema import Meal, Exercise, DailyPlan, WeeklyInfo, OptimizationResult
 
 logging.basicConfig(level=logging.INFO)
@@ -33,12 +48,21 @@ GUROBI_STATUS_CODES = {
 }
 
 
+# Statuses whose result depends only on the model and may be reused
+CACHEABLE_STATUSES = {GRB.OPTIMAL, GRB.TIME_LIMIT, GRB.INFEASIBLE}
+
+
 ##############################################
 # Helper function: Diagnose Infeasible Model
 ##############################################
-def diagnose_model(diets_df, ex_df, user_params, metrics) -> List[str]:
+def diagnose_model(diets, exercises, user_params, metrics) -> List[str]:
     """
     Aggregates diagnostic recommendations for an infeasible model.
+    `diets` and `exercises` are the filtered catalog views (of DIET_CATALOG
+    and EXERCISE_CATALOG).
+    With the request's `explainInfeasibility`, also reports the constraint
+    families that block the plan and the minimum relaxation that fixes it
+    (see optimization.diagnostics).
     Returns a list of recommendation strings.
     """
     recommendations = []
@@ -60,172 +84,230 @@ def diagnose_model(diets_df, ex_df, user_params, metrics) -> List[str]:
             f"Consider reducing your target weight change or extending your planning horizon."
         )
 
-    # 2. Meal Calorie Feasibility:
-    min_calories = diets_df['calories'].min()
-    max_calories = diets_df['calories'].max()
-    min_daily_calories = min_calories * M
-    max_daily_calories = max_calories * M
-    if target_calorie_pd < min_daily_calories:
-        recommendations.append(
-            f"Your targetted calorie intake per day ({target_calorie_pd}) is too low for {M} meals per day. Consider reducing meals per day or extending your horizon from {T} days."
-        )
-    elif target_calorie_pd > max_daily_calories:
+    if len(diets) == 0:
         recommendations.append(
-            f"Your targetted calorie intake per day ({target_calorie_pd})is too high for {M} meals per day. Consider increasing the number of meals per day or extending your horizon from {T} days."
+            "No meals match your diet restrictions and cuisine preferences. Consider relaxing them."
         )
+    else:
+        # 2. Meal Calorie Feasibility:
+        min_calories = np.nanmin(diets['calories'])
+        max_calories = np.nanmax(diets['calories'])
+        min_daily_calories = min_calories * M
+        max_daily_calories = max_calories * M
+        if target_calorie_pd < min_daily_calories:
+            recommendations.append(
+                f"Your targetted calorie intake per day ({target_calorie_pd}) is too low for {M} meals per day. Consider reducing meals per day or extending your horizon from {T} days."
+            )
+        elif target_calorie_pd > max_daily_calories:
+            recommendations.append(
+                f"Your targetted calorie intake per day ({target_calorie_pd})is too high for {M} meals per day. Consider increasing the number of meals per day or extending your horizon from {T} days."
+            )
 
-    # 3. Meal Prep Time Feasibility:
-    min_meal_time = diets_df['total_time_in_minutes'].min()
-    total_min_prep_time = min_meal_time * M
-    if total_min_prep_time > MPT_day:
-        recommendations.append(
-            "The fastest possible meal prep time exceeds your available time. Consider reducing meals per day or increasing available meal prep time."
-        )
+        # 3. Meal Prep Time Feasibility:
+        min_meal_time = np.nanmin(diets['total_time_in_minutes'])
+        total_min_prep_time = min_meal_time * M
+        if total_min_prep_time > MPT_day:
+            recommendations.append(
+                "The fastest possible meal prep time exceeds your available time. Consider reducing meals per day or increasing available meal prep time."
+            )
 
-    # 4. Macronutrient Feasibility:
-    goal = user_params["goalType"]
-    if goal in {"weight_loss", "endurance"}:
-        fat_min, fat_max = 0.2, 0.35
-        carb_min, carb_max = 0.45, 0.65
-        protein_min, protein_max = 0.1, 0.35
-    else:
-        fat_min, fat_max = 0.15, 0.3
-        carb_min, carb_max = 0.45, 0.6
-        protein_min, protein_max = 0.3, 0.35
-
-    meals_in_range = 0
-    for _, meal in diets_df.iterrows():
-        fat_cal = meal['fat'] * 9
-        carb_cal = meal['carbs'] * 4
-        protein_cal = meal['protein'] * 4
-        total_cal = fat_cal + carb_cal + protein_cal
-        fat_pct = fat_cal / total_cal
-        carb_pct = carb_cal / total_cal
-        protein_pct = protein_cal / total_cal
-        if (fat_min <= fat_pct <= fat_max and
-            carb_min <= carb_pct <= carb_max and
-            protein_min <= protein_pct <= protein_max):
-            meals_in_range += 1
-
-    if meals_in_range < M:
-        recommendations.append(
-            "Not enough meals in our dataset meet the desired macronutrient balance. Consider increasing meals per day."
-        )
+        # 4. Macronutrient Feasibility: meals whose fat/carb/protein calorie
+        # shares all sit inside the goal's bands, counted on the macro-space index
+        bands = macro_bands(user_params["goalType"].replace("_", " "))
+        meals_in_range = diet_index().count(dict(zip(("fat_pct", "carb_pct", "protein_pct"), bands)), diets.rows)
+
+        if meals_in_range < M:
+            recommendations.append(
+                "Not enough meals in our dataset meet the desired macronutrient balance. Consider increasing meals per day."
+            )
 
     # 5. Exercise Options Feasibility:
-    if len(ex_df) == 0:
+    if len(exercises) == 0:
         recommendations.append("No exercise options are available. Consider adding more exercise data.")
 
+    # 6. Minimum relaxation of the daily rules (optional, solves a reduced model):
+    explanation = []
+    if user_params.get("explainInfeasibility") and len(diets) and len(exercises):
+        backend = user_params.get("solverBackend") or SOLVER_BACKEND
+        explanation = explain_infeasibility(model_arrays(diets, exercises),
+                                            model_parameters(user_params, metrics), backend)
+
     if recommendations:
-        return [summary] + recommendations
+        return [summary] + recommendations + explanation
     else:
-        return [summary, "All input parameters appear feasible."]
+        return [summary, "All input parameters appear feasible."] + explanation
 
 
 #########################################################
 # Helper function: Generate Optimization Output (JSON)
 #########################################################
-def generate_optimization_output(model: Model,
-                                 days: range,
-                                 meals: List,
-                                 exercises: List,
-                                 x, t,
-                                 recipe: Dict,
-                                 cal: Dict,
-                                 fat: Dict,
-                                 carb: Dict,
-                                 protein: Dict,
-                                 prep_time: Dict,
-                                 ex_name: Dict,
-                                 workout_type: Dict,
-                                 location: Dict,
-                                 burn_rate: Dict,
-                                 user_params: Dict,
-                                 metrics: Dict,
-                                 diets_df, ex_df) -> str:
+def plan_from_solution(x_val, t_val,
+                       days: range,
+                       meals: List,
+                       exercises: List,
+                       recipe: Dict,
+                       cal: Dict,
+                       fat: Dict,
+                       carb: Dict,
+                       protein: Dict,
+                       prep_time: Dict,
+                       ex_name: Dict,
+                       workout_type: Dict,
+                       location: Dict,
+                       burn_rate: Dict,
+                       user_params: Dict,
+                       start_date: date):
     """
-    Extracts the solution from the Gurobi model and aggregates the result in a JSON-compatible
-    dictionary that conforms to the output schema.
-    It includes a 'status' field and 'recommendations' if the model is infeasible.
+    Turns solution values into the daily plan and weekly summary.
+    `x_val` and `t_val` are (items, days) arrays of the values of x and t,
+    e.g. from `x.X` of an MVar or `model.cbGetSolution(x)` in a callback, or
+    mappings {(item, day): value} such as `model.getAttr("X", x)` of a tupledict.
+    Daily totals are computed on the arrays; Pydantic objects are only built
+    for the selected meals and exercises. Repeated meals then get their
+    near-duplicate variants back (see optimization.variety).
+    Returns (plan, weekly_info).
     """
-    start_date = datetime.now().date()
-    plan: List[DailyPlan] = []
-    recommendations: List[str] = []
+    x_val = solution_array(x_val, meals, days)
+    t_val = solution_array(t_val, exercises, days)
+    picked = x_val > 0.5
+    active = t_val > 0.001
+    meal_cal = np.array([cal[i] for i in meals], dtype=float).reshape(-1, 1)
+    meal_time = np.array([prep_time[i] for i in meals], dtype=float).reshape(-1, 1)
+    burn = np.array([burn_rate[j] for j in exercises], dtype=float).reshape(-1, 1)
+
+    # Daily totals; unselected entries add exact zeros, so the sums match the
+    # per-item additions in item order.
+    intake = np.where(picked, meal_cal, 0.0).sum(axis=0)
+    burned = np.where(active, t_val * burn, 0.0).sum(axis=0)
+    net = intake - burned
+    exercise_time_total = np.where(active, t_val, 0.0).sum(axis=0)
+    total_time_used = np.where(picked, meal_time, 0.0).sum(axis=0) + exercise_time_total
 
-    # If model is solved (OPTIMAL or TIME_LIMIT), extract solution.
-    if model.status in [GRB.OPTIMAL, GRB.TIME_LIMIT]:
-        total_time_week = 0.0
-        total_exercise_time_week = 0.0
-        total_net_cal_week = 0.0
-        days_count_for_week = 0
-
-        for d in days:
-            current_date = start_date + timedelta(days=d)
-            selected_meal_indices = [i for i in meals if x[i, d].x > 0.5]
-            selected_exercise_indices = [(j, t[j, d].x) for j in exercises if t[j, d].x > 0.001]
-
-            intake = sum(cal[i] for i in selected_meal_indices)
-            burned = sum(t_val * burn_rate[j] for j, t_val in selected_exercise_indices)
-            net = intake - burned
-            meal_time_total = sum(prep_time[i] for i in selected_meal_indices)
-            exercise_time_total = sum(t_val for _, t_val in selected_exercise_indices)
-            total_time_used = meal_time_total + exercise_time_total
-
-            selected_meals = []
-            for i in selected_meal_indices:
-                macros = {"carbs": float(carb[i]), "protein": float(protein[i]), "fat": float(fat[i])}
-                meal_obj = Meal(
-                    recipe=recipe[i],
-                    calories=float(cal[i]),
-                    macros=macros,
-                    total_time=float(prep_time[i])
-                )
-                selected_meals.append(meal_obj)
-
-            selected_exercises = []
-            for j, duration in selected_exercise_indices:
-                ex_obj = Exercise(
-                    name=ex_name[j],
-                    type=workout_type[j],
-                    location=location[j],
-                    duration=duration,
-                    estimated_calories_burned=duration * burn_rate[j]
-                )
-                selected_exercises.append(ex_obj)
-
-            daily_plan = DailyPlan(
-                day=current_date,
-                selected_meals=selected_meals,
-                selected_exercises=selected_exercises,
-                total_time_used=total_time_used,
-                total_net_calories=net
+    plan: List[DailyPlan] = []
+    for k, d in enumerate(days):
+        selected_meals = [
+            Meal(
+                recipe=recipe[meals[i]],
+                calories=float(cal[meals[i]]),
+                macros={"carbs": float(carb[meals[i]]), "protein": float(protein[meals[i]]),
+                        "fat": float(fat[meals[i]])},
+                total_time=float(prep_time[meals[i]])
             )
-            plan.append(daily_plan)
+            for i in np.flatnonzero(picked[:, k])
+        ]
+        selected_exercises = [
+            Exercise(
+                name=ex_name[exercises[j]],
+                type=workout_type[exercises[j]],
+                location=location[exercises[j]],
+                duration=t_val[j, k],
+                estimated_calories_burned=t_val[j, k] * burn_rate[exercises[j]]
+            )
+            for j in np.flatnonzero(active[:, k])
+        ]
+        plan.append(DailyPlan(
+            day=start_date + timedelta(days=d),
+            selected_meals=selected_meals,
+            selected_exercises=selected_exercises,
+            total_time_used=total_time_used[k],
+            total_net_calories=net[k]
+        ))
+
+    # Near-duplicates removed from the catalog vary repeated meals again.
+    plan = restore_variety(plan, user_params)
+    total_time_used = np.array([p.total_time_used for p in plan], dtype=float)
+    net = np.array([p.total_net_calories for p in plan], dtype=float)
+
+    # For weekly aggregates, use the first 7 days.
+    week = np.array([d < 7 for d in days], dtype=bool)
+    days_count_for_week = int(week.sum())
+    avg_free_time_used = total_time_used[week].sum() / days_count_for_week if days_count_for_week else 0.0
+    avg_workout_duration = exercise_time_total[week].sum() / days_count_for_week if days_count_for_week else 0.0
+    avg_net_calories = net[week].sum() / days_count_for_week if days_count_for_week else 0.0
+
+    free_time_week = user_params.get("freeTime", 0) * 60 * user_params.get("daysWeek", 7)
+
+    weekly_info = WeeklyInfo(
+        free_time_week=free_time_week,
+        avg_free_time_used=avg_free_time_used,
+        avg_workout_duration=avg_workout_duration,
+        meals_per_day=user_params.get("mealsPerDay", 0),
+        avg_net_calories=avg_net_calories
+    )
+    return plan, weekly_info
 
-            if d < 7:  # For weekly aggregates, use first 7 days.
-                total_time_week += total_time_used
-                total_exercise_time_week += exercise_time_total
-                total_net_cal_week += net
-                days_count_for_week += 1
 
-        avg_free_time_used = total_time_week / days_count_for_week if days_count_for_week else 0.0
-        avg_workout_duration = total_exercise_time_week / days_count_for_week if days_count_for_week else 0.0
-        avg_net_calories = total_net_cal_week / days_count_for_week if days_count_for_week else 0.0
+def solution_array(values, rows: List, days: range) -> np.ndarray:
+    """
+    Solution values as a (rows, days) array: arrays pass through, mappings
+    {(row, day): value} are read once per entry.
+    """
+    if isinstance(values, np.ndarray):
+        return values.reshape(len(rows), len(days))
+    return np.array([[values[r, d] for d in days] for r in rows], dtype=float).reshape(len(rows), len(days))
 
-        free_time_week = user_params.get("freeTime", 0) * 60 * user_params.get("daysWeek", 7)
 
-        weekly_info = WeeklyInfo(
-            free_time_week=free_time_week,
-            avg_free_time_used=avg_free_time_used,
-            avg_workout_duration=avg_workout_duration,
-            meals_per_day=user_params.get("mealsPerDay", 0),
-            avg_net_calories=avg_net_calories
+def generate_optimization_output(model: Model, x, t, **kwargs) -> OptimizationResult:
+    """
+    Reads the solution of a solved Gurobi model; `x` and `t` are its (items,
+    days) MVars, read in one call each, or tupledicts. The other arguments
+    are those of `optimization_result`.
+    """
+    solved = model.SolCount > 0 and model.status in [GRB.OPTIMAL, GRB.TIME_LIMIT]
+
+    def values(var):
+        return var.X if isinstance(var, MVar) else model.getAttr("X", var)
+
+    return optimization_result(
+        model.status,
+        values(x) if solved else None,
+        values(t) if solved else None,
+        **kwargs
+    )
+
+
+def optimization_result(status: int,
+                        x_val, t_val,
+                        days: range,
+                        meals: List,
+                        exercises: List,
+                        recipe: Dict,
+                        cal: Dict,
+                        fat: Dict,
+                        carb: Dict,
+                        protein: Dict,
+                        prep_time: Dict,
+                        ex_name: Dict,
+                        workout_type: Dict,
+                        location: Dict,
+                        burn_rate: Dict,
+                        user_params: Dict,
+                        metrics: Dict,
+                        diets_view, exercises_view,
+                        start_date: Optional[date] = None) -> OptimizationResult:
+    """
+    Aggregates a solve's outcome into a result that conforms to the output
+    schema, whichever backend solved it. `status` is a Gurobi status code;
+    `x_val` and `t_val` map (item, day) to solution values, or are None when
+    there is no solution.
+    It includes a 'status' field and 'recommendations' if the model is infeasible.
+    """
+    start_date = start_date or datetime.now().date()
+    plan: List[DailyPlan] = []
+    recommendations: List[str] = []
+
+    # If model is solved (OPTIMAL or TIME_LIMIT), extract solution.
+    if status in [GRB.OPTIMAL, GRB.TIME_LIMIT] and x_val is not None:
+        plan, weekly_info = plan_from_solution(
+            x_val, t_val, days, meals, exercises,
+            recipe, cal, fat, carb, protein, prep_time, ex_name, workout_type,
+            location, burn_rate, user_params, start_date
         )
-        status_str = GUROBI_STATUS_CODES.get(model.status, "UNKNOWN")
+        status_str = GUROBI_STATUS_CODES.get(status, "UNKNOWN")
     # If infeasible, diagnose.
-    elif model.status == GRB.INFEASIBLE:
-        recommendations = diagnose_model(diets_df, ex_df, user_params, metrics)
-        status_str = GUROBI_STATUS_CODES.get(model.status, "UNKNOWN")
+    elif status == GRB.INFEASIBLE:
+        recommendations = diagnose_model(diets_view, exercises_view, user_params, metrics)
+        status_str = GUROBI_STATUS_CODES.get(status, "UNKNOWN")
         weekly_info = WeeklyInfo(
             free_time_week=0,
             avg_free_time_used=0,
@@ -235,8 +317,8 @@ def generate_optimization_output(model: Model,
         )
         plan = []
     else:
-        recommendations = [f"Model ended with status {model.status}."]
-        status_str = GUROBI_STATUS_CODES.get(model.status, "UNKNOWN")
+        recommendations = [f"Model ended with status {status}."]
+        status_str = GUROBI_STATUS_CODES.get(status, "UNKNOWN")
         weekly_info = WeeklyInfo(
             free_time_week=0,
             avg_free_time_used=0,
@@ -255,58 +337,129 @@ def generate_optimization_output(model: Model,
     return output
 
 
+def incumbent_callback(observer, publish, days: range, x, t, start_date: date, output_args: Dict):
+    """
+    Gurobi callback for solves followed by an `observer` (see optimization.jobs):
+      - on every MIPSOL, converts the new incumbent into an OptimizationResult
+        with status INPROGRESS and hands it to `publish`;
+      - once `observer.cancelled` is set, stops the solve with model.terminate().
+    """
+    plan_args = {k: v for k, v in output_args.items()
+                 if k not in ("metrics", "diets_view", "exercises_view")}
+
+    def callback(model, where):
+        if observer.cancelled:
+            model.terminate()
+            return
+        if where != GRB.Callback.MIPSOL:
+            return
+        try:
+            plan, weekly_info = plan_from_solution(
+                model.cbGetSolution(x), model.cbGetSolution(t), days,
+                start_date=start_date, **plan_args
+            )
+            publish(OptimizationResult(
+                plan=plan,
+                weekly_info=weekly_info,
+                status=GUROBI_STATUS_CODES[GRB.INPROGRESS],
+                recommendations=[]
+            ))
+        except Exception as e:
+            logging.error("Failed to publish incumbent: %s", e, exc_info=True)
+
+    return callback
+
+
 ##########################################
-# Full Solver: Build and Solve the Model
+# Model Builders
 ##########################################
-def solve_optimization(user_params: dict) -> dict:
+def model_parameters(user_params: dict, metrics: dict) -> dict:
     """
-    Runs the full optimization process given user parameters.
-    It filters the data, computes metrics, builds and optimizes the model,
-    and returns the results as a dictionary conforming to the output schema.
+    Derives the scalar parameters shared by every model builder from the
+    user's input and their computed metrics.
     """
-    # --- Preprocessing ---
-    filtered_diets = filter_diets(user_params)
-    filtered_exercises = filter_exercises(user_params)
-    metrics = compute_user_metrics(user_params)
+    return {
+        "T": metrics["days_to_target"],
+        "target_calorie_pd": metrics["target_calorie_per_day"],
+        "goal": user_params["goalType"].replace("_", " "),
+        "FT_day": user_params["freeTime"] * 60,
+        "MPT_day": user_params["mealPrepTime"] * user_params["mealsPerDay"],
+        "M": user_params["mealsPerDay"],
+        "W": user_params["daysWeek"],
+    }
 
-    # Setup parameters
-    T = metrics["days_to_target"]
-    target_calorie_pd = metrics["target_calorie_per_day"]
-    goal = user_params["goalType"].replace("_", " ")
-    FT_day = user_params["freeTime"] * 60
-    MPT_day = user_params["mealPrepTime"] * user_params["mealsPerDay"]
-    M = user_params["mealsPerDay"]
-    W = user_params["daysWeek"]
+
+def max_exercise_time(activity_type: str) -> int:
+    """Maximum minutes per day allowed for a single exercise of the given type."""
+    if activity_type == "Sports":
+        return 60
+    if activity_type == "Outdoor/Water":
+        return 30
+    return 20
+
+
+def model_arrays(diets, exercises) -> Dict[str, np.ndarray]:
+    """Per-meal and per-exercise arrays of the filtered views, as taken by `build_model_matrix`."""
+    return {
+        "cal": diets['calories'],
+        "fat": diets['fat'],
+        "carb": diets['carbs'],
+        "protein": diets['protein'],
+        "prep_time": diets['total_time_in_minutes'],
+        "burn_rate": exercises['calories_burned_per_min'],
+        "max_time": np.array([max_exercise_time(a) for a in exercises['activity_type']], dtype=float),
+    }
+
+
+def output_arguments(diets, exercises, user_params: dict, metrics: dict, diets_view) -> Dict:
+    """
+    Keyword arguments of `optimization_result` (and, without metrics and the
+    views, `plan_from_solution`) for a model over the `diets` and `exercises`
+    views. `diets_view` is the filtered catalog before presolve, for diagnostics.
+    """
+    meals_idx = diets.rows.tolist()
+    exercises_idx = exercises.rows.tolist()
+    return dict(
+        meals=meals_idx,
+        exercises=exercises_idx,
+        recipe=dict(zip(meals_idx, diets['recipe'])),
+        cal=dict(zip(meals_idx, diets['calories'])),
+        fat=dict(zip(meals_idx, diets['fat'])),
+        carb=dict(zip(meals_idx, diets['carbs'])),
+        protein=dict(zip(meals_idx, diets['protein'])),
+        prep_time=dict(zip(meals_idx, diets['total_time_in_minutes'])),
+        ex_name=dict(zip(exercises_idx, exercises['exercise_name'])),
+        workout_type=dict(zip(exercises_idx, exercises['activity_type'])),
+        location=dict(zip(exercises_idx, exercises['workout_location'])),
+        burn_rate=dict(zip(exercises_idx, exercises['calories_burned_per_min'])),
+        user_params=user_params,
+        metrics=metrics,
+        diets_view=diets_view,
+        exercises_view=exercises
+    )
+
+
+def build_model(meals_idx: List, exercises_idx: List,
+                cal: Dict, fat: Dict, carb: Dict, protein: Dict, prep_time: Dict,
+                burn_rate: Dict, max_time: Dict, params: Dict):
+    """
+    Reference builder: adds every term and constraint one at a time.
+    Kept for comparison against the matrix builder in
+    `optimization.matrix_builder`; both produce the same model.
+    Returns (model, x, y, t, s, Z).
+    """
+    T = params["T"]
+    target_calorie_pd = params["target_calorie_pd"]
+    goal = params["goal"]
+    FT_day = params["FT_day"]
+    MPT_day = params["MPT_day"]
+    M = params["M"]
+    W = params["W"]
     num_weeks = T // 7
     has_partial_week = T % 7 > 0
 
-    # --- Build Model ---
-    model = Model("FitPlanner")
-    model.Params.OutputFlag = 0
-    model.setParam('TimeLimit', 300)
-
+    model = Model("FitPlanner", env=thread_env())
     days = range(T)
-    meals_idx = list(filtered_diets.index)
-    exercises_idx = list(filtered_exercises.index)
-
-    # Extract parameters
-    recipe     = {i: filtered_diets.loc[i, 'recipe'] for i in meals_idx}
-    cal        = {i: filtered_diets.loc[i, 'calories'] for i in meals_idx}
-    fat        = {i: filtered_diets.loc[i, 'fat'] for i in meals_idx}
-    carb       = {i: filtered_diets.loc[i, 'carbs'] for i in meals_idx}
-    protein    = {i: filtered_diets.loc[i, 'protein'] for i in meals_idx}
-    prep_time  = {i: filtered_diets.loc[i, 'total_time_in_minutes'] for i in meals_idx}
-    ex_name    = {j: filtered_exercises.loc[j, 'exercise_name'] for j in exercises_idx}
-    location   = {j: filtered_exercises.loc[j, 'workout_location'] for j in exercises_idx}
-    burn_rate  = {j: filtered_exercises.loc[j, 'calories_burned_per_min'] for j in exercises_idx}
-    workout_type = {j: filtered_exercises.loc[j, 'activity_type'] for j in exercises_idx}
-
-    max_time = {
-        j: 60  if workout_type[j]=="Sports"
-           else 30  if workout_type[j]=="Outdoor/Water"
-           else 20
-        for j in exercises_idx
-    }
 
     # Decision variables
     x     = model.addVars(meals_idx, days,     vtype=GRB.BINARY,    name="x")
@@ -406,34 +559,320 @@ def solve_optimization(user_params: dict) -> dict:
             name="partial_week"                          # <<< CHANGED >>>
         )
 
-    # Solve
-    model.optimize()
+    return model, x, y, t_var, s, Z
+
+
+##########################################
+# Full Solver: Build and Solve the Model
+##########################################
+@traced("optimize")
+def solve_optimization(user_params: dict, builder: str = "matrix", use_cache: bool = True,
+                       mode: Optional[str] = None, solver_params: Optional[Dict] = None,
+                       observer=None, use_warm_start: bool = True, use_presolve: bool = True,
+                       backend: Optional[str] = None, catalog=None,
+                       deadline: Optional[float] = None) -> dict:
+    """
+    Runs the full optimization process given user parameters.
+    It filters the data, computes metrics, builds and optimizes the model,
+    and returns the results as a dictionary conforming to the output schema.
+    `builder` selects the vectorized "matrix" builder (default) or the
+    reference "loop" builder.
+    With `use_cache`, requests that map to an already-solved model are served
+    from RESULT_CACHE, re-dated to start today.
+    `mode` (default: the request's `solverMode`, else "auto") picks one
+    monolithic model, the week-by-week rolling horizon solver or the
+    day-pattern formulation; "auto" uses the rolling horizon for horizons
+    above ROLLING_HORIZON_THRESHOLD days and the monolithic model otherwise
+    (always the monolithic model on the highs backend).
+    `solver_params` are extra Gurobi parameters (e.g. a `Threads` budget)
+    applied to every model solved for this request, on top of the tuned
+    parameters for the instance (see optimization.tuning).
+    `deadline` (a time.monotonic() time, default: the request's
+    `maxLatencyMs` from now) caps the time limits so the best plan found by
+    then is returned; such time-limited plans are not cached.
+    An `observer` (see optimization.jobs) receives every improving incumbent
+    through `observer.incumbent(result)` and can stop the solve by setting
+    `observer.cancelled`.
+    With `use_warm_start`, Gurobi starts from the greedy heuristic's plan,
+    overlaid with the request's `previousPlan` days where they still apply.
+    With `use_presolve`, meals that cannot improve the plan are dropped before
+    the model is built (see optimization.presolve).
+    `backend` (default: the request's `solverBackend`, else SOLVER_BACKEND)
+    picks the solver, see optimization.backends; "auto" requests that Gurobi
+    rejects for licensing are re-solved with HiGHS.
+    `catalog` (a CatalogGroup, see optimization.batch) supplies the filtered
+    views and the presolve MealPool shared by users with the same preferences.
+    Each request's stage timings and solver statistics are recorded on its
+    trace (see utils.instrumentation).
+    """
+    trace = current_trace()
+    if deadline is None:
+        deadline = latency_deadline(user_params.get("maxLatencyMs"))
+    # --- Preprocessing ---
+    if catalog is not None:
+        diets, exercises, meal_pool = catalog.diets, catalog.exercises, catalog.meal_pool
+    else:
+        with trace.stage("filter"):
+            diets = DIET_CATALOG.view(select_diets(user_params))
+            exercises = EXERCISE_CATALOG.view(select_exercises(user_params))
+        meal_pool = None
+    with trace.stage("metrics"):
+        metrics = compute_user_metrics(user_params)
+
+        # Setup parameters
+        params = model_parameters(user_params, metrics)
+    trace.set(horizon=params["T"], meals=len(diets), exercises=len(exercises))
+
+    # Diagnostics always look at the full filtered catalog.
+    diets_filtered = diets
+    if use_presolve:
+        with trace.stage("presolve"):
+            max_burn = max_daily_burn(exercises['calories_burned_per_min'], params["FT_day"])
+            diets = DIET_CATALOG.view(presolve_meals(diets, params, max_burn, pool=meal_pool)[0])
+    days = range(params["T"])
+    meals_idx = diets.rows.tolist()
+    exercises_idx = exercises.rows.tolist()
+    requested_backend = backend or user_params.get("solverBackend") or SOLVER_BACKEND
+    mode = resolve_solver_mode(mode or user_params.get("solverMode") or "auto", params["T"], requested_backend)
+    if mode in ("rolling", "patterns") and builder != "matrix":
+        raise ValueError(f"The {mode} solver requires the matrix builder")
+    n_vars = (len(meals_idx) + 2 * len(exercises_idx) + 1) * params["T"] + 1
+    backend = resolve_backend(requested_backend, mode, n_vars)
+    if backend != "gurobi" and builder != "matrix":
+        raise ValueError(f"The {backend} backend requires the matrix builder")
+    trace.set(mode=mode, backend=backend)
+
+    def highs_fallback(error: GurobiError):
+        if not can_fall_back(requested_backend, error):
+            raise error
+        logging.warning("Gurobi rejected the model (%s), re-solving with HiGHS", error)
+        return solve_optimization(user_params, "matrix", use_cache, "monolithic", solver_params,
+                                  observer, use_warm_start, use_presolve, backend="highs", catalog=catalog,
+                                  deadline=deadline)
+
+    def cacheable(status: int) -> bool:
+        # A plan cut short by the latency budget must not answer requests without one.
+        return status in CACHEABLE_STATUSES and not (deadline is not None and status == GRB.TIME_LIMIT)
+
+    def tuned_params(T: int, time_limit: float = DEFAULT_TIME_LIMIT, until: Optional[float] = deadline):
+        return solve_params(T, len(meals_idx), user_params["goalType"], params["M"], solver_params,
+                            until, time_limit)
+
+    variant = mode if backend == "gurobi" else f"{mode}:{backend}"
+    cache_key = fingerprint(diets.rows, exercises.rows, params, variant=variant) if use_cache else None
+    if cache_key:
+        cached = RESULT_CACHE.get(cache_key)
+        trace.set(cache="miss" if cached is None else "hit")
+        if cached is not None:
+            logging.info("Result cache hit %s: %s", cache_key[:12], RESULT_CACHE.stats())
+            if cached.status == GUROBI_STATUS_CODES[GRB.INFEASIBLE]:
+                # Recommendations also depend on inputs outside the model (e.g. weights).
+                cached.recommendations = diagnose_model(diets_filtered, exercises, user_params, metrics)
+            return cached
+
+    # Extract parameters
+    arrays = model_arrays(diets, exercises)
+    mip_start = None
+    if use_warm_start:
+        with trace.stage("warm_start"):
+            shares = np.column_stack([diets['fat_pct'], diets['carb_pct'], diets['protein_pct']])
+            mip_start = warm_start(arrays, shares, params, diets['recipe'], exercises['exercise_name'],
+                                   user_params.get("previousPlan"), datetime.now().date())
+    output_args = output_arguments(diets, exercises, user_params, metrics, diets_filtered)
+
+    # --- HiGHS: the monolithic model in matrix form ---
+    if backend == "highs":
+        status, output = solve_with_highs(arrays, params, mip_start, tuned_params(params["T"]),
+                                          observer, output_args, deadline)
+        if cache_key and cacheable(status):
+            RESULT_CACHE.put(cache_key, output)
+        return output
+
+    # --- Rolling horizon: one window at a time ---
+    if mode == "rolling":
+        start_date = datetime.now().date()
+        window_outputs = []
+        statuses = []
+        callback_factory = None
+        if observer is not None:
+            def publish(result):
+                merged = merge_window_outputs([GRB.OPTIMAL] * (len(window_outputs) + 1),
+                                              window_outputs + [result])[1]
+                merged.status = result.status
+                observer.incumbent(merged)
+
+            def callback_factory(first_day, x_w, t_w):
+                window_days = range(x_w.shape[1])
+                return incumbent_callback(observer, publish, window_days, x_w, t_w,
+                                          start_date + timedelta(days=first_day), output_args)
+
+        try:
+            window_params = tuned_params(min(ROLLING_WINDOW_DAYS, params["T"]), ROLLING_WINDOW_TIME_LIMIT, None)
+            for first_day, model, x_m, t_m in solve_windows(arrays, params, solver_params=window_params,
+                                                            callback_factory=callback_factory,
+                                                            mip_start=mip_start, deadline=deadline):
+                window_days = range(x_m.shape[1])
+                statuses.append(model.status)
+                with trace.stage("extract"):
+                    window_outputs.append(generate_optimization_output(
+                        model=model,
+                        days=window_days,
+                        x=x_m,
+                        t=t_m,
+                        start_date=start_date + timedelta(days=first_day),
+                        **output_args
+                    ))
+        except GurobiError as e:
+            return highs_fallback(e)
+        with trace.stage("extract"):
+            status, output = merge_window_outputs(statuses, window_outputs)
+        if cache_key and cacheable(status):
+            RESULT_CACHE.put(cache_key, output)
+        return output
+
+    # --- Build Model ---
+    exhaustive = True
+    try:
+        with trace.stage("build"):
+            if mode == "patterns":
+                # Feasible days precomputed for the user's diet filters, if exported.
+                library = LIBRARIES.lookup(diets_filtered.rows, diets.rows, params)
+                model, x_m, y_m, t_m, s_m, _, _, pool, exhaustive = build_pattern_model(
+                    arrays, params, mip_start, solver_params, library
+                )
+                # The master only has x for the meals its day patterns use.
+                output_args["meals"] = [meals_idx[k] for k in pool]
+                if mip_start is not None:
+                    mip_start = dict(mip_start, x=mip_start["x"][pool])
+                start_vars = {"x": x_m, "y": y_m, "s": s_m}
+                x, t_var = x_m, t_m
+            elif builder == "matrix":
+                model, x_m, y_m, t_m, s_m, _ = build_model_matrix(params=params, **arrays)
+                start_vars = {"x": x_m, "y": y_m, "s": s_m}
+                x, t_var = x_m, t_m
+            elif builder == "loop":
+                max_time = dict(zip(exercises_idx, arrays["max_time"]))
+                model, x, y, t_var, s, _ = build_model(
+                    meals_idx, exercises_idx, output_args["cal"], output_args["fat"], output_args["carb"],
+                    output_args["protein"], output_args["prep_time"], output_args["burn_rate"], max_time, params
+                )
+                start_vars = {"x": x, "y": y, "s": s}
+            else:
+                raise ValueError(f"Unsupported model builder: {builder}")
+            if mip_start is not None:
+                apply_start(model, start_vars, mip_start)
+
+        model.Params.OutputFlag = 0
+        for name, value in tuned_params(params["T"]).items():
+            model.setParam(name, value)
+
+        # Solve
+        callback = None
+        if observer is not None:
+            callback = incumbent_callback(observer, observer.incumbent, days, x, t_var,
+                                          datetime.now().date(), output_args)
+        with trace.stage("solve"):
+            model.optimize(callback)
+        trace.record_model(model)
+    except GurobiError as e:
+        return highs_fallback(e)
+    logging.info("Solved %d meals x %d days in %.2fs: status %d",
+                 len(output_args["meals"]), params["T"], model.Runtime, model.status)
+    if model.status == GRB.INFEASIBLE and not exhaustive:
+        # Generated patterns can miss every feasible plan; only the full model can tell.
+        logging.info("Day patterns infeasible, re-solving the monolithic model")
+        model.dispose()
+        return solve_optimization(user_params, builder, use_cache, "monolithic", solver_params,
+                                  observer, use_warm_start, use_presolve, requested_backend, catalog, deadline)
 
     # Build output
-    output = generate_optimization_output(
-        model=model,
-        days=days,
-        meals=meals_idx,
-        exercises=exercises_idx,
-        x=x,
-        t=t_var,
-        recipe=recipe,
-        cal=cal,
-        fat=fat,
-        carb=carb,
-        protein=protein,
-        prep_time=prep_time,
-        ex_name=ex_name,
-        workout_type=workout_type,
-        location=location,
-        burn_rate=burn_rate,
-        user_params=user_params,
-        metrics=metrics,
-        diets_df=filtered_diets,
-        ex_df=filtered_exercises
-    )
+    with trace.stage("extract"):
+        output = generate_optimization_output(
+            model=model,
+            days=days,
+            x=x,
+            t=t_var,
+            **output_args
+        )
+    if cache_key and cacheable(model.status):
+        RESULT_CACHE.put(cache_key, output)
     return output
 
+
+def solve_with_highs(arrays: Dict, params: Dict, mip_start: Optional[Dict],
+                     solver_params: Optional[Dict], observer, output_args: Dict,
+                     deadline: Optional[float] = None):
+    """
+    Solves the monolithic model with the HiGHS backend. An `observer` gets
+    incumbents and can cancel the solve exactly as with Gurobi. A `deadline`
+    caps the time limit at the time left once the model is loaded.
+    Returns (status code, OptimizationResult).
+    """
+    trace = current_trace()
+    with trace.stage("build"):
+        problem = matrix_problem(params=params, **arrays)
+    days = range(params["T"])
+    start_date = datetime.now().date()
+    plan_args = {k: v for k, v in output_args.items()
+                 if k not in ("metrics", "diets_view", "exercises_view")}
+
+    def solution(values):
+        return problem.block(values, "x"), problem.block(values, "t")
+
+    def on_incumbent(values):
+        try:
+            plan, weekly_info = plan_from_solution(*solution(values), days,
+                                                   start_date=start_date, **plan_args)
+            observer.incumbent(OptimizationResult(
+                plan=plan,
+                weekly_info=weekly_info,
+                status=GUROBI_STATUS_CODES[GRB.INPROGRESS],
+                recommendations=[]
+            ))
+        except Exception as e:
+            logging.error("Failed to publish incumbent: %s", e, exc_info=True)
+
+    with trace.stage("solve"):
+        outcome = solve_highs(
+            problem, mip_start, time_limit=DEFAULT_TIME_LIMIT, solver_params=solver_params,
+            on_incumbent=on_incumbent if observer is not None else None,
+            should_stop=(lambda: observer.cancelled) if observer is not None else None,
+            deadline=deadline
+        )
+    trace.record_outcome(outcome, problem)
+    logging.info("HiGHS solved %d meals x %d days in %.2fs: status %d",
+                 len(output_args["meals"]), params["T"], outcome.runtime, outcome.status)
+    with trace.stage("extract"):
+        x_val, t_val = solution(outcome.values) if outcome.values is not None else (None, None)
+        return outcome.status, optimization_result(outcome.status, x_val, t_val, days=days,
+                                                   start_date=start_date, **output_args)
+
+
+def merge_window_outputs(statuses: List[int], outputs: List[OptimizationResult]):
+    """
+    Stitches the per-window results of the rolling horizon solver into one
+    plan. Weekly info comes from the first window (the first 7 days). If a
+    window has no solution, its result is returned instead.
+    Returns (status code, OptimizationResult).
+    """
+    solved = {GRB.OPTIMAL, GRB.TIME_LIMIT}
+    if statuses[-1] not in solved:
+        failed = outputs[-1]
+        if len(outputs) > 1:
+            failed.recommendations.insert(0, (
+                f"The rolling horizon solver could not extend the plan past day "
+                f"{sum(len(o.plan) for o in outputs[:-1])}. Consider solverMode 'monolithic'."
+            ))
+        return statuses[-1], failed
+    status = GRB.TIME_LIMIT if GRB.TIME_LIMIT in statuses else GRB.OPTIMAL
+    output = OptimizationResult(
+        plan=[day for o in outputs for day in o.plan],
+        weekly_info=outputs[0].weekly_info,
+        status=GUROBI_STATUS_CODES[status],
+        recommendations=[]
+    )
+    return status, output
+
 if __name__ == "__main__":
     # For testing purposes only:
     from ..models.input_schema import UserData
@@ -0,0 +1,254 @@
+import hashlib
+import itertools
+import json
+import logging
+import os
+import shutil
+from math import comb
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+import numpy as np
+from gurobipy import GurobiError
+
+from data.preprocessing import DATA_DIR, DIETS_CSV, csv_checksum
+from optimization.day_patterns import DayRules, PricingProblem
+from optimization.matrix_builder import macro_bands
+from optimization.presolve import MealPool, _keep_per_group
+
+# Pattern libraries written by `python -m optimization.export_patterns`.
+PATTERN_DIR = Path(os.environ.get("PATTERN_DIR", DATA_DIR / "patterns"))
+# "auto" uses the libraries when they were built from the current diet CSV;
+# "off" ignores them.
+PATTERN_LIBRARY = os.environ.get("PATTERN_LIBRARY", "auto")
+# Width (kcal) of the daily calorie target buckets a library is split into.
+PATTERN_CALORIE_STEP = float(os.environ.get("PATTERN_CALORIE_STEP", 250))
+# Enumerate every meal set of a candidate pool with at most this many
+# M-subsets; larger pools get a sampled, incomplete library.
+PATTERN_LIBRARY_ENUM_LIMIT = int(os.environ.get("PATTERN_LIBRARY_ENUM_LIMIT", 20_000_000))
+# Pricing MIPs per calorie bucket of a sampled library.
+PATTERN_LIBRARY_SAMPLES = int(os.environ.get("PATTERN_LIBRARY_SAMPLES", 20))
+
+# Version of the on-disk layout and of the rules the libraries were built
+# with; libraries of another version are ignored.
+PATTERN_FORMAT_VERSION = 1
+# Daily calorie targets libraries cover; other targets get no library.
+CALORIE_RANGE = (800.0, 6000.0)
+# Most prep minutes per meal a request may allow (UserData.mealPrepTime)
+MAX_PREP_PER_MEAL = 120
+GOALS = ("weight loss", "weight gain", "endurance")
+
+
+#####################################################
+# Library Keys: diet combination, M and macro bands
+#####################################################
+def combination_key(diet_rows: np.ndarray) -> str:
+    """Key of a filtered diet catalog: users whose filters select the same rows share it."""
+    return hashlib.sha256(np.asarray(diet_rows, dtype=np.int64).tobytes()).hexdigest()[:16]
+
+
+def bands_key(goal: str) -> str:
+    """Key of a goal's macro bands; goals with the same bands share a library."""
+    return hashlib.sha256(json.dumps(macro_bands(goal)).encode()).hexdigest()[:8]
+
+
+def library_name(diet_rows: np.ndarray, M: int, goal: str) -> str:
+    return f"{combination_key(diet_rows)}_M{M}_{bands_key(goal)}"
+
+
+def calorie_bucket(target: float) -> int:
+    return int(np.floor(target / PATTERN_CALORIE_STEP))
+
+
+#####################################################
+# Precompute: candidate pools and feasible meal sets
+#####################################################
+def candidate_pool(diets, M: int) -> np.ndarray:
+    """
+    Catalog rows of a filtered diet view that presolve can keep for any user
+    with M meals a day: the 3*M quickest meals of each identical-nutrition
+    group (see presolve_meals). Presolved rows are always a subset.
+    """
+    pool = MealPool(diets)
+    keep = _keep_per_group(pool.groups(0), pool.prep_time, np.ones(len(pool), dtype=bool), 3 * M)
+    return pool.rows[keep]
+
+
+def _meal_sets(n: int, M: int, chunk: int = 1 << 20) -> Iterator[np.ndarray]:
+    """Every M-subset of range(n) in lexicographic order, as (k, M) blocks."""
+    subsets = itertools.combinations(range(n), M)
+    while True:
+        block = np.fromiter(itertools.chain.from_iterable(itertools.islice(subsets, chunk)), dtype=np.int32)
+        if block.size == 0:
+            return
+        yield block.reshape(-1, M)
+
+
+def _by_bucket(meal_sets: np.ndarray, kcal: np.ndarray, prep_time: np.ndarray, goal: str) -> Dict[int, np.ndarray]:
+    """
+    Meal sets that meet the daily macro bands for some target of a calorie
+    bucket within CALORIE_RANGE (and the largest prep budget), by bucket.
+    A set meets the bands exactly for targets in [max(macro / hi), min(macro / lo)].
+    """
+    bands = np.array(macro_bands(goal))
+    macro = kcal[meal_sets].sum(axis=1)
+    low = (macro / bands[:, 1]).max(axis=1)
+    high = (macro / bands[:, 0]).min(axis=1)
+    fits = (low <= high + 1e-6) & (prep_time[meal_sets].sum(axis=1) <= MAX_PREP_PER_MEAL * meal_sets.shape[1] + 1e-6)
+    first = np.maximum(np.floor((low - 1e-6) / PATTERN_CALORIE_STEP), calorie_bucket(CALORIE_RANGE[0]))
+    last = np.minimum(np.floor((high + 1e-6) / PATTERN_CALORIE_STEP), calorie_bucket(CALORIE_RANGE[1]))
+    fits &= first <= last
+    buckets = {}
+    for b in range(calorie_bucket(CALORIE_RANGE[0]), calorie_bucket(CALORIE_RANGE[1]) + 1):
+        in_bucket = fits & (first <= b) & (last >= b)
+        if in_bucket.any():
+            buckets[b] = meal_sets[in_bucket]
+    return buckets
+
+
+def _sampled_sets(pool: MealPool, M: int, goal: str, rng: np.random.Generator) -> np.ndarray:
+    """
+    Feasible meal sets of a pool too large to enumerate: for the middle of
+    every calorie bucket, the pricing MIP's best sets under random weights.
+    """
+    arrays = {"cal": pool.cal, "fat": pool.fat, "carb": pool.carb, "protein": pool.protein,
+              "prep_time": pool.prep_time}
+    found = []
+    for b in range(calorie_bucket(CALORIE_RANGE[0]), calorie_bucket(CALORIE_RANGE[1]) + 1):
+        params = {"target_calorie_pd": (b + 0.5) * PATTERN_CALORIE_STEP, "goal": goal, "M": M,
+                  "MPT_day": MAX_PREP_PER_MEAL * M}
+        pricing = PricingProblem(DayRules(arrays, params))
+        try:
+            for _ in range(PATTERN_LIBRARY_SAMPLES):
+                found.extend(meal_set for meal_set, _ in pricing.solve(rng.random(len(pool))))
+        finally:
+            pricing.dispose()
+    if not found:
+        return np.zeros((0, M), dtype=np.int32)
+    return np.unique(np.array(found, dtype=np.int32), axis=0)
+
+
+def build_library(diets, M: int, goal: str, seed: int = 0) -> Tuple[np.ndarray, Dict[int, np.ndarray], bool]:
+    """
+    The library of a filtered diet view for M meals and a goal's macro bands:
+    (candidate pool rows, feasible meal sets as catalog rows by calorie
+    bucket, whether the sets are every feasible set of the pool). Pools with
+    at most PATTERN_LIBRARY_ENUM_LIMIT subsets are enumerated; larger ones
+    are sampled with the pricing MIP (needs Gurobi).
+    """
+    rows = candidate_pool(diets, M)
+    pool = MealPool(diets.store.view(rows))
+    complete = comb(len(rows), M) <= PATTERN_LIBRARY_ENUM_LIMIT
+    if complete:
+        blocks = (_by_bucket(meal_sets, pool.kcal, pool.prep_time, goal) for meal_sets in _meal_sets(len(rows), M))
+    else:
+        blocks = [_by_bucket(_sampled_sets(pool, M, goal, np.random.default_rng(seed)),
+                             pool.kcal, pool.prep_time, goal)]
+    buckets: Dict[int, list] = {}
+    for block in blocks:
+        for b, meal_sets in block.items():
+            buckets.setdefault(b, []).append(meal_sets)
+    return rows, {b: rows[np.concatenate(parts)] for b, parts in buckets.items()}, complete
+
+
+def export_libraries(diet_views, directory: Path = PATTERN_DIR, meals_per_day=(3,), goals=GOALS,
+                     seed: int = 0) -> Dict[str, Dict]:
+    """
+    Builds the libraries of every filtered diet view in `diet_views` for each
+    M in `meals_per_day` and each distinct macro band of `goals`, and writes
+    them under `directory` as <library_name>.npz (the "pool" rows, a
+    "complete" flag and one "b<bucket>" array of meal sets per calorie
+    bucket) with a meta.json recording the format version, the diet CSV's
+    checksum and the calorie step. A directory written for another CSV or
+    version is cleared first. Returns the libraries' summaries.
+    """
+    directory = Path(directory)
+    meta = _read_meta(directory)
+    current = _current_meta()
+    if meta is None or any(meta.get(k) != v for k, v in current.items()):
+        shutil.rmtree(directory, ignore_errors=True)
+        meta = dict(current, libraries={})
+    directory.mkdir(parents=True, exist_ok=True)
+    for diets in diet_views:
+        for M in meals_per_day:
+            by_bands: Dict[str, list] = {}
+            for goal in goals:
+                by_bands.setdefault(bands_key(goal), []).append(goal)
+            for same_bands in by_bands.values():
+                goal = same_bands[0]
+                name = library_name(diets.rows, M, goal)
+                if name in meta["libraries"]:
+                    continue
+                try:
+                    rows, buckets, complete = build_library(diets, M, goal, seed)
+                except GurobiError as e:  # e.g. a pool beyond a size-limited license
+                    logging.warning("Skipping pattern library %s: %s", name, e)
+                    continue
+                np.savez(directory / f"{name}.npz", pool=rows, complete=complete,
+                         **{f"b{b}": meal_sets for b, meal_sets in buckets.items()})
+                meta["libraries"][name] = {
+                    "meals": len(diets), "pool": len(rows), "M": M, "goals": same_bands, "complete": complete,
+                    "patterns": sum(len(meal_sets) for meal_sets in buckets.values()),
+                }
+                (directory / "meta.json").write_text(json.dumps(meta, indent=1))
+    return meta["libraries"]
+
+
+def _current_meta() -> Dict:
+    return {"version": PATTERN_FORMAT_VERSION, "source": csv_checksum(DIETS_CSV),
+            "calorie_step": PATTERN_CALORIE_STEP, "calorie_range": list(CALORIE_RANGE)}
+
+
+def _read_meta(directory: Path) -> Optional[Dict]:
+    try:
+        return json.loads((Path(directory) / "meta.json").read_text())
+    except (OSError, ValueError):
+        return None
+
+
+#####################################################
+# Request Time: the feasible meal sets of one user
+#####################################################
+class PatternLibraries:
+    """
+    Read-only access to the libraries under a directory. They are used only
+    if they were built from the current diet CSV with the current format,
+    calorie step and range; otherwise every lookup misses.
+    """
+
+    def __init__(self, directory: Path = PATTERN_DIR):
+        self.directory = Path(directory)
+        meta = _read_meta(self.directory) if PATTERN_LIBRARY != "off" else None
+        current = _current_meta() if meta is not None else None
+        if meta is not None and any(meta.get(k) != v for k, v in current.items()):
+            logging.warning("Pattern libraries in %s are stale, ignoring them (re-run "
+                            "python -m optimization.export_patterns)", self.directory)
+            meta = None
+        self.names = set(meta["libraries"]) if meta is not None else set()
+
+    def lookup(self, diet_rows: np.ndarray, meal_rows: np.ndarray,
+               params: Dict) -> Optional[Tuple[np.ndarray, bool]]:
+        """
+        Meal sets of the library for the filtered diet rows, M, goal and
+        calorie target bucket of `params` that use only `meal_rows` (the
+        presolved rows, ascending), as (k, M) positions in `meal_rows` in
+        lexicographic order; and whether they include every set that meets
+        the user's daily rules (DayRules picks those). None without a library.
+        """
+        name = library_name(diet_rows, params["M"], params["goal"])
+        if name not in self.names:
+            return None
+        with np.load(self.directory / f"{name}.npz") as library:
+            bucket = f"b{calorie_bucket(params['target_calorie_pd'])}"
+            if bucket not in library.files:
+                return None
+            meal_sets, pool, complete = library[bucket], library["pool"], bool(library["complete"])
+        meal_rows = np.asarray(meal_rows)
+        positions = np.searchsorted(meal_rows, meal_sets)
+        found = positions < len(meal_rows)
+        found[found] = meal_rows[positions[found]] == meal_sets[found]
+        positions = positions[found.all(axis=1)]
+        positions = positions[np.lexsort(positions.T[::-1])] if len(positions) else positions
+        return positions, complete and bool(np.isin(meal_rows, pool).all())
+
+
+LIBRARIES = PatternLibraries()
@@ -0,0 +1,204 @@
+import logging
+import os
+import threading
+from typing import Callable, Dict, Optional, Tuple
+import numpy as np
+
+from optimization.matrix_builder import macro_bands
+
+# Nutrition grid (kcal, fat g, carbs g, protein g) for clustering near-duplicate
+# meals; 0 only merges meals with identical nutrition.
+PRESOLVE_CLUSTER_TOL = float(os.environ.get("PRESOLVE_CLUSTER_TOL", 0))
+# Upper bound on the meals handed to the model; 0 disables the cap.
+PRESOLVE_MAX_MEALS = int(os.environ.get("PRESOLVE_MAX_MEALS", 0))
+# Grid for the macro-space coverage used by the cap: share step and kcal step.
+COVERAGE_SHARE_STEP = 0.05
+COVERAGE_KCAL_STEP = 50.0
+
+
+#####################################################
+# Meal Pool: per-catalog work shared by every user
+#####################################################
+class MealPool:
+    """
+    The parts of presolve that depend only on the filtered diet view, not on
+    the user's targets: the nutrition columns, the sums of the k smallest or
+    largest values, the nutrition groups and the macro-space cells. Each is
+    computed on first use and kept, so users with the same filters can share
+    one pool (see optimization.batch). Safe to share between threads.
+    """
+
+    def __init__(self, diets):
+        self.rows = np.asarray(diets.rows)
+        self.cal, self.fat, self.carb, self.protein, self.prep_time = (
+            np.nan_to_num(np.asarray(diets[k], dtype=float))
+            for k in ("calories", "fat", "carbs", "protein", "total_time_in_minutes")
+        )
+        self.kcal = np.column_stack([self.fat * 9, self.carb * 4, self.protein * 4])
+        # Columns `extreme_sum` bounds: calories, prep time and the kcal of each macro
+        self.bounded = {"cal": self.cal, "prep_time": self.prep_time,
+                        **{f"kcal{k}": self.kcal[:, k] for k in range(3)}}
+        self._cache: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.cal)
+
+    def _memo(self, key: tuple, compute: Callable):
+        with self._lock:
+            if key not in self._cache:
+                self._cache[key] = compute()
+            return self._cache[key]
+
+    def extreme_sum(self, name: str, k: int, smallest: bool) -> float:
+        """Sum of the k smallest (or largest) values of column `name` of `bounded`."""
+        return self._memo(("extreme", name, k, smallest),
+                          lambda: _extreme_sum(self.bounded[name], k, smallest))
+
+    def groups(self, tol: float) -> np.ndarray:
+        """Nutrition group of every meal: identical nutrition, or the same `tol` grid cell."""
+        return self._memo(("groups", tol), lambda: _nutrition_groups(
+            np.column_stack([self.cal, self.fat, self.carb, self.protein]), tol))
+
+    def cells(self) -> np.ndarray:
+        """Macro-space cell of every meal, for the coverage cap."""
+        return self._memo(("cells",), lambda: _coverage_cells(self.kcal, self.cal))
+
+
+#####################################################
+# Presolve: drop meals that cannot help the model
+#####################################################
+def presolve_meals(diets, params: Dict, max_burn_per_day: float,
+                   cluster_tol: float = PRESOLVE_CLUSTER_TOL,
+                   max_meals: int = PRESOLVE_MAX_MEALS,
+                   pool: Optional[MealPool] = None) -> Tuple[np.ndarray, Dict[str, int]]:
+    """
+    Shrinks the filtered diet view before the model is built.
+    Exact reductions (the optimal objective is unchanged):
+      - prep: the meal plus the M-1 quickest others exceeds min(MPT_day, FT_day);
+      - macros: the meal plus the M-1 smallest (largest) others breaks a daily
+        macro upper (lower) band;
+      - calories: no day containing the meal can meet the calorie balance,
+        even with `max_burn_per_day` kcal of exercise;
+      - duplicates: of meals with identical nutrition only the 3*M quickest are
+        kept, which is always enough to swap in for any of them under the
+        per-day and no-repeat rules.
+    Heuristic reductions (off by default):
+      - `cluster_tol` > 0 applies the duplicate rule to meals on the same
+        nutrition grid cell instead of identical meals;
+      - `max_meals` > 0 caps the pool, taking meals round-robin over macro-space
+        cells (quickest first) so every region of the catalog stays covered.
+    `pool` is the MealPool of `diets`, if one is already at hand.
+    Returns (kept catalog rows, counts of removed meals per reason).
+    """
+    pool = pool if pool is not None else MealPool(diets)
+    T, M = params["T"], params["M"]
+    target = params["target_calorie_pd"]
+    goal = params["goal"]
+    cal, prep_time, kcal = pool.cal, pool.prep_time, pool.kcal
+    n = len(cal)
+    keep = np.ones(n, dtype=bool)
+    removed: Dict[str, int] = {}
+
+    def drop(reason: str, mask: np.ndarray):
+        removed[reason] = int(np.count_nonzero(keep & mask))
+        keep[mask] = False
+
+    if n and M > 0:
+        others = M - 1
+        drop("prep", prep_time + pool.extreme_sum("prep_time", others, smallest=True)
+             > min(params["MPT_day"], params["FT_day"]))
+
+        too_high = np.zeros(n, dtype=bool)
+        too_low = np.zeros(n, dtype=bool)
+        for k, (lo, hi) in enumerate(macro_bands(goal)):
+            too_high |= kcal[:, k] + pool.extreme_sum(f"kcal{k}", others, smallest=True) > hi * target + 1e-6
+            too_low |= kcal[:, k] + pool.extreme_sum(f"kcal{k}", others, smallest=False) < lo * target - 1e-6
+        drop("macros", too_high | too_low)
+
+        least = cal + pool.extreme_sum("cal", others, smallest=True)
+        most = cal + pool.extreme_sum("cal", others, smallest=False)
+        if goal == "weight loss":
+            infeasible = least > target + max_burn_per_day + 1e-6
+        elif goal == "weight gain":
+            infeasible = most < target - 1e-6
+        else:  # endurance
+            infeasible = (least > target + 50 + max_burn_per_day + 1e-6) | (most < target - 50 - 1e-6)
+        drop("calories", infeasible)
+
+        drop("duplicates", ~_keep_per_group(pool.groups(cluster_tol), prep_time, keep, 3 * M))
+
+        if max_meals and np.count_nonzero(keep) > max_meals:
+            drop("cap", ~_coverage_cap(pool.cells(), prep_time, keep, max_meals))
+
+    rows = pool.rows[keep]
+    logging.info("Presolve kept %d of %d meals, removing %d binaries (%s)",
+                 len(rows), n, (n - len(rows)) * T,
+                 ", ".join(f"{reason}: {count}" for reason, count in removed.items() if count) or "none")
+    return rows, removed
+
+
+def max_daily_burn(burn_rate: np.ndarray, FT_day: float) -> float:
+    """Most kcal any day's exercise can burn: the fastest burner for all free time."""
+    burn_rate = np.nan_to_num(np.asarray(burn_rate, dtype=float))
+    return float(max(burn_rate.max(initial=0.0), 0.0) * FT_day)
+
+
+def _extreme_sum(values: np.ndarray, k: int, smallest: bool) -> float:
+    """
+    Sum of the k smallest (or largest) values. Taken over all meals, it bounds
+    the sum of any k other meals from below (above).
+    """
+    if k <= 0:
+        return 0.0
+    k = min(k, len(values))
+    part = np.partition(values, k - 1)[:k] if smallest else np.partition(values, len(values) - k)[-k:]
+    return float(part.sum())
+
+
+def _nutrition_groups(nutrition: np.ndarray, tol: float) -> np.ndarray:
+    """Group id of every meal: equal nutrition rows, or the same `tol` grid cell."""
+    key = np.round(nutrition / tol) if tol > 0 else nutrition
+    _, group = np.unique(key, axis=0, return_inverse=True)
+    return group.ravel()
+
+
+def _keep_per_group(group: np.ndarray, prep_time: np.ndarray, keep: np.ndarray,
+                    per_group: int) -> np.ndarray:
+    """Mask keeping the `per_group` quickest kept meals of each nutrition group."""
+    order = np.lexsort((prep_time, group))
+    order = order[keep[order]]
+    rank = np.zeros(len(keep), dtype=int)
+    groups_sorted = group[order]
+    starts = np.flatnonzero(np.r_[True, groups_sorted[1:] != groups_sorted[:-1]])
+    run_start = np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+    rank[order] = np.arange(len(order)) - run_start
+    return keep & (rank < per_group)
+
+
+def _coverage_cells(kcal: np.ndarray, cal: np.ndarray) -> np.ndarray:
+    """Cell id of every meal on the macro-space grid (macro calorie shares and calories)."""
+    total = kcal.sum(axis=1, keepdims=True)
+    shares = np.divide(kcal, total, out=np.zeros_like(kcal), where=total > 0)
+    cells = np.column_stack([np.floor(shares[:, :2] / COVERAGE_SHARE_STEP),
+                             np.floor(cal / COVERAGE_KCAL_STEP)])
+    _, cell = np.unique(cells, axis=0, return_inverse=True)
+    return cell.ravel()
+
+
+def _coverage_cap(cell: np.ndarray, prep_time: np.ndarray,
+                  keep: np.ndarray, max_meals: int) -> np.ndarray:
+    """
+    Mask of at most `max_meals` kept meals chosen round-robin over macro-space
+    cells (see `_coverage_cells`), quickest first.
+    """
+    candidates = np.flatnonzero(keep)
+    order = candidates[np.lexsort((prep_time[candidates], cell[candidates]))]
+    cells_sorted = cell[order]
+    starts = np.flatnonzero(np.r_[True, cells_sorted[1:] != cells_sorted[:-1]])
+    rank = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+    # Round r takes the r-th quickest meal of every cell.
+    chosen = order[np.lexsort((cells_sorted, rank))][:max_meals]
+    mask = np.zeros(len(keep), dtype=bool)
+    mask[chosen] = True
+    return mask
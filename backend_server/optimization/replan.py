@@ -0,0 +1,516 @@
+import copy
+import logging
+import os
+import threading
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from gurobipy import Model, GRB, GurobiError
+
+from data.macro_index import diet_index
+from data.preprocessing import DIET_CATALOG, EXERCISE_CATALOG, select_diets, select_exercises
+from models.input_schema import PlanChange
+from models.output_schema import Meal, DailyPlan, WeeklyInfo, OptimizationResult
+from optimization.backends import SOLVER_BACKEND, SolveOutcome, can_fall_back, resolve_backend, solve_highs
+from optimization.environment import thread_env
+from optimization.matrix_builder import MatrixProblem, matrix_problem, problem_rhs
+from optimization.optimizer import (GUROBI_STATUS_CODES, model_arrays, model_parameters,
+                                    optimization_result, output_arguments, plan_from_solution)
+from optimization.presolve import presolve_meals, max_daily_burn
+from optimization.tuning import latency_deadline, solve_params, with_deadline
+from optimization.variety import canonical_names, canonical_recipes, variant_meals
+from optimization.warm_start import previous_plan_start
+from utils.calculations import compute_user_metrics
+from utils.instrumentation import current_trace, traced
+
+# Days a re-plan re-solves from the start of today's plan week (a multiple of
+# 7); later days keep the previous plan. 0 re-solves every remaining day.
+REPLAN_WINDOW_DAYS = int(os.environ.get("REPLAN_WINDOW_DAYS", 28))
+# Re-plan models each solve thread keeps alive for later re-plans (at least 1).
+REPLAN_KEPT_MODELS = int(os.environ.get("REPLAN_KEPT_MODELS", 4))
+# Time limit (seconds) of a re-plan solve.
+REPLAN_TIME_LIMIT = float(os.environ.get("REPLAN_TIME_LIMIT", 60))
+
+_local = threading.local()
+
+
+#####################################################
+# Kept-alive Models: re-targeted, not rebuilt
+#####################################################
+class ReplanModel:
+    """
+    The model of a re-plan window: its MatrixProblem and, once solved with
+    Gurobi, the loaded Gurobi model. A later re-plan whose meals and exercises
+    are a subset of this model's, with the same window length, goal, meals per
+    day and workout days, reuses it: days and items are fixed or excluded
+    through variable bounds and the targets change through right-hand sides.
+    Gurobi models live in the environment of the thread that built them, so
+    each solve thread keeps its own (see `kept_model`).
+    """
+
+    def __init__(self, meal_rows: np.ndarray, exercise_rows: np.ndarray, params: Dict):
+        self.meal_rows = meal_rows
+        self.exercise_rows = exercise_rows
+        self.structure = _structure(params)
+        self.diets = DIET_CATALOG.view(meal_rows)
+        self.exercises = EXERCISE_CATALOG.view(exercise_rows)
+        self.recipes = self.diets['recipe']
+        self.exercise_names = self.exercises['exercise_name']
+        self.arrays = model_arrays(self.diets, self.exercises)
+        self.problem = matrix_problem(params=params, **self.arrays)
+        self.model = self.v = self.constrs = None
+        self.gurobi_rejected = False
+        self.solves = 0
+
+    def fits(self, meal_rows: np.ndarray, exercise_rows: np.ndarray, params: Dict) -> bool:
+        return (self.structure == _structure(params)
+                and np.isin(meal_rows, self.meal_rows).all()
+                and np.isin(exercise_rows, self.exercise_rows).all())
+
+    def columns(self, kind: str, names) -> np.ndarray:
+        """Columns of the catalog rows of recipe ("diets") or exercise names; unknown names are left out."""
+        rows_by_name = _name_rows(kind)
+        model_rows = self.meal_rows if kind == "diets" else self.exercise_rows
+        rows = np.array([rows_by_name[n] for n in names if n in rows_by_name], dtype=np.int64)
+        k = np.searchsorted(model_rows, rows)
+        found = k < len(model_rows)
+        found[found] = model_rows[k[found]] == rows[found]
+        return k[found]
+
+    def day_values(self, day: DailyPlan) -> Tuple[np.ndarray, np.ndarray, np.ndarray, float]:
+        """x, y, t and s of a plan day on this model's items; items the model lacks are left out."""
+        x = np.zeros(len(self.meal_rows))
+        y = np.zeros(len(self.exercise_rows))
+        t = np.zeros(len(self.exercise_rows))
+        x[self.columns("diets", [m.recipe for m in day.selected_meals])] = 1.0
+        for exercise in day.selected_exercises:
+            k = self.columns("exercises", [exercise.name])
+            y[k] = 1.0
+            t[k] += exercise.duration
+        return x, y, t, 1.0 if day.selected_exercises else 0.0
+
+    def solve(self, requested: str, lb: np.ndarray, ub: np.ndarray, rhs: np.ndarray,
+              start: np.ndarray, solver_params: Optional[Dict] = None,
+              deadline: Optional[float] = None) -> SolveOutcome:
+        """
+        Solves the model under the given bounds, right-hand sides and start
+        (NaN: undefined) on the `requested` backend, like `solve_optimization`
+        picks it for a monolithic model. A `deadline` caps the time limit at
+        the time left right before the solve, HiGHS fallback included.
+        """
+        self.solves += 1
+        trace = current_trace()
+        if not self.gurobi_rejected and resolve_backend(requested, "monolithic", self.problem.n_vars) == "gurobi":
+            try:
+                trace.set(backend="gurobi")
+                return self._solve_gurobi(lb, ub, rhs, start, solver_params, deadline)
+            except GurobiError as e:
+                if not can_fall_back(requested, e):
+                    raise
+                logging.warning("Gurobi rejected the re-plan model (%s), solving with HiGHS", e)
+                self.dispose()
+                self.gurobi_rejected = True
+        problem = copy.copy(self.problem)
+        problem.lb, problem.ub, problem.rhs = lb, ub, rhs
+        blocks = {name: problem.block(start, name) for name in ("x", "y", "s")}
+        trace.set(backend="highs")
+        outcome = solve_highs(problem, blocks, time_limit=REPLAN_TIME_LIMIT, solver_params=solver_params,
+                              deadline=deadline)
+        trace.record_outcome(outcome, problem)
+        return outcome
+
+    def _solve_gurobi(self, lb, ub, rhs, start, solver_params, deadline) -> SolveOutcome:
+        problem = self.problem
+        if self.model is None:
+            self.model = Model("FitPlannerReplan", env=thread_env())
+            self.v = self.model.addMVar(problem.n_vars, lb=lb, ub=ub, obj=problem.obj,
+                                        vtype=np.where(problem.integer, GRB.INTEGER, GRB.CONTINUOUS))
+            self.constrs = self.model.addMConstr(problem.A, self.v, problem.sense, rhs)
+        else:
+            self.v.LB, self.v.UB = lb, ub
+            self.constrs.RHS = rhs
+        model = self.model
+        self.v.Start = np.where(np.isnan(start), GRB.UNDEFINED, start)
+        # Parameters of the previous re-plan must not carry over.
+        model.resetParams()
+        model.Params.OutputFlag = 0
+        model.setParam('TimeLimit', REPLAN_TIME_LIMIT)
+        for name, value in with_deadline(solver_params, deadline).items():
+            model.setParam(name, value)
+        model.optimize()
+        current_trace().record_model(model)
+        has_solution = model.SolCount > 0
+        return SolveOutcome(
+            status=model.status,
+            values=self.v.X if has_solution else None,
+            objective=model.ObjVal if has_solution else None,
+            mip_gap=model.MIPGap if has_solution else None,
+            runtime=model.Runtime,
+            node_count=int(model.NodeCount)
+        )
+
+    def dispose(self):
+        if self.model is not None:
+            self.model.dispose()
+        self.model = self.v = self.constrs = None
+
+
+def kept_model(meal_rows: np.ndarray, exercise_rows: np.ndarray, params: Dict) -> Tuple[ReplanModel, bool]:
+    """
+    A ReplanModel of the calling thread that fits the window, or a new one,
+    which is kept in place of the least recently used.
+    Returns (model, whether it was reused).
+    """
+    models = getattr(_local, "models", None)
+    if models is None:
+        models = _local.models = []
+    for model in models:
+        if model.fits(meal_rows, exercise_rows, params):
+            models.remove(model)
+            models.append(model)
+            return model, True
+    model = ReplanModel(meal_rows, exercise_rows, params)
+    models.append(model)
+    while len(models) > max(REPLAN_KEPT_MODELS, 1):
+        models.pop(0).dispose()
+    return model, False
+
+
+def _structure(params: Dict) -> tuple:
+    """Parameters that shape the model's matrix; the others only reach bounds and right-hand sides."""
+    return params["T"], params["goal"], params["M"], params["W"]
+
+
+@lru_cache(maxsize=None)
+def _name_rows(kind: str) -> Dict[str, int]:
+    """
+    First catalog row of every recipe ("diets") or exercise ("exercises")
+    name; a recipe variant removed by dedup maps to its canonical recipe's row.
+    """
+    store, column = (DIET_CATALOG, "recipe") if kind == "diets" else (EXERCISE_CATALOG, "exercise_name")
+    rows = {name: row for row, name in reversed(list(enumerate(store.column(column))))}
+    if kind == "diets":
+        for variant, canonical in canonical_names().items():
+            if canonical in rows:
+                rows.setdefault(variant, rows[canonical])
+    return rows
+
+
+#####################################################
+# Plan Edits
+#####################################################
+def catalog_meal(recipe: str) -> Meal:
+    """The Meal of a catalog recipe or recipe variant, as plans list it."""
+    for meal in variant_meals().get(canonical_names().get(recipe), []):
+        if meal.recipe == recipe:
+            return meal
+    row = _name_rows("diets").get(recipe)
+    if row is None:
+        raise ValueError(f"Unknown recipe: {recipe}")
+    return _row_meal(row, recipe)
+
+
+def _row_meal(row: int, recipe: str) -> Meal:
+    value = lambda column: float(DIET_CATALOG.column(column)[row])
+    return Meal(
+        recipe=recipe,
+        calories=value('calories'),
+        macros={"carbs": value('carbs'), "protein": value('protein'), "fat": value('fat')},
+        total_time=value('total_time_in_minutes')
+    )
+
+
+def similar_meals(user_params: dict, recipe: str, count: int = 5, exclude: Iterable[str] = ()) -> List[Meal]:
+    """
+    Up to `count` meals of the user's filtered catalog closest to `recipe` in
+    macro space (calories, macro shares and prep time; see data.macro_index),
+    closest first: the candidates to swap it for. The recipe itself and the
+    recipes in `exclude` (e.g. the rest of its day) are left out, and every
+    recipe is suggested once.
+    """
+    row = _name_rows("diets").get(recipe)
+    if row is None:
+        raise ValueError(f"Unknown recipe: {recipe}")
+    index = diet_index()
+    point = index.features(row)
+    rows = select_diets(user_params)
+    skip = {recipe, *exclude, *canonical_recipes([recipe, *exclude])}
+    k = count + len(skip)
+    while True:
+        found = index.nearest(point, k, rows)
+        picked, seen = [], set(skip)
+        for r, name in zip(found.tolist(), DIET_CATALOG.column("recipe", found)):
+            if name not in seen:
+                seen.add(name)
+                picked.append((r, name))
+        if len(picked) >= count or len(found) < k:
+            return [_row_meal(r, name) for r, name in picked[:count]]
+        k *= 2
+
+
+def edit_day(day: DailyPlan, change: Optional[PlanChange]) -> DailyPlan:
+    """A plan day with a change's meal swaps and skipped workout applied, totals updated."""
+    if change is None or not (change.skipWorkout or change.removeMeals or change.addMeals):
+        return day
+    meals = [m for m in day.selected_meals if m.recipe not in change.removeMeals]
+    meals += [catalog_meal(recipe) for recipe in change.addMeals]
+    exercises = [] if change.skipWorkout else day.selected_exercises
+    return day.model_copy(update={
+        "selected_meals": meals,
+        "selected_exercises": exercises,
+        "total_time_used": sum(m.total_time for m in meals) + sum(e.duration for e in exercises),
+        "total_net_calories": (sum(m.calories for m in meals)
+                               - sum(e.estimated_calories_burned for e in exercises)),
+    })
+
+
+def keep_added_meals(day: DailyPlan, added: List[str]) -> DailyPlan:
+    """
+    A solved day with the exact recipes a change added, totals updated: the
+    model serves a variant through its canonical recipe's column, which
+    restore_variety may then rotate to another variant.
+    """
+    names = canonical_names()
+    meals = list(day.selected_meals)
+    for recipe in added:
+        canonical = names.get(recipe, recipe)
+        k = next(k for k, m in enumerate(meals) if names.get(m.recipe, m.recipe) == canonical)
+        meals[k] = catalog_meal(recipe)
+    if meals == day.selected_meals:
+        return day
+    return day.model_copy(update={
+        "selected_meals": meals,
+        "total_time_used": sum(m.total_time for m in meals) + sum(e.duration for e in day.selected_exercises),
+        "total_net_calories": (sum(m.calories for m in meals)
+                               - sum(e.estimated_calories_burned for e in day.selected_exercises)),
+    })
+
+
+def plan_weekly_info(plan: List[DailyPlan], user_params: Dict) -> WeeklyInfo:
+    """Weekly summary of a plan from its first 7 days, as `plan_from_solution` computes it."""
+    week = plan[:7]
+
+    def average(values) -> float:
+        return sum(values) / len(week) if week else 0.0
+
+    return WeeklyInfo(
+        free_time_week=user_params.get("freeTime", 0) * 60 * user_params.get("daysWeek", 7),
+        avg_free_time_used=average(d.total_time_used for d in week),
+        avg_workout_duration=average(sum(e.duration for e in d.selected_exercises) for d in week),
+        meals_per_day=user_params.get("mealsPerDay", 0),
+        avg_net_calories=average(d.total_net_calories for d in week)
+    )
+
+
+def fixed_rows_rhs(problem: MatrixProblem, rhs: np.ndarray, fixed_values: np.ndarray,
+                   free: np.ndarray) -> np.ndarray:
+    """
+    Adjusts `rhs` to the columns fixed by bounds (`fixed_values`, zero where
+    `free`):
+      - a row without free columns (e.g. a daily rule of a completed day,
+        which the user's edits may break) holds at its fixed activity;
+      - a weekly workout row asks the week's free days for the workouts still
+        missing, at most one per free day.
+    """
+    activity = problem.A @ fixed_values
+    n_free = abs(problem.A) @ free.astype(float)
+    rhs = rhs.copy()
+    closed = n_free == 0
+    sense = problem.sense
+    rows = closed & (sense == GRB.EQUAL)
+    rhs[rows] = activity[rows]
+    rows = closed & (sense == GRB.LESS_EQUAL)
+    rhs[rows] = np.maximum(rhs[rows], activity[rows])
+    rows = closed & (sense == GRB.GREATER_EQUAL)
+    rhs[rows] = np.minimum(rhs[rows], activity[rows])
+    rows = problem.families == "workout_frequency"
+    rhs[rows] = activity[rows] + np.clip(rhs[rows] - activity[rows], 0, n_free[rows])
+    return rhs
+
+
+#####################################################
+# Re-plan: re-solve the open days of a previous plan
+#####################################################
+@traced("replan")
+def replan_optimization(user_params: dict, previous: OptimizationResult,
+                        changes: List[PlanChange] = (), today: Optional[date] = None,
+                        solver_params: Optional[Dict] = None,
+                        backend: Optional[str] = None,
+                        deadline: Optional[float] = None) -> OptimizationResult:
+    """
+    Re-plans a previous result after the user's changes, keeping its dates.
+      - Changes apply meal swaps and skipped workouts to their day; a locked
+        day, like every day before `today`, is kept as edited. Open days
+        serve the recipes a change added as named, variants included.
+      - The window of REPLAN_WINDOW_DAYS from the start of today's plan week
+        is solved as one model in which kept days are fixed through bounds;
+        later days keep the previous plan. Its first and last open days avoid
+        the meals and exercises of the days just outside it.
+      - Calorie targets come from the current profile (latest weight, same
+        goal date). The deviation covers today onward: completed days are
+        left out, kept days and the days after the window count as planned.
+      - Weekly workout counts include the workouts of kept days; a skipped
+        workout moves to another open day of its week where one is left.
+      - The window model is kept alive per solve thread and re-targeted
+        through bounds and right-hand sides on the next re-plan (see
+        `ReplanModel`); open days start from the previous plan.
+    `backend` (default: the profile's `solverBackend`, else SOLVER_BACKEND)
+    picks the solver as in `solve_optimization`; the window's solve gets the
+    tuned parameters and the latency `deadline` (default: the profile's
+    `maxLatencyMs` from now) the same way.
+    """
+    if deadline is None:
+        deadline = latency_deadline(user_params.get("maxLatencyMs"))
+    if REPLAN_WINDOW_DAYS < 0 or REPLAN_WINDOW_DAYS % 7:
+        raise ValueError(f"Re-plan window must be a multiple of 7, got {REPLAN_WINDOW_DAYS}")
+    plan = previous.plan
+    if not plan:
+        raise ValueError("The previous result has no plan to re-plan")
+    start_date, T = plan[0].day, len(plan)
+    if any(day.day != start_date + timedelta(days=d) for d, day in enumerate(plan)):
+        raise ValueError("The previous plan's days must be consecutive")
+    by_day: Dict[int, PlanChange] = {}
+    for change in changes:
+        d = (change.day - start_date).days
+        if not 0 <= d < T:
+            raise ValueError(f"The previous plan has no day {change.day}")
+        if d in by_day:
+            raise ValueError(f"More than one change for {change.day}")
+        by_day[d] = change
+    edited = [edit_day(day, by_day.get(d)) for d, day in enumerate(plan)]
+
+    today = today or datetime.now().date()
+    first_open = min(max((today - start_date).days, 0), T)
+    window_start = first_open // 7 * 7
+    window_end = min(T, window_start + REPLAN_WINDOW_DAYS) if REPLAN_WINDOW_DAYS else T
+    window = range(window_start, window_end)
+    fixed = np.array([d < first_open or (d in by_day and by_day[d].lock) for d in window], dtype=bool)
+    if fixed.all():
+        logging.info("Re-plan has no open day, returning the edited plan")
+        return previous.model_copy(update={"plan": edited,
+                                           "weekly_info": plan_weekly_info(edited, user_params)})
+
+    # --- Window model ---
+    trace = current_trace()
+    with trace.stage("filter"):
+        diets = DIET_CATALOG.view(select_diets(user_params))
+        exercises = EXERCISE_CATALOG.view(select_exercises(user_params))
+    with trace.stage("metrics"):
+        metrics = compute_user_metrics(user_params)
+        params = dict(model_parameters(user_params, metrics), T=len(window))
+    trace.set(horizon=len(window), meals=len(diets), exercises=len(exercises))
+    with trace.stage("presolve"):
+        max_burn = max_daily_burn(exercises['calories_burned_per_min'], params["FT_day"])
+        meal_rows = presolve_meals(diets, params, max_burn)[0]
+    with trace.stage("build"):
+        used_meals, used_exercises = _plan_rows([edited[d] for d in window])
+        kept, reused = kept_model(np.union1d(meal_rows, used_meals),
+                                  np.union1d(exercises.rows, used_exercises), params)
+    trace.set(cache="hit" if reused else "miss")
+    problem = kept.problem
+
+    with trace.stage("build"):
+        # --- Bounds: open days choose from today's catalog, kept days are fixed ---
+        lb, ub = problem.lb.copy(), problem.ub.copy()
+        problem.block(ub, "x")[~np.isin(kept.meal_rows, meal_rows)] = 0.0
+        for name in ("y", "t"):
+            problem.block(ub, name)[~np.isin(kept.exercise_rows, exercises.rows)] = 0.0
+        for k, d in enumerate(window):
+            change = by_day.get(d)
+            if fixed[k]:
+                for name, value in zip(("x", "y", "t", "s"), kept.day_values(edited[d])):
+                    problem.block(lb, name)[..., k] = value
+                    problem.block(ub, name)[..., k] = value
+                continue
+            if change is not None and change.skipWorkout:
+                for name in ("y", "t", "s"):
+                    problem.block(ub, name)[..., k] = 0.0
+            if change is not None:
+                problem.block(ub, "x")[np.isin(kept.recipes, canonical_recipes(change.removeMeals)), k] = 0.0
+            for neighbour, edge in ((d - 1, 0), (d + 1, len(window) - 1)):
+                if k == edge and 0 <= neighbour < T and neighbour not in window:
+                    day = edited[neighbour]
+                    recipes = canonical_recipes(m.recipe for m in day.selected_meals)
+                    problem.block(ub, "x")[np.isin(kept.recipes, recipes), k] = 0.0
+                    problem.block(ub, "y")[np.isin(kept.exercise_names, [e.name for e in day.selected_exercises]), k] = 0.0
+            if change is not None and change.addMeals:
+                added = kept.columns("diets", change.addMeals)
+                problem.block(lb, "x")[added, k] = problem.block(ub, "x")[added, k] = 1.0
+
+        # --- Right-hand sides: targets, the deviation carried in and fixed rows ---
+        free = lb != ub
+        fixed_values = np.where(free, 0.0, lb)
+        cal = np.nan_to_num(np.asarray(kept.arrays["cal"], dtype=float))
+        burn_rate = np.nan_to_num(np.asarray(kept.arrays["burn_rate"], dtype=float))
+        model_net = cal @ problem.block(fixed_values, "x") - burn_rate @ problem.block(fixed_values, "t")
+        planned_net = np.array([edited[d].total_net_calories for d in window])
+        counted = np.array([d >= first_open for d in window])
+        after_window = sum(day.total_net_calories for day in edited[window_end:])
+        offset = (after_window + float(np.sum(np.where(fixed, counted * planned_net - model_net, 0.0)))
+                  - (T - first_open - len(window)) * params["target_calorie_pd"])
+        rhs = problem_rhs(problem, dict(params, deviation_offset=offset))
+        rhs = fixed_rows_rhs(problem, rhs, fixed_values, free)
+
+        # --- Warm start from the previous plan ---
+        carried = previous_plan_start([edited[d] for d in window], kept.recipes, kept.exercise_names,
+                                      len(window), start_date + timedelta(days=window_start))
+        for name in ("x", "y", "s"):
+            carried[name][..., ~carried["days"]] = np.nan
+        start = problem.stack({name: carried[name] for name in ("x", "y", "s")})
+        start = np.where(free, start, lb)
+        start[(start < lb) | (start > ub)] = np.nan
+
+    requested = backend or user_params.get("solverBackend") or SOLVER_BACKEND
+    trace.set(mode="replan")
+    with trace.stage("solve"):
+        outcome = kept.solve(requested, lb, ub, rhs, start,
+                             solve_params(len(window), len(meal_rows), user_params["goalType"], params["M"],
+                                          solver_params, time_limit=REPLAN_TIME_LIMIT), deadline)
+    logging.info("Re-planned days %d-%d (%d open) on a %s model in %.2fs: status %d",
+                 window_start, window_end - 1, np.count_nonzero(~fixed),
+                 "kept" if reused else "new", outcome.runtime, outcome.status)
+
+    with trace.stage("extract"):
+        # --- Output: open days from the solution, the others as edited ---
+        output_args = output_arguments(kept.diets, kept.exercises, user_params, metrics, diets)
+        if outcome.values is None and outcome.status != GRB.INFEASIBLE:
+            # No solution in time: keep the user's edits rather than dropping the plan.
+            logging.warning("Re-plan found no solution (status %d), returning the edited plan", outcome.status)
+            return OptimizationResult(
+                plan=edited,
+                weekly_info=plan_weekly_info(edited, user_params),
+                status=GUROBI_STATUS_CODES.get(outcome.status, "UNKNOWN"),
+                recommendations=[
+                    "The re-plan did not finish in time: your changes are applied but the remaining days "
+                    "were not re-optimized. Try again or allow more time (maxLatencyMs)."
+                ]
+            )
+        if outcome.values is None or outcome.status not in (GRB.OPTIMAL, GRB.TIME_LIMIT):
+            return optimization_result(outcome.status, None, None, days=window, **output_args)
+        open_days = np.flatnonzero(~fixed)
+        plan_args = {k: v for k, v in output_args.items()
+                     if k not in ("metrics", "diets_view", "exercises_view")}
+        solved, _ = plan_from_solution(
+            problem.block(outcome.values, "x")[:, open_days], problem.block(outcome.values, "t")[:, open_days],
+            [window_start + int(k) for k in open_days], start_date=start_date, **plan_args
+        )
+        new_plan = list(edited)
+        for k, day in zip(open_days, solved):
+            change = by_day.get(window_start + k)
+            new_plan[window_start + k] = keep_added_meals(day, change.addMeals) if change is not None else day
+        return OptimizationResult(
+            plan=new_plan,
+            weekly_info=plan_weekly_info(new_plan, user_params),
+            status=GUROBI_STATUS_CODES.get(outcome.status, "UNKNOWN"),
+            recommendations=[]
+        )
+
+
+def _plan_rows(days: List[DailyPlan]) -> Tuple[np.ndarray, np.ndarray]:
+    """Catalog rows of the meals and of the exercises of plan days that the catalog knows."""
+    recipes, exercise_names = _name_rows("diets"), _name_rows("exercises")
+    meals = {recipes[m.recipe] for day in days for m in day.selected_meals if m.recipe in recipes}
+    exercises = {exercise_names[e.name] for day in days for e in day.selected_exercises
+                 if e.name in exercise_names}
+    return np.array(sorted(meals), dtype=np.int64), np.array(sorted(exercises), dtype=np.int64)
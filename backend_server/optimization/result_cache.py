@@ -0,0 +1,121 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Dict, Optional
+import numpy as np
+
+from models.output_schema import OptimizationResult
+
+# Cache sizing; overridable through the environment.
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", 256))
+RESULT_CACHE_TTL = float(os.environ.get("RESULT_CACHE_TTL", 3600))
+
+# Targets within the same rounding bucket share a cached plan.
+TARGET_CALORIE_DECIMALS = 0
+
+
+###############################################
+# Fingerprint: canonical optimization inputs
+###############################################
+def fingerprint(diet_rows: np.ndarray, exercise_rows: np.ndarray, params: Dict,
+                variant: str = "") -> str:
+    """
+    Canonical key for a model: the filtered catalog rows plus the scalar model
+    parameters from `model_parameters`. Fields that never reach the model
+    (name, age, the goal date itself, ...) do not affect the key.
+    `variant` separates results of different solve strategies for one model.
+    """
+    h = hashlib.sha256()
+    h.update(np.asarray(diet_rows, dtype=np.int64).tobytes())
+    h.update(b"|")
+    h.update(np.asarray(exercise_rows, dtype=np.int64).tobytes())
+    canonical = (
+        params["T"],
+        round(params["target_calorie_pd"], TARGET_CALORIE_DECIMALS),
+        params["goal"],
+        params["FT_day"],
+        params["MPT_day"],
+        params["M"],
+        params["W"],
+        variant,
+    )
+    h.update(repr(canonical).encode())
+    return h.hexdigest()
+
+
+def redate(result: OptimizationResult, start_date: date) -> OptimizationResult:
+    """Returns a deep copy of `result` whose plan starts on `start_date`, sharing nothing with the cached one."""
+    copied = result.model_copy(deep=True)
+    if copied.plan:
+        shift = start_date - copied.plan[0].day
+        for day in copied.plan:
+            day.day += shift
+    return copied
+
+
+###############################################
+# Result Cache: bounded LRU with TTL
+###############################################
+class ResultCache:
+    """
+    Thread-safe LRU cache of solved plans with per-entry time-to-live.
+    Tracks hits, misses, evictions and expirations.
+    """
+
+    def __init__(self, max_size: int = RESULT_CACHE_SIZE, ttl: float = RESULT_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str, start_date: Optional[date] = None) -> Optional[OptimizationResult]:
+        """Cached plan for `key` re-dated to `start_date` (today by default), or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return redate(entry[1], start_date or datetime.now().date())
+
+    def put(self, key: str, result: OptimizationResult) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), result.model_copy(deep=True))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+RESULT_CACHE = ResultCache()
@@ -0,0 +1,120 @@
+import os
+import logging
+from typing import Callable, Dict, Iterator, Optional, Tuple
+import numpy as np
+from gurobipy import GRB
+
+from optimization.matrix_builder import build_model_matrix
+from optimization.tuning import time_left
+from optimization.warm_start import apply_start
+from utils.instrumentation import current_trace
+
+# Horizons longer than this many days are solved window by window in "auto" mode.
+ROLLING_HORIZON_THRESHOLD = int(os.environ.get("ROLLING_HORIZON_THRESHOLD", 28))
+# Window length in days; must be a multiple of 7 so weekly constraints stay intact.
+ROLLING_WINDOW_DAYS = int(os.environ.get("ROLLING_WINDOW_DAYS", 7))
+# Time limit (seconds) for each window's solve.
+ROLLING_WINDOW_TIME_LIMIT = float(os.environ.get("ROLLING_WINDOW_TIME_LIMIT", 30))
+
+SOLVER_MODES = ("auto", "monolithic", "rolling", "patterns")
+
+
+def resolve_solver_mode(mode: str, T: int, backend: str = "auto") -> str:
+    """
+    Resolves "auto" to "rolling" or "monolithic" from the horizon length;
+    always "monolithic" on the highs backend, as the rolling horizon and
+    day-pattern modes drive Gurobi directly.
+    """
+    if mode not in SOLVER_MODES:
+        raise ValueError(f"Unsupported solver mode: {mode}")
+    if mode == "auto":
+        if backend == "highs":
+            return "monolithic"
+        return "rolling" if T > ROLLING_HORIZON_THRESHOLD else "monolithic"
+    return mode
+
+
+#########################################################
+# Rolling Horizon: solve the plan one window at a time
+#########################################################
+def solve_windows(arrays: Dict[str, np.ndarray],
+                  params: Dict,
+                  window_days: int = ROLLING_WINDOW_DAYS,
+                  time_limit: float = ROLLING_WINDOW_TIME_LIMIT,
+                  solver_params: Optional[Dict] = None,
+                  callback_factory: Optional[Callable] = None,
+                  mip_start: Optional[Dict[str, np.ndarray]] = None,
+                  deadline: Optional[float] = None) -> Iterator[Tuple[int, object, object, object]]:
+    """
+    Splits the horizon into week-aligned windows and solves them in order.
+    Each window:
+      - forbids the meals and exercises chosen on the previous window's last
+        day from appearing on its first day (the cross-boundary no-repeat rows);
+      - starts its Z deviation from the net calorie deviation accumulated so
+        far, so the windows jointly minimise the whole-horizon |deviation|.
+    `arrays` holds the per-item arrays taken by `build_model_matrix`;
+    `solver_params` are extra Gurobi parameters set on every window model;
+    `callback_factory(first_day, x, t)`, if given, returns the Gurobi callback
+    for that window's solve. `mip_start` is an optional whole-horizon MIP start
+    (see optimization.warm_start) that is sliced into each window. With a
+    `deadline` (a time.monotonic() time), each window's time limit is at
+    most an equal share of the time left among the windows still to solve.
+    Yields (first_day, model, x, t) after each window is solved; the model
+    stays alive until the caller resumes the generator. Stops after the first
+    window without a solution or whose solve was interrupted. Build and
+    solve times add up on the request's trace (see utils.instrumentation).
+    """
+    if window_days <= 0 or window_days % 7:
+        raise ValueError(f"Window length must be a positive multiple of 7, got {window_days}")
+    T = params["T"]
+    target_calorie_pd = params["target_calorie_pd"]
+    cal = np.nan_to_num(np.asarray(arrays["cal"], dtype=float))
+    burn_rate = np.nan_to_num(np.asarray(arrays["burn_rate"], dtype=float))
+
+    trace = current_trace()
+    carry = 0.0
+    last_meals = last_exercises = None
+    for start in range(0, T, window_days):
+        T_w = min(window_days, T - start)
+        with trace.stage("build"):
+            model, x, y, t, s, _ = build_model_matrix(
+                params=dict(params, T=T_w, deviation_offset=carry), **arrays
+            )
+        if last_meals is not None:
+            ub = np.ones(x.shape)
+            ub[last_meals, 0] = 0.0
+            x.UB = ub
+            ub = np.ones(y.shape)
+            ub[last_exercises, 0] = 0.0
+            y.UB = ub
+        if mip_start is not None:
+            window = {name: mip_start[name][..., start:start + T_w].copy()
+                      for name in ("x", "y", "s")}
+            if last_meals is not None:
+                # Leave the boundary-forbidden picks for Gurobi to complete.
+                window["x"][last_meals, 0] = np.nan
+                window["y"][last_exercises, 0] = np.nan
+            apply_start(model, {"x": x, "y": y, "s": s}, window)
+        model.Params.OutputFlag = 0
+        model.setParam('TimeLimit', time_limit)
+        for name, value in (solver_params or {}).items():
+            model.setParam(name, value)
+        if deadline is not None:
+            windows_left = -(-(T - start) // window_days)
+            model.setParam('TimeLimit', min(model.Params.TimeLimit, time_left(deadline) / windows_left))
+        with trace.stage("solve"):
+            model.optimize(callback_factory(start, x, t) if callback_factory else None)
+        trace.record_model(model)
+        logging.info("Rolling horizon window days %d-%d: status %d, carry %.1f kcal",
+                     start, start + T_w - 1, model.status, carry)
+
+        yield start, model, x, t
+
+        if model.SolCount == 0 or model.status == GRB.INTERRUPTED:
+            model.dispose()
+            return
+        x_val, y_val, t_val = x.X, y.X, t.X
+        carry += float(cal @ x_val.sum(axis=1) - burn_rate @ t_val.sum(axis=1)) - T_w * target_calorie_pd
+        last_meals = np.flatnonzero(x_val[:, -1] > 0.5)
+        last_exercises = np.flatnonzero(y_val[:, -1] > 0.5)
+        model.dispose()
@@ -0,0 +1,83 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict
+
+# Concurrent solves, and how many more may wait for a worker before rejecting.
+SOLVE_WORKERS = int(os.environ.get("SOLVE_WORKERS", max(1, (os.cpu_count() or 1) // 2)))
+SOLVE_QUEUE_DEPTH = int(os.environ.get("SOLVE_QUEUE_DEPTH", 8))
+# Seconds a rejected client is told to wait before retrying.
+SOLVE_RETRY_AFTER = int(os.environ.get("SOLVE_RETRY_AFTER", 30))
+
+
+class SolvePoolFull(Exception):
+    """Raised when every worker is busy and the wait queue is full."""
+
+
+#####################################################
+# Solve Pool: bounded worker threads for Gurobi
+#####################################################
+class SolvePool:
+    """
+    Runs blocking solves on a fixed number of worker threads so the event loop
+    stays responsive. At most `workers + queue_depth` solves are admitted at
+    once; further submissions raise SolvePoolFull.
+    Each solve gets a Gurobi `Threads` budget of cpu_count // workers so
+    concurrent solves do not oversubscribe the cores.
+    """
+
+    def __init__(self, workers: int = SOLVE_WORKERS, queue_depth: int = SOLVE_QUEUE_DEPTH):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.threads_per_solve = max(1, (os.cpu_count() or 1) // workers)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="solve")
+        self._slots = threading.BoundedSemaphore(workers + queue_depth)
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self.rejected = 0
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise SolvePoolFull(f"{self.workers} solves running and {self.queue_depth} queued")
+        with self._lock:
+            self._admitted += 1
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+        return future
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """Awaitable wrapper around `submit` for use from async endpoints."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def solver_params(self) -> Dict[str, int]:
+        """Gurobi parameters every pooled solve should use."""
+        return {"Threads": self.threads_per_solve}
+
+    def _release(self):
+        with self._lock:
+            self._admitted -= 1
+        self._slots.release()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_depth": self.queue_depth,
+                "in_flight": self._admitted,
+                "queued": max(0, self._admitted - self.workers),
+                "rejected": self.rejected,
+                "threads_per_solve": self.threads_per_solve,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+SOLVE_POOL = SolvePool()
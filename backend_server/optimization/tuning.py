@@ -0,0 +1,111 @@
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from utils.instrumentation import CATALOG_BOUNDS, HORIZON_BOUNDS, size_label
+
+# Lookup table of tuned Gurobi parameters, written by benchmarks.tune_params.
+# Without it every solve keeps Gurobi's defaults and its mode's time limit.
+TUNED_PARAMS_PATH = Path(os.environ.get("TUNED_PARAMS_PATH", Path(__file__).with_name("tuned_params.json")))
+# Time limit (seconds) of monolithic solves the table has no entry for.
+DEFAULT_TIME_LIMIT = float(os.environ.get("DEFAULT_TIME_LIMIT", 300))
+# Shortest time limit (seconds) a latency budget leaves a solve, so an
+# exhausted budget still returns the MIP start.
+MIN_TIME_LIMIT = float(os.environ.get("MIN_TIME_LIMIT", 0.05))
+
+# Gurobi parameters the table may set
+TUNED_PARAMS = ("TimeLimit", "MIPGap", "MIPFocus", "Heuristics", "Presolve", "Threads")
+ANY = "*"
+
+
+#####################################################
+# Parameter Table: tuned parameters by instance bucket
+#####################################################
+def instance_key(T: int, meals: int, goal: str = ANY, M=ANY) -> str:
+    """
+    Bucket of an instance: its horizon and (presolved) catalog size, bucketed
+    like the request metrics, its goalType and meals per day.
+    """
+    return "|".join((size_label(T, HORIZON_BOUNDS), size_label(meals, CATALOG_BOUNDS), goal, str(M)))
+
+
+class ParamTable:
+    """
+    Tuned Gurobi parameters by instance_key. Lookups try the exact key, then
+    the horizon and catalog bucket with any goal and M, then `default`.
+    """
+
+    def __init__(self, entries: Optional[Dict[str, Dict]] = None, default: Optional[Dict] = None):
+        self.entries = entries or {}
+        self.default = default or {}
+
+    @classmethod
+    def load(cls, path) -> "ParamTable":
+        try:
+            with open(path) as f:
+                table = json.load(f)
+        except FileNotFoundError:
+            return cls()
+        logging.info("Loaded %d tuned parameter entries from %s", len(table.get("entries", {})), path)
+        return cls(table.get("entries"), table.get("default"))
+
+    def save(self, path, **info) -> None:
+        """Writes the table, with `info` (e.g. how it was tuned) alongside."""
+        with open(path, "w") as f:
+            json.dump({**info, "default": self.default, "entries": self.entries}, f, indent=2, sort_keys=True)
+
+    def lookup(self, key: str) -> Dict:
+        horizon, catalog, _, _ = key.split("|")
+        for candidate in (key, "|".join((horizon, catalog, ANY, ANY))):
+            if candidate in self.entries:
+                return self.entries[candidate]
+        return self.default
+
+
+PARAM_TABLE = ParamTable.load(TUNED_PARAMS_PATH)
+
+
+#####################################################
+# Solve Parameters: tuned, requested, latency-capped
+#####################################################
+def latency_deadline(max_latency_ms: Optional[int]) -> Optional[float]:
+    """time.monotonic() deadline of a latency budget starting now (None: no budget)."""
+    if not max_latency_ms:
+        return None
+    return time.monotonic() + max_latency_ms / 1000
+
+
+def time_left(deadline: float) -> float:
+    """Seconds until `deadline`, at least MIN_TIME_LIMIT."""
+    return max(deadline - time.monotonic(), MIN_TIME_LIMIT)
+
+
+def solve_params(T: int, meals: int, goal: str, M: int, solver_params: Optional[Dict] = None,
+                 deadline: Optional[float] = None, time_limit: float = DEFAULT_TIME_LIMIT) -> Dict:
+    """
+    Gurobi parameters of one solve: `time_limit`, overridden by the table's
+    entry for the instance, then by the caller's `solver_params` (whose
+    Threads budget also caps the table's). A `deadline` caps the TimeLimit
+    at the time left, so the solve returns its best incumbent by then.
+    """
+    tuned = PARAM_TABLE.lookup(instance_key(T, meals, goal, M))
+    params = {"TimeLimit": time_limit, **tuned, **(solver_params or {})}
+    if tuned.get("Threads") and (solver_params or {}).get("Threads"):
+        params["Threads"] = min(tuned["Threads"], solver_params["Threads"])
+    return with_deadline(params, deadline)
+
+
+def with_deadline(solver_params: Optional[Dict], deadline: Optional[float]) -> Dict:
+    """
+    `solver_params` with the TimeLimit capped at the time left until
+    `deadline` as of now. Called right before each solver call, so the
+    budget also covers whatever ran since the request started: a model
+    Gurobi rejected, the warm start, the rebuild for HiGHS.
+    """
+    params = dict(solver_params or {})
+    if deadline is not None:
+        params["TimeLimit"] = min(params.get("TimeLimit", float("inf")), time_left(deadline))
+    return params
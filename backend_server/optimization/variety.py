@@ -0,0 +1,126 @@
+import os
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List
+
+from data.preprocessing import diet_variants
+from models.output_schema import Meal, DailyPlan
+from optimization.matrix_builder import macro_bands
+from utils.calculations import compute_user_metrics
+
+# Rotate the dedup stage's near-duplicate variants back into solved plans
+# ("0" serves the canonical recipes only).
+RESTORE_VARIETY = os.environ.get("RESTORE_VARIETY", "1") != "0"
+
+
+#####################################################
+# Variants: near-duplicates removed from the catalog
+#####################################################
+@lru_cache(maxsize=None)
+def variant_meals() -> Dict[str, List[Meal]]:
+    """The Meals of the variants of every canonical recipe (see data.preprocessing.DIET_VARIANTS_CSV), in file order."""
+    variants = diet_variants()
+    meals: Dict[str, List[Meal]] = {}
+    if variants is None:
+        return meals
+    for row in variants.itertuples(index=False):
+        meals.setdefault(row.canonical, []).append(Meal(
+            recipe=row.recipe,
+            calories=float(row.calories),
+            macros={"carbs": float(row.carbs), "protein": float(row.protein), "fat": float(row.fat)},
+            total_time=float(row.total_time_in_minutes)
+        ))
+    return meals
+
+
+@lru_cache(maxsize=None)
+def canonical_names() -> Dict[str, str]:
+    """The canonical recipe of every variant name."""
+    return {meal.recipe: canonical for canonical, meals in variant_meals().items() for meal in meals}
+
+
+def canonical_recipes(recipes) -> List[str]:
+    """Recipe names with every variant replaced by its canonical recipe, as the catalog names them."""
+    names = canonical_names()
+    return [names.get(recipe, recipe) for recipe in recipes]
+
+
+#####################################################
+# Restoring Variety: after the solve
+#####################################################
+def restore_variety(plan: List[DailyPlan], user_params: Dict) -> List[DailyPlan]:
+    """
+    Rotates variants into a plan: the n-th time a canonical recipe is served
+    it becomes its (n mod (variants + 1))-th variant, 0 keeping the canonical
+    one, so a meal the model repeats varies from day to day. Variants have
+    the canonical recipe's diet, cuisine and (within the dedup tolerance)
+    macros and calories; one is only swapped in if the day still satisfies
+    the model's daily rows (see `day_fits`), and the day's totals are
+    recomputed. Otherwise the canonical meal stays.
+    """
+    variants = variant_meals()
+    if not RESTORE_VARIETY or not variants:
+        return plan
+    limits = day_limits(user_params)
+    served = Counter()
+    varied = []
+    for day in plan:
+        meals = list(day.selected_meals)
+        exercise_time = sum(e.duration for e in day.selected_exercises)
+        for k, meal in enumerate(meals):
+            options = variants.get(meal.recipe)
+            if not options:
+                continue
+            turn = served[meal.recipe] % (len(options) + 1)
+            served[meal.recipe] += 1
+            if turn == 0:
+                continue
+            swapped = meals[:k] + [options[turn - 1]] + meals[k + 1:]
+            if day_fits(swapped, day.selected_exercises, limits):
+                meals = swapped
+        if meals != day.selected_meals:
+            day = day.model_copy(update={
+                "selected_meals": meals,
+                "total_time_used": sum(m.total_time for m in meals) + exercise_time,
+                "total_net_calories": (sum(m.calories for m in meals)
+                                       - sum(e.estimated_calories_burned for e in day.selected_exercises)),
+            })
+        varied.append(day)
+    return varied
+
+
+def day_limits(user_params: Dict) -> Dict:
+    """The model's daily limits for a user: prep and free time, goal, calorie target and macro bands."""
+    goal = user_params["goalType"].replace("_", " ")
+    return {
+        "max_prep": user_params["mealPrepTime"] * user_params["mealsPerDay"],
+        "max_total": user_params["freeTime"] * 60,
+        "goal": goal,
+        "target": compute_user_metrics(user_params)["target_calorie_per_day"],
+        "bands": macro_bands(goal),
+    }
+
+
+def day_fits(meals: List[Meal], exercises, limits: Dict, tol: float = 1e-6) -> bool:
+    """
+    Whether a day's meals and exercises satisfy the model's daily rows under
+    `limits` (see `day_limits`): meal prep and total time, the goal's calorie
+    balance around the target, and fat/carb/protein calories within the
+    goal's bands of the target.
+    """
+    prep = sum(m.total_time for m in meals)
+    if prep > limits["max_prep"] + tol or prep + sum(e.duration for e in exercises) > limits["max_total"] + tol:
+        return False
+    target = limits["target"]
+    net = sum(m.calories for m in meals) - sum(e.estimated_calories_burned for e in exercises)
+    if limits["goal"] == "weight loss":
+        calories_ok = net <= target + tol
+    elif limits["goal"] == "weight gain":
+        calories_ok = net >= target - tol
+    else:  # endurance
+        calories_ok = target - 50 - tol <= net <= target + 50 + tol
+    if not calories_ok:
+        return False
+    kcal = (sum(m.macros["fat"] for m in meals) * 9, sum(m.macros["carbs"] for m in meals) * 4,
+            sum(m.macros["protein"] for m in meals) * 4)
+    return all(lo * target - tol <= value <= hi * target + tol for value, (lo, hi) in zip(kcal, limits["bands"]))
@@ -0,0 +1,275 @@
+import logging
+from datetime import date
+from typing import Dict, List, Optional
+import numpy as np
+from gurobipy import GRB, MVar, Var
+
+from optimization.matrix_builder import macro_bands
+from optimization.variety import canonical_recipes
+
+# Daily meal calories the heuristic aims for, relative to the calorie target.
+# Loss days sit a little under the target so rest days respect the upper bound;
+# gain days a little over it.
+CALORIE_AIM = {"weight loss": 0.95, "weight gain": 1.05, "endurance": 1.0}
+# Tie-breaker that rotates through meals instead of reusing the same two menus.
+ROTATION_WEIGHT = 1e-3
+# Weight of constraint violations (per kcal of the daily target) against the
+# squared relative distance to the aims in `_day_cost`.
+BAND_PENALTY = 100.0
+# Meals the heuristic searches when the catalog is larger than this.
+SHORTLIST = 400
+# Candidates per slot considered when swapping two meals at once.
+PAIR_CANDIDATES = 30
+
+
+#####################################################
+# Greedy Heuristic: quick meal/exercise assignment
+#####################################################
+def workout_days(T: int, W: int) -> np.ndarray:
+    """
+    0/1 workout-day indicator spreading the weekly requirement evenly over
+    each week (the last, partial week needs min(|days|, W) workouts).
+    """
+    s = np.zeros(T)
+    for week_start in range(0, T, 7):
+        length = min(7, T - week_start)
+        required = min(length, W)
+        s[week_start + (np.arange(required) * length) // max(required, 1)] = 1.0
+    return s
+
+
+def greedy_start(arrays: Dict[str, np.ndarray], shares: np.ndarray, params: Dict) -> Dict[str, np.ndarray]:
+    """
+    Builds a daily assignment that respects the no-repeat rule and the meal
+    prep time budget and lands near the calorie and macro targets.
+      - Meals: each day picks M meals one at a time, skipping yesterday's
+        meals and preferring meals whose macro `shares` (fat, carb, protein
+        calorie fractions) are already inside the goal's bands. Each pick
+        minimises `_day_cost` of the day's totals projected from the meals so
+        far; meal swaps then repair what the greedy order missed. Large
+        catalogs are first cut to the SHORTLIST best-fitting meals.
+      - Workouts: W evenly spaced days per week, alternating between the two
+        highest-burning exercises so no exercise repeats on consecutive days.
+    Returns 0/1 arrays {"x": (meals, T), "y": (exercises, T), "s": (T,)}.
+    """
+    T, M, W = params["T"], params["M"], params["W"]
+    target = params["target_calorie_pd"]
+    cal, fat, carb, protein, prep_time, burn_rate = (
+        np.nan_to_num(np.asarray(arrays[k], dtype=float))
+        for k in ("cal", "fat", "carb", "protein", "prep_time", "burn_rate")
+    )
+    n_meals, n_ex = len(cal), len(burn_rate)
+    prep_cap = min(params["MPT_day"], params["FT_day"])
+
+    bands = np.array(macro_bands(params["goal"]))
+    kcal = np.column_stack([fat * 9, carb * 4, protein * 4])
+    aim_cal = max(abs(target) * CALORIE_AIM.get(params["goal"], 1.0), 1.0)
+    aim_macro = bands.mean(axis=1) * aim_cal / bands.mean(axis=1).sum()
+    aim_macro = np.clip(aim_macro, bands[:, 0] * target, bands[:, 1] * target)
+    cost = _day_cost(params["goal"], target, bands, aim_macro, aim_cal)
+    shares = np.nan_to_num(np.asarray(shares, dtype=float), nan=-1.0)
+
+    # Search only the meals that best fit a day's aims when eaten M times.
+    shortlist = np.arange(n_meals)
+    if n_meals > SHORTLIST:
+        fit = cost(kcal * M, cal * M)
+        fit[prep_time * M > prep_cap] += BAND_PENALTY
+        shortlist = np.sort(np.argpartition(fit, SHORTLIST)[:SHORTLIST])
+    kcal, cal, prep_time, shares = kcal[shortlist], cal[shortlist], prep_time[shortlist], shares[shortlist]
+    balanced = np.all((shares >= bands[:, 0]) & (shares <= bands[:, 1]), axis=1)
+
+    x_short = np.zeros((len(shortlist), T))
+    uses = np.zeros(len(shortlist))
+    yesterday = np.zeros(len(shortlist), dtype=bool)
+    for d in range(T):
+        allowed = ~yesterday
+        pool = allowed & balanced if np.count_nonzero(allowed & balanced) >= M else allowed.copy()
+        chosen: List[int] = []
+        for k in range(M):
+            if not pool.any():
+                break
+            remaining = M - k - 1
+            reserve = np.sort(prep_time[pool])[:remaining].sum()
+            acc_prep = prep_time[chosen].sum()
+            fits = pool & (acc_prep + prep_time + reserve <= prep_cap)
+            candidates = fits if fits.any() else pool
+            share = (k + 1) / M
+            err = cost(
+                (kcal[chosen].sum(axis=0) + kcal) / share,
+                (cal[chosen].sum() + cal) / share
+            ) + ROTATION_WEIGHT * uses
+            err[~candidates] = np.inf
+            i = int(np.argmin(err))
+            chosen.append(i)
+            pool[i] = False
+        chosen = _improve_day(chosen, allowed, kcal, cal, prep_time, prep_cap, cost)
+        x_short[chosen, d] = 1.0
+        uses[chosen] += 1
+        yesterday = x_short[:, d] > 0.5
+    x = np.zeros((n_meals, T))
+    x[shortlist] = x_short
+
+    s = workout_days(T, W)
+    y = np.zeros((n_ex, T))
+    if n_ex:
+        best = np.argsort(-burn_rate, kind="stable")[:2]
+        for n, d in enumerate(np.flatnonzero(s)):
+            y[best[n % len(best)], d] = 1.0
+        if len(best) == 1:
+            # A single exercise cannot work out on consecutive days.
+            repeats = np.flatnonzero(y[0, 1:] * y[0, :-1]) + 1
+            y[0, repeats] = 0.0
+            s[repeats] = 0.0
+    return {"x": x, "y": y, "s": s}
+
+
+def _day_cost(goal: str, target: float, bands: np.ndarray, aim_macro: np.ndarray, aim_cal: float):
+    """
+    Returns cost(macro_kcal (k, 3), calories (k,)) for candidate day totals:
+    BAND_PENALTY times the macro-band and calorie-balance violations (relative
+    to the target) plus the squared relative distance to the aims.
+    Meal calories alone must satisfy the balance, since rest days burn nothing.
+    """
+    lo, hi = bands[:, 0] * target, bands[:, 1] * target
+    if goal == "weight loss":
+        cal_lo, cal_hi = -np.inf, target
+    elif goal == "weight gain":
+        cal_lo, cal_hi = target, np.inf
+    else:  # endurance
+        cal_lo, cal_hi = target - 50, target + 50
+    scale = max(abs(target), 1.0)
+
+    def cost(macro: np.ndarray, calories: np.ndarray) -> np.ndarray:
+        violation = (np.maximum(lo - macro, 0) + np.maximum(macro - hi, 0)).sum(axis=-1)
+        violation = violation + np.maximum(cal_lo - calories, 0) + np.maximum(calories - cal_hi, 0)
+        distance = (((macro - aim_macro) / aim_macro) ** 2).sum(axis=-1) + ((calories - aim_cal) / aim_cal) ** 2
+        return BAND_PENALTY * violation / scale + distance
+
+    return cost
+
+
+def _improve_day(chosen: List[int], allowed: np.ndarray, kcal: np.ndarray, cal: np.ndarray,
+                 prep_time: np.ndarray, prep_cap: float, cost, max_passes: int = 3) -> List[int]:
+    """
+    Swaps single meals of a day for allowed ones while that lowers the day's
+    cost, then tries the best swap of a pair of meals among the PAIR_CANDIDATES
+    best single-swap candidates of each slot, which repairs days that no
+    single swap can bring inside the bands.
+    """
+    chosen = list(chosen)
+    for _ in range(max_passes):
+        improved = False
+        for slot, i in enumerate(chosen):
+            err = _swap_costs(chosen, slot, allowed, kcal, cal, prep_time, prep_cap, cost)
+            j = int(np.argmin(err))
+            if err[j] < cost(kcal[chosen].sum(axis=0), cal[chosen].sum()) - 1e-9:
+                chosen[slot] = j
+                improved = True
+        if not improved:
+            break
+
+    best = (cost(kcal[chosen].sum(axis=0), cal[chosen].sum()), None)
+    for a in range(len(chosen)):
+        for b in range(a + 1, len(chosen)):
+            pool = np.union1d(
+                np.argsort(_swap_costs(chosen, a, allowed, kcal, cal, prep_time, prep_cap, cost))[:PAIR_CANDIDATES],
+                np.argsort(_swap_costs(chosen, b, allowed, kcal, cal, prep_time, prep_cap, cost))[:PAIR_CANDIDATES]
+            )
+            pool = pool[allowed[pool] & ~np.isin(pool, chosen)]
+            if len(pool) < 2:
+                continue
+            rest = [i for k, i in enumerate(chosen) if k not in (a, b)]
+            c1, c2 = np.triu_indices(len(pool), k=1)
+            p1, p2 = pool[c1], pool[c2]
+            err = cost(kcal[rest].sum(axis=0) + kcal[p1] + kcal[p2], cal[rest].sum() + cal[p1] + cal[p2])
+            err[prep_time[rest].sum() + prep_time[p1] + prep_time[p2] > prep_cap] = np.inf
+            k = int(np.argmin(err))
+            if err[k] < best[0] - 1e-9:
+                best = (err[k], (a, b, int(p1[k]), int(p2[k])))
+    if best[1] is not None:
+        a, b, i, j = best[1]
+        chosen[a], chosen[b] = i, j
+    return chosen
+
+
+def _swap_costs(chosen: List[int], slot: int, allowed: np.ndarray, kcal: np.ndarray,
+                cal: np.ndarray, prep_time: np.ndarray, prep_cap: float, cost) -> np.ndarray:
+    """Day cost after replacing the meal in `slot` by each meal (inf where not allowed)."""
+    i = chosen[slot]
+    macro = kcal[chosen].sum(axis=0)
+    err = cost(macro - kcal[i] + kcal, cal[chosen].sum() - cal[i] + cal)
+    candidates = allowed.copy()
+    candidates[chosen] = False
+    candidates &= prep_time[chosen].sum() - prep_time[i] + prep_time <= prep_cap
+    err[~candidates] = np.inf
+    return err
+
+
+#####################################################
+# Previous Plans: warm start from a returned plan
+#####################################################
+def previous_plan_start(plan: List, recipes: np.ndarray, exercise_names: np.ndarray,
+                        T: int, start_date: date) -> Dict[str, np.ndarray]:
+    """
+    Maps the days of a previously returned plan (DailyPlan models or their
+    dicts) onto the new horizon by date. A day is carried over only if every
+    meal (or its canonical recipe, for a variant) and exercise in it is still
+    in the filtered catalog.
+    Returns {"x", "y", "s"} like `greedy_start` plus a boolean "days" mask of
+    the carried-over days.
+    """
+    meal_pos = {name: k for k, name in reversed(list(enumerate(recipes)))}
+    ex_pos = {name: k for k, name in reversed(list(enumerate(exercise_names)))}
+    x = np.zeros((len(recipes), T))
+    y = np.zeros((len(exercise_names), T))
+    s = np.zeros(T)
+    days = np.zeros(T, dtype=bool)
+    for day in plan:
+        day = day if isinstance(day, dict) else day.model_dump()
+        d = (date.fromisoformat(str(day["day"])) - start_date).days
+        if not 0 <= d < T:
+            continue
+        meals = [meal_pos.get(r) for r in canonical_recipes(m["recipe"] for m in day["selected_meals"])]
+        exercises = [ex_pos.get(e["name"]) for e in day["selected_exercises"]]
+        if None in meals or None in exercises:
+            continue
+        x[meals, d] = 1.0
+        y[exercises, d] = 1.0
+        s[d] = 1.0 if exercises else 0.0
+        days[d] = True
+    return {"x": x, "y": y, "s": s, "days": days}
+
+
+def warm_start(arrays: Dict[str, np.ndarray], shares: np.ndarray, params: Dict,
+               recipes: np.ndarray, exercise_names: np.ndarray,
+               previous_plan: Optional[List] = None,
+               start_date: Optional[date] = None) -> Dict[str, np.ndarray]:
+    """
+    MIP start for a request: the greedy assignment, with the days covered by
+    the user's previous plan (if any) replaced by that plan's choices.
+    """
+    start = greedy_start(arrays, shares, params)
+    if previous_plan and start_date is not None:
+        previous = previous_plan_start(previous_plan, recipes, exercise_names, params["T"], start_date)
+        days = previous["days"]
+        for name in ("x", "y", "s"):
+            start[name][..., days] = previous[name][..., days]
+        logging.info("Warm start reuses %d of %d days from the previous plan", days.sum(), params["T"])
+    return start
+
+
+def apply_start(model, variables: Dict, start: Dict[str, np.ndarray]) -> None:
+    """
+    Sets the `Start` attribute of the x, y and s variables (MVars, or
+    tupledicts keyed in row-major order) from `start`. Durations t and the
+    deviation Z are left undefined: with every binary fixed, Gurobi completes
+    them by solving an LP, which finds the best durations for the start.
+    Entries that are NaN in `start` are left undefined as well.
+    """
+    for name in ("x", "y", "s"):
+        values = np.where(np.isnan(start[name]), GRB.UNDEFINED, start[name])
+        var = variables[name]
+        if isinstance(var, (MVar, Var)):
+            var.Start = values
+        else:
+            model.setAttr("Start", list(var.values()), values.ravel().tolist())
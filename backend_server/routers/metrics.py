@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Gauge, generate_latest
+from data.preprocessing import catalog_version
+from optimization.jobs import JOB_STORE
+from optimization.result_cache import RESULT_CACHE
+from optimization.solve_pool import SOLVE_POOL
+from utils.instrumentation import StatsCollector
+
+router = APIRouter()
+
+# Cache, pool and job figures are read from their stats() at scrape time.
+REGISTRY.register(StatsCollector("result_cache", RESULT_CACHE.stats,
+                                 counters=("hits", "misses", "evictions", "expirations")))
+REGISTRY.register(StatsCollector("solve_pool", SOLVE_POOL.stats, counters=("rejected",)))
+REGISTRY.register(StatsCollector("jobs", JOB_STORE.stats))
+# 0 when the CSVs have no current manifest (see data.preprocessing.catalog_version)
+Gauge("catalog_version", "Version of the loaded catalogs").set_function(lambda: catalog_version() or 0)
+
+
+@router.get("/metrics", tags=["metrics"])
+async def metrics():
+    """Request, stage and solver metrics (see utils.instrumentation) in the Prometheus text format."""
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
@@ -1,22 +1,184 @@
+import asyncio
 import logging
-from fastapi import APIRouter, HTTPException
+from typing import List
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from optimization.optimizer import solve_optimization
-from models.input_schema import UserData
-from models.output_schema import OptimizationResult
+from optimization.jobs import JOB_STORE, FINAL_STATES, run_job
+from optimization.batch import BATCH_MAX_USERS, solve_batch
+from optimization.replan import replan_optimization, similar_meals
+from optimization.solve_pool import SOLVE_POOL, SOLVE_RETRY_AFTER, SolvePoolFull
+from optimization.tuning import latency_deadline
+from models.input_schema import UserData, ReplanRequest, SwapRequest
+from models.output_schema import Meal, OptimizationResult, SolveJobStatus
+from utils.serialization import json_response
 
 router = APIRouter()
 logging.basicConfig(level=logging.INFO)
 
+# Seconds between SSE keep-alive comments on an idle job stream.
+SSE_KEEPALIVE = 15
+
+
+def pool_full(e: SolvePoolFull) -> HTTPException:
+    logging.warning("Rejecting optimization request, solver pool is full: %s", e)
+    return HTTPException(status_code=503, detail="Solver is busy, please retry later",
+                         headers={"Retry-After": str(SOLVE_RETRY_AFTER)})
+
+
 @router.post("/optimize", response_model=OptimizationResult, tags=["optimize"])
-async def optimize(user_data: UserData):
+async def optimize(user_data: UserData, request: Request):
+    params = user_data.model_dump()
+    logging.info("Received user input:\n%s", params)
+    # The latency budget includes the wait for a solve worker.
+    deadline = latency_deadline(params["maxLatencyMs"])
     try:
-        params = user_data.model_dump()
-        logging.info("Received user input:\n%s", params)
+        # Solve on the worker pool so the event loop keeps serving other requests.
+        detailed_result = await SOLVE_POOL.run(
+            solve_optimization, params, solver_params=SOLVE_POOL.solver_params(), deadline=deadline
+        )
 
-        detailed_result = solve_optimization(params)
-
-        return detailed_result
+        return json_response(detailed_result, request)
 
+    except SolvePoolFull as e:
+        raise pool_full(e)
     except Exception as e:
         logging.error("Error during optimization: %s", e, exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+#####################################################
+# Re-plans
+#####################################################
+@router.post("/optimize/replan", response_model=OptimizationResult, tags=["optimize"])
+async def replan(replan_request: ReplanRequest, request: Request):
+    """
+    Re-plans a previous result after the user's changes (logged weight,
+    skipped workouts, meal swaps, locked days). Days before `today` and
+    locked days are kept; the remaining days are re-solved, see
+    optimization.replan.
+    """
+    logging.info("Received re-plan of a %d-day plan with %d changes",
+                 len(replan_request.previous.plan), len(replan_request.changes))
+    deadline = latency_deadline(replan_request.user.maxLatencyMs)
+    try:
+        result = await SOLVE_POOL.run(
+            replan_optimization, replan_request.user.model_dump(), replan_request.previous,
+            replan_request.changes, replan_request.today, solver_params=SOLVE_POOL.solver_params(),
+            deadline=deadline
+        )
+        return json_response(result, request)
+
+    except SolvePoolFull as e:
+        raise pool_full(e)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logging.error("Error during re-plan: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/optimize/swap", response_model=List[Meal], tags=["optimize"])
+async def swap(swap_request: SwapRequest):
+    """
+    Meals to swap a recipe for: the ones of the user's catalog closest to it
+    in calories, macro shares and prep time, closest first. A lookup on the
+    macro-space index takes well under a millisecond, so it runs inline.
+    Put the chosen one in a re-plan's `addMeals`.
+    """
+    try:
+        return similar_meals(swap_request.user.model_dump(), swap_request.recipe, swap_request.count,
+                             swap_request.exclude)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+#####################################################
+# Batches
+#####################################################
+@router.post("/optimize/batch", tags=["optimize"])
+async def optimize_batch(users: List[UserData]):
+    """
+    Solves a cohort of users in parallel. The response streams one
+    BatchItemResult per user as NDJSON (one JSON object per line) in the
+    order the solves finish; `index` is the user's position in the request.
+    """
+    if len(users) > BATCH_MAX_USERS:
+        raise HTTPException(status_code=413, detail=f"A batch holds at most {BATCH_MAX_USERS} users")
+    params = [user.model_dump() for user in users]
+    logging.info("Received batch of %d users", len(params))
+
+    async def stream():
+        async for item in solve_batch(params):
+            yield item.model_dump_json() + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+#####################################################
+# Asynchronous jobs
+#####################################################
+@router.post("/optimize/jobs", response_model=SolveJobStatus, status_code=202, tags=["optimize"])
+async def create_job(user_data: UserData, request: Request):
+    """Queues a solve and returns its job id immediately."""
+    params = user_data.model_dump()
+    logging.info("Received user input for job:\n%s", params)
+    job = JOB_STORE.create(params)
+    try:
+        job.future = SOLVE_POOL.submit(run_job, job, solve_optimization,
+                                       solver_params=SOLVE_POOL.solver_params())
+    except SolvePoolFull as e:
+        JOB_STORE.remove(job.id)
+        raise pool_full(e)
+    return json_response(job.status(), request, status_code=202)
+
+
+def get_job(job_id: str):
+    job = JOB_STORE.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    return job
+
+
+@router.get("/optimize/jobs/{job_id}", response_model=SolveJobStatus, tags=["optimize"])
+async def job_status(job_id: str, request: Request):
+    """Current state of a job with its latest incumbent or final plan."""
+    return json_response(get_job(job_id).status(), request)
+
+
+@router.delete("/optimize/jobs/{job_id}", response_model=SolveJobStatus, tags=["optimize"])
+async def cancel_job(job_id: str, request: Request):
+    """Cancels a job; a running solve stops and keeps its best plan so far."""
+    job = get_job(job_id)
+    job.cancel()
+    return json_response(job.status(), request)
+
+
+@router.get("/optimize/jobs/{job_id}/events", tags=["optimize"])
+async def job_events(job_id: str, request: Request):
+    """
+    Server-sent events for a job: the current status first, then one event per
+    improving incumbent ("incumbent") and a final "done", "failed" or
+    "cancelled" event. Each event's data is a SolveJobStatus.
+    """
+    job = get_job(job_id)
+
+    async def stream():
+        queue = job.subscribe()
+        try:
+            while True:
+                try:
+                    event, status = await asyncio.wait_for(queue.get(), SSE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event}\ndata: {status.model_dump_json()}\n\n"
+                if status.state in FINAL_STATES:
+                    return
+        finally:
+            job.unsubscribe(queue)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
@@ -1,6 +1,7 @@
 import logging
 from math import ceil
 from datetime import datetime, timezone
+import numpy as np
 
 def compute_user_metrics(user: dict) -> dict:
     CALORIES_PER_KG = 7700  # constant
@@ -46,6 +47,19 @@ def compute_user_metrics(user: dict) -> dict:
         "target_calorie_per_day": round(target_cal_pd, 2),
     }
 
+def macro_shares(fat, carbs, protein) -> np.ndarray:
+    """
+    Fraction of each meal's macronutrient calories that comes from fat, carbs
+    and protein (9/4/4 kcal per gram). Returns an (n, 3) array; rows without
+    macro data are NaN.
+    """
+    kcal = np.column_stack([np.asarray(fat, dtype=float) * 9,
+                            np.asarray(carbs, dtype=float) * 4,
+                            np.asarray(protein, dtype=float) * 4])
+    total = kcal.sum(axis=1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(total > 0, kcal / total, np.nan)
+
 # --- Main test harness ---
 
 if __name__ == "__main__":
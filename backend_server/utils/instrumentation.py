@@ -0,0 +1,223 @@
+import functools
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Requests slower than this many seconds log their whole trace; 0 turns the
+# slow-request log off.
+SLOW_REQUEST_SECONDS = float(os.environ.get("SLOW_REQUEST_SECONDS", 0))
+
+# Upper bounds of the horizon (days) and catalog size (filtered meals) labels.
+HORIZON_BOUNDS = (7, 14, 28, 56, 112)
+CATALOG_BOUNDS = (50, 200, 1000, 5000)
+
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+SIZE_LABELS = ("kind", "horizon", "catalog")
+
+REQUEST_SECONDS = Histogram("fitplanner_request_seconds", "Wall time of a plan request",
+                            SIZE_LABELS, buckets=SECONDS_BUCKETS)
+STAGE_SECONDS = Histogram("fitplanner_stage_seconds", "Wall time of each stage of a plan request",
+                          SIZE_LABELS + ("stage",), buckets=SECONDS_BUCKETS)
+SOLVER_SECONDS = Histogram("fitplanner_solver_runtime_seconds", "Runtime reported by the solver",
+                           SIZE_LABELS + ("backend",), buckets=SECONDS_BUCKETS)
+MIP_GAP = Histogram("fitplanner_mip_gap", "Relative MIP gap of the returned plan", ("kind", "backend"),
+                    buckets=(0, 1e-4, 1e-3, 0.01, 0.05, 0.1, 0.25, 0.5, 1))
+MIP_NODES = Histogram("fitplanner_mip_nodes", "Branch-and-bound nodes explored", SIZE_LABELS,
+                      buckets=(0, 1, 10, 100, 1000, 10000, 100000))
+MIP_SOLUTIONS = Histogram("fitplanner_mip_solutions", "Feasible solutions found", ("kind",),
+                          buckets=(0, 1, 2, 5, 10, 20, 50))
+MODEL_VARIABLES = Histogram("fitplanner_model_variables", "Variables of the solved models", SIZE_LABELS,
+                            buckets=(100, 1000, 10000, 100000, 1000000))
+MODEL_CONSTRAINTS = Histogram("fitplanner_model_constraints", "Constraints of the solved models", SIZE_LABELS,
+                              buckets=(100, 1000, 10000, 100000, 1000000))
+REQUESTS = Counter("fitplanner_requests", "Finished plan requests",
+                   ("kind", "status", "mode", "backend", "cache"))
+
+SLOW_LOG = logging.getLogger("fitplanner.slow")
+
+
+def size_label(value: Optional[int], bounds: Tuple[int, ...]) -> str:
+    """Histogram label of a size: "<=b" for the first bound b it fits, ">last" above them."""
+    if value is None:
+        return "unknown"
+    for bound in bounds:
+        if value <= bound:
+            return f"<={bound}"
+    return f">{bounds[-1]}"
+
+
+#####################################################
+# Request Trace: stage timings and solver statistics
+#####################################################
+class RequestTrace:
+    """
+    Instrumentation of one plan request (see `traced`). Code on the request's
+    path reaches it through `current_trace()` and records:
+      - stage wall times with `stage(name)`, added up over repeated stages
+        (e.g. the build and solve of every rolling horizon window);
+      - the solved models' size and solver statistics with `record_model`
+        (Gurobi) or `record_outcome` (optimization.backends);
+      - request facts (horizon, catalog size, mode, backend, cache) with `set`.
+    `finish` feeds the Prometheus metrics and the slow-request log.
+    """
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.info: Dict[str, object] = {}
+        self.solver = {"models": 0, "runtime": 0.0, "mip_gap": None, "nodes": 0, "solutions": 0,
+                       "variables": 0, "constraints": 0}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def set(self, **info) -> None:
+        self.info.update(info)
+
+    def record_model(self, model) -> None:
+        """Adds the statistics of a solved Gurobi model."""
+        has_solution = model.SolCount > 0
+        self._record(model.Runtime, model.MIPGap if has_solution and model.IsMIP else None,
+                     model.NodeCount if model.IsMIP else 0, model.SolCount, model.NumVars, model.NumConstrs)
+
+    def record_outcome(self, outcome, problem) -> None:
+        """Adds the statistics of a SolveOutcome of a MatrixProblem."""
+        self._record(outcome.runtime, outcome.mip_gap, outcome.node_count or 0,
+                     int(outcome.values is not None), problem.n_vars, problem.A.shape[0])
+
+    def _record(self, runtime, mip_gap, nodes, solutions, variables, constraints) -> None:
+        solver = self.solver
+        solver["models"] += 1
+        solver["runtime"] += runtime
+        if mip_gap is not None:
+            solver["mip_gap"] = max(solver["mip_gap"] or 0.0, mip_gap)
+        solver["nodes"] += int(nodes)
+        solver["solutions"] += int(solutions)
+        solver["variables"] += int(variables)
+        solver["constraints"] += int(constraints)
+
+    def summary(self) -> Dict:
+        return {
+            "kind": self.kind,
+            "seconds": round(time.perf_counter() - self.started, 4),
+            "stages": {name: round(seconds, 4) for name, seconds in self.stages.items()},
+            **self.info,
+            "solver": self.solver,
+        }
+
+    def finish(self) -> None:
+        total = time.perf_counter() - self.started
+        labels = {
+            "kind": self.kind,
+            "horizon": size_label(self.info.get("horizon"), HORIZON_BOUNDS),
+            "catalog": size_label(self.info.get("meals"), CATALOG_BOUNDS),
+        }
+        REQUEST_SECONDS.labels(**labels).observe(total)
+        for name, seconds in self.stages.items():
+            STAGE_SECONDS.labels(stage=name, **labels).observe(seconds)
+        backend = str(self.info.get("backend", "none"))
+        solver = self.solver
+        if solver["models"]:
+            SOLVER_SECONDS.labels(backend=backend, **labels).observe(solver["runtime"])
+            MIP_NODES.labels(**labels).observe(solver["nodes"])
+            MIP_SOLUTIONS.labels(kind=self.kind).observe(solver["solutions"])
+            MODEL_VARIABLES.labels(**labels).observe(solver["variables"])
+            MODEL_CONSTRAINTS.labels(**labels).observe(solver["constraints"])
+            if solver["mip_gap"] is not None:
+                MIP_GAP.labels(kind=self.kind, backend=backend).observe(solver["mip_gap"])
+        REQUESTS.labels(kind=self.kind, status=str(self.info.get("status", "UNKNOWN")),
+                        mode=str(self.info.get("mode", "none")), backend=backend,
+                        cache=str(self.info.get("cache", "none"))).inc()
+        if SLOW_REQUEST_SECONDS and total >= SLOW_REQUEST_SECONDS:
+            SLOW_LOG.warning("Slow %s request: %s", self.kind, json.dumps(self.summary(), default=str))
+
+
+class _NoTrace(RequestTrace):
+    """Stand-in outside any traced request: records nothing."""
+
+    def __init__(self):
+        super().__init__("none")
+
+    @contextmanager
+    def stage(self, name: str):
+        yield
+
+    def set(self, **info) -> None:
+        pass
+
+    def _record(self, *args) -> None:
+        pass
+
+
+_NO_TRACE = _NoTrace()
+_current: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+
+
+def current_trace() -> RequestTrace:
+    """The trace of the request being served, or a stand-in that records nothing."""
+    return _current.get() or _NO_TRACE
+
+
+def traced(kind: str):
+    """
+    Decorator for the entry point of a request kind (e.g. solve_optimization):
+    the outermost call opens a RequestTrace, takes the returned result's
+    `status` (or "ERROR" if it raises) and finishes the trace. Nested calls,
+    such as backend fallbacks, add to the enclosing trace.
+    """
+    def decorate(fn: Callable):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current.get() is not None:
+                return fn(*args, **kwargs)
+            trace = RequestTrace(kind)
+            token = _current.set(trace)
+            try:
+                result = fn(*args, **kwargs)
+                trace.set(status=getattr(result, "status", "UNKNOWN"))
+                return result
+            except Exception:
+                trace.set(status="ERROR")
+                raise
+            finally:
+                _current.reset(token)
+                trace.finish()
+        return wrapper
+    return decorate
+
+
+#####################################################
+# Service Stats: caches, pools and jobs at scrape time
+#####################################################
+class StatsCollector:
+    """
+    Prometheus collector exposing a `stats()` dict (e.g. RESULT_CACHE.stats)
+    as fitplanner_<name>_<key> metrics, read at scrape time. Keys in
+    `counters` are cumulative counts; the others are gauges.
+    """
+
+    def __init__(self, name: str, stats: Callable[[], Dict[str, float]], counters: Iterable[str] = ()):
+        self.name = name
+        self.stats = stats
+        self.counters = set(counters)
+
+    def collect(self):
+        for key, value in self.stats().items():
+            metric = f"fitplanner_{self.name}_{key}"
+            if key in self.counters:
+                yield CounterMetricFamily(metric, f"{self.name} {key}", value=value)
+            else:
+                yield GaugeMetricFamily(metric, f"{self.name} {key}", value=value)
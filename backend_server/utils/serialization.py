@@ -0,0 +1,65 @@
+import gzip
+import os
+from typing import Dict
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+try:
+    import brotli
+except ImportError:  # optional: responses fall back to gzip
+    brotli = None
+
+# Responses smaller than this (bytes) are sent uncompressed.
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", 1024))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", 5))
+
+
+#####################################################
+# JSON Responses: encoded once, optionally compressed
+#####################################################
+def accepted_encodings(request: Request) -> Dict[str, float]:
+    """Content codings of the request's Accept-Encoding header, with their q-values."""
+    accepted = {}
+    for item in request.headers.get("accept-encoding", "").split(","):
+        coding, _, params = item.partition(";")
+        coding, params = coding.strip().lower(), params.strip()
+        if not coding:
+            continue
+        q = 1.0
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def compress(body: bytes, request: Request):
+    """
+    (body, coding) for the best coding the client accepts: brotli (when
+    installed), then gzip; bodies under COMPRESS_MIN_BYTES stay as they are.
+    """
+    if len(body) < COMPRESS_MIN_BYTES:
+        return body, None
+    accepted = accepted_encodings(request)
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return brotli.compress(body, quality=BROTLI_QUALITY), "br"
+    if accepted.get("gzip", 0) > 0:
+        return gzip.compress(body, compresslevel=GZIP_LEVEL), "gzip"
+    return body, None
+
+
+def json_response(model: BaseModel, request: Request, status_code: int = 200) -> Response:
+    """
+    `model` as a JSON response, encoded by pydantic-core in one pass. FastAPI
+    sends a returned Response as is, so the model is not dumped, validated
+    against the route's response_model and JSON-encoded again; the
+    response_model still documents the schema.
+    """
+    body, coding = compress(model.model_dump_json().encode(), request)
+    headers = {"Vary": "Accept-Encoding"}
+    if coding:
+        headers["Content-Encoding"] = coding
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)
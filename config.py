@@ -6,6 +6,11 @@ RAW_DATA_DIR = os.path.join(DATA_DIR, 'raw')
 INTERIM_DATA_DIR = os.path.join(DATA_DIR, 'interim')
 PROCESSED_DATA_DIR = os.path.join(DATA_DIR, 'processed')
 FINAL_DATA_DIR = os.path.join(DATA_DIR, 'final')
+BACKEND_DIR = os.path.join(BASE_DIR, 'backend_server')
+
+# Seed of the simulated columns (cuisine_type, total_time_in_minutes) and of
+# the calorie rescaling, so re-running the pipeline reproduces its outputs
+CLEANING_SEED = int(os.environ.get("CLEANING_SEED", 2411))
 
 # Set kaggle API Key directory
 os.environ["KAGGLE_CONFIG_DIR"] = os.path.abspath(".")
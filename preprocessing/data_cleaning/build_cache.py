@@ -0,0 +1,215 @@
+import hashlib
+import inspect
+import json
+import os
+import types
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from preprocessing.data_cleaning.data_cleaning import CLEANERS, input_files
+
+# Version of the cache and manifest layout; cache entries of another
+# version are rebuilt.
+CACHE_FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+
+#####################################################
+# Fingerprints: raw inputs and cleaning code
+#####################################################
+def file_digest(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def raw_fingerprint(file_path, **load_args) -> str:
+    """Fingerprint of the files load_data(file_path, **load_args) reads: their names and contents."""
+    digest = hashlib.sha256()
+    for path in input_files(file_path, **load_args):
+        name = os.path.relpath(path, file_path) if os.path.isdir(file_path) else os.path.basename(path)
+        digest.update(f"{name}\0{file_digest(path)}\0".encode())
+    return digest.hexdigest()
+
+
+def code_fingerprint(func) -> str:
+    """
+    Fingerprint of a function's source and of the module-level functions and
+    constants it uses, recursively: editing any of them changes it.
+    """
+    module = inspect.getmodule(func)
+    parts, seen = [inspect.getsource(func)], {func.__name__}
+
+    def visit(code: types.CodeType):
+        for const in code.co_consts:
+            if isinstance(const, types.CodeType):
+                visit(const)
+        for name in code.co_names:
+            value = getattr(module, name, None)
+            if name in seen:
+                continue
+            if inspect.isfunction(value) and value.__module__ == module.__name__:
+                seen.add(name)
+                parts.append(inspect.getsource(value))
+                visit(value.__code__)
+            elif isinstance(value, (bool, int, float, str, tuple)):
+                seen.add(name)
+                parts.append(f"{name} = {value!r}")
+
+    visit(func.__code__)
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+
+def source_stamp(dataset_key: str, raw_path, load_args: Dict, seed: int) -> Dict:
+    """
+    Everything a cleaned dataset depends on: the raw files, the cleaning
+    code (and the pandas/numpy versions running it) and the seed.
+    """
+    return {
+        "format": CACHE_FORMAT_VERSION,
+        "raw": raw_fingerprint(raw_path, **load_args),
+        "cleaning": code_fingerprint(CLEANERS[dataset_key]),
+        "libraries": f"pandas {pd.__version__}, numpy {np.__version__}",
+        "seed": seed,
+    }
+
+
+#####################################################
+# Stage Cache: cleaned datasets as Parquet
+#####################################################
+class StageCache:
+    """
+    Intermediate results under `directory`, each with a <key>.json stamp of
+    what it was built from: frames as <key>.parquet (get/put), or any output
+    at path(key) that the caller writes between invalidate() and mark().
+    A lookup hits only when the stamp matches; the stamp is written last, so
+    an interrupted write misses.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def _stamp_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def valid(self, key: str, stamp: Dict) -> bool:
+        try:
+            with open(self._stamp_path(key)) as f:
+                return json.load(f) == stamp
+        except (OSError, ValueError):
+            return False
+
+    def invalidate(self, key: str) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        if os.path.exists(self._stamp_path(key)):
+            os.remove(self._stamp_path(key))
+
+    def mark(self, key: str, stamp: Dict) -> None:
+        with open(self._stamp_path(key), "w") as f:
+            json.dump(stamp, f, indent=1)
+
+    def get(self, key: str, stamp: Dict) -> Optional[pd.DataFrame]:
+        if not self.valid(key, stamp):
+            return None
+        try:
+            return pd.read_parquet(self.path(key) + ".parquet")
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key: str, stamp: Dict, df: pd.DataFrame) -> None:
+        self.invalidate(key)
+        df.to_parquet(self.path(key) + ".parquet", index=False)
+        self.mark(key, stamp)
+
+
+#####################################################
+# Final Catalog: append-only updates and the manifest
+#####################################################
+def row_keys(df: pd.DataFrame) -> pd.Series:
+    """
+    Content hash of every row (text and numbers compared by value, whatever
+    their dtypes), numbered among identical rows so duplicates stay distinct.
+    """
+    canonical = df.astype({col: float if pd.api.types.is_numeric_dtype(df[col]) else object for col in df.columns})
+    hashes = pd.util.hash_pandas_object(canonical, index=False)
+    occurrence = hashes.groupby(hashes).cumcount()
+    return hashes.astype(str) + ":" + occurrence.astype(str)
+
+
+def frame_digest(df: pd.DataFrame) -> str:
+    """Fingerprint of a frame's rows, in order (see row_keys)."""
+    return hashlib.sha256("\n".join(row_keys(df)).encode()).hexdigest()
+
+
+def update_final_csv(merged: pd.DataFrame, csv_path, cache: StageCache) -> Dict:
+    """
+    Brings the final CSV to the rows of `merged`. If the CSV is the one the
+    last build wrote (its frame is cached), rows it keeps stay in place and
+    only new or changed rows are appended; the file is rewritten only when
+    rows were removed. Otherwise it is written from scratch. Returns counts
+    of the rows "appended" and "removed", and whether it was "rewritten".
+    """
+    key = "final_" + os.path.splitext(os.path.basename(csv_path))[0]
+    previous = None
+    if os.path.exists(csv_path):
+        previous = cache.get(key, {"format": CACHE_FORMAT_VERSION, "csv": file_digest(csv_path)})
+    if previous is None or list(previous.columns) != list(merged.columns):
+        final, update = merged, {"appended": len(merged), "removed": 0, "rewritten": True}
+        final.to_csv(csv_path, index=False)
+    else:
+        previous_keys, merged_keys = row_keys(previous), row_keys(merged)
+        kept = previous_keys.isin(merged_keys).to_numpy()
+        added = merged[~merged_keys.isin(previous_keys).to_numpy()]
+        final = pd.concat([previous[kept], added], ignore_index=True)
+        update = {"appended": len(added), "removed": int((~kept).sum()), "rewritten": not kept.all()}
+        if update["rewritten"]:
+            final.to_csv(csv_path, index=False)
+        elif len(added):
+            added.to_csv(csv_path, mode="a", header=False, index=False)
+    cache.put(key, {"format": CACHE_FORMAT_VERSION, "csv": file_digest(csv_path)}, final)
+    return update
+
+
+def read_manifest(directory) -> Optional[Dict]:
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_manifest(directory, sources: Dict[str, Dict]) -> Dict:
+    """
+    Writes <directory>/manifest.json: the checksum and row count of every CSV
+    in `directory`, the stamps of the `sources` they were built from, and a
+    catalog_version that increases whenever any CSV changes. The server
+    reports the version of the CSVs it loaded (see backend_server/data).
+    """
+    files = {}
+    for name in sorted(os.listdir(directory)):
+        if name.lower().endswith(".csv"):
+            path = os.path.join(directory, name)
+            rows = sum(len(chunk) for chunk in pd.read_csv(path, usecols=[0], chunksize=1 << 20))
+            files[name] = {"sha256": file_digest(path), "rows": rows}
+    previous = read_manifest(directory)
+    version = 1
+    if previous is not None:
+        version = previous.get("catalog_version", 0) + (previous.get("files") != files)
+    manifest = {
+        "format": CACHE_FORMAT_VERSION,
+        "catalog_version": version,
+        "built_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "sources": sources,
+        "files": files,
+    }
+    with open(os.path.join(directory, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=1)
+    return manifest
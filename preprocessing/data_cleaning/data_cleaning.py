@@ -1,33 +1,95 @@
 import pandas as pd
 import os
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 
-def load_data(file_path, target_folder=None, target_filename=None):
-    if os.path.isdir(file_path):
-        if target_filename:
-            full_path = os.path.join(file_path, target_filename)
-            if not os.path.exists(full_path) or not os.path.isfile(full_path):
-                raise FileNotFoundError(f"Target file '{target_filename}' not found in {file_path}.")
-            return pd.read_csv(full_path)
-        if target_folder:
-            folder_to_use = os.path.join(file_path, target_folder)
-            if not os.path.exists(folder_to_use) or not os.path.isdir(folder_to_use):
-                raise FileNotFoundError(f"Target folder '{target_folder}' not found in {file_path}.")
-            csv_files = [os.path.join(folder_to_use, f) for f in os.listdir(folder_to_use)
-                         if os.path.isfile(os.path.join(folder_to_use, f)) and f.lower().endswith('.csv')]
-        else:
-            csv_files = []
-            for root, _, files in os.walk(file_path):
-                for f in files:
-                    if f.lower().endswith('.csv'):
-                        csv_files.append(os.path.join(root, f))
-        if not csv_files:
-            raise FileNotFoundError(f"No CSV files found in {file_path}.")
+# Recipes above this many (computed) calories are scaled down to a random
+# target in SCALED_CALORIE_RANGE.
+MAX_RECIPE_CALORIES = 800
+SCALED_CALORIE_RANGE = (600, 800)
+NON_ASCII = r"[^\x00-\x7F]+"
+
+
+def read_csvs(csv_files, workers=None) -> pd.DataFrame:
+    """
+    Reads and concatenates CSV files, several at a time (pandas' C parser
+    releases the GIL). Files are concatenated in sorted path order, so the
+    result doesn't depend on directory listing order.
+    """
+    csv_files = sorted(csv_files)
+    workers = workers or min(len(csv_files), os.cpu_count() or 1)
+    if workers <= 1:
         dfs = [pd.read_csv(csv_file) for csv_file in csv_files]
-        return pd.concat(dfs, ignore_index=True)
-    return pd.read_csv(file_path)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            dfs = list(pool.map(pd.read_csv, csv_files))
+    return pd.concat(dfs, ignore_index=True)
+
+
+def input_files(file_path, target_folder=None, target_filename=None):
+    """The CSV files load_data reads for these arguments, sorted."""
+    if not os.path.isdir(file_path):
+        return [file_path]
+    if target_filename:
+        full_path = os.path.join(file_path, target_filename)
+        if not os.path.exists(full_path) or not os.path.isfile(full_path):
+            raise FileNotFoundError(f"Target file '{target_filename}' not found in {file_path}.")
+        return [full_path]
+    if target_folder:
+        folder_to_use = os.path.join(file_path, target_folder)
+        if not os.path.exists(folder_to_use) or not os.path.isdir(folder_to_use):
+            raise FileNotFoundError(f"Target folder '{target_folder}' not found in {file_path}.")
+        csv_files = [os.path.join(folder_to_use, f) for f in os.listdir(folder_to_use)
+                     if os.path.isfile(os.path.join(folder_to_use, f)) and f.lower().endswith('.csv')]
+    else:
+        csv_files = []
+        for root, _, files in os.walk(file_path):
+            for f in files:
+                if f.lower().endswith('.csv'):
+                    csv_files.append(os.path.join(root, f))
+    if not csv_files:
+        raise FileNotFoundError(f"No CSV files found in {file_path}.")
+    return sorted(csv_files)
+
+
+def load_data(file_path, target_folder=None, target_filename=None, workers=None):
+    csv_files = input_files(file_path, target_folder, target_filename)
+    if len(csv_files) == 1:
+        return pd.read_csv(csv_files[0])
+    return read_csvs(csv_files, workers)
+
 
-def clean_keto_diet_data(df: pd.DataFrame) -> pd.DataFrame:
+def strip_non_ascii(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Removes non-ASCII characters from the text columns. Each distinct value
+    is cleaned once and mapped back by its factorized code.
+    """
+    for col in df.select_dtypes(include=["object", "string"]).columns:
+        codes, uniques = pd.factorize(df[col])
+        if not len(uniques):
+            continue  # only nulls: nothing to clean
+        cleaned = pd.Series(uniques, dtype=object).str.replace(NON_ASCII, "", regex=True).to_numpy()
+        df[col] = np.where(codes >= 0, cleaned[codes], None)
+    return df
+
+
+def scale_high_calorie_rows(df: pd.DataFrame, rng: np.random.Generator) -> pd.DataFrame:
+    """
+    Scales the macros of rows over MAX_RECIPE_CALORIES down to a random
+    target in SCALED_CALORIE_RANGE and recomputes their calories.
+    """
+    calories = df["calories"].to_numpy(dtype=float)
+    over = calories > MAX_RECIPE_CALORIES
+    factor = np.ones(len(df))
+    factor[over] = calories[over] / rng.uniform(*SCALED_CALORIE_RANGE, size=int(over.sum()))
+    for col in ("protein", "carbs", "fat"):
+        df[col] = df[col].to_numpy(dtype=float) / factor
+    df["calories"] = np.where(over, df["protein"] * 4 + df["carbs"] * 4 + df["fat"] * 9, calories)
+    return df
+
+
+def clean_keto_diet_data(df: pd.DataFrame, rng=None) -> pd.DataFrame:
+    rng = np.random.default_rng(rng)
     keep_cols = [
         "recipe",
         "category",
@@ -40,7 +102,7 @@ def clean_keto_diet_data(df: pd.DataFrame) -> pd.DataFrame:
         "protein_in_grams",
     ]
     df = df[keep_cols]
-    df = df[df["calories"] <= 40000]
+    df = df[df["calories"] <= 40000].copy()
      # Drop serving and category columns
     df = df.drop(columns=["serving", "category"], errors="ignore")
     
@@ -60,7 +122,7 @@ def clean_keto_diet_data(df: pd.DataFrame) -> pd.DataFrame:
                      'south east asian', 'italian', 'mexican', 'kosher', 'nordic', 'french',
                      'chinese', 'british', 'caribbean', 'south american', 'middle eastern', 'asian',
                      'japanese', 'world']
-    df["cuisine_type"] = np.random.choice(cuisine_choices, size=len(df))
+    df["cuisine_type"] = rng.choice(cuisine_choices, size=len(df))
     
     # Rename nutritional columns for consistency
     rename_map = {
@@ -71,7 +133,7 @@ def clean_keto_diet_data(df: pd.DataFrame) -> pd.DataFrame:
     df.rename(columns=rename_map, inplace=True)
     
     # Remove any non-ASCII characters from text columns
-    df = df.apply(lambda x: x.str.encode('ascii', 'ignore').str.decode('ascii') if x.dtype == "object" else x)
+    df = strip_non_ascii(df)
         
     # Define final desired column order.
     desired_cols = ["recipe", "diet_type", "cuisine_type", "total_time_in_minutes",
@@ -83,7 +145,8 @@ def clean_keto_diet_data(df: pd.DataFrame) -> pd.DataFrame:
     df = df[desired_cols]
     return df.reset_index(drop=True)
 
-def clean_diets_recipes_and_nutrients_data(df: pd.DataFrame) -> pd.DataFrame:
+def clean_diets_recipes_and_nutrients_data(df: pd.DataFrame, rng=None) -> pd.DataFrame:
+    rng = np.random.default_rng(rng)
     # Drop extraction day and time
     df = df.drop(columns=["Extraction_day", "Extraction_time"], errors='ignore')
     
@@ -100,10 +163,10 @@ def clean_diets_recipes_and_nutrients_data(df: pd.DataFrame) -> pd.DataFrame:
     df["calories"] = df["protein"] * 4 + df["carbs"] * 4 + df["fat"] * 9
     
     # Remove any non-ASCII characters from text columns
-    df = df.apply(lambda x: x.str.encode('ascii', 'ignore').str.decode('ascii') if x.dtype == "object" else x)
+    df = strip_non_ascii(df)
     
     # Simulate a realistic total_time (in minutes); e.g., random between 20 and 60 minutes.
-    df["total_time_in_minutes"] = np.random.randint(20, 61, size=len(df))
+    df["total_time_in_minutes"] = rng.integers(20, 61, size=len(df))
     
     # Standardize diet_type and cuisine_type if present (convert to lowercase)
     if "Diet_type" in df.columns:
@@ -113,20 +176,8 @@ def clean_diets_recipes_and_nutrients_data(df: pd.DataFrame) -> pd.DataFrame:
         df.rename(columns={"Cuisine_type": "cuisine_type"}, inplace=True)
         df["cuisine_type"] = df["cuisine_type"].str.lower()
     
-    # Scale rows with calculated calories > 800
-    def scale_row(row):
-        if row["calories"] > 800:
-            # Choose a random target calorie value between 600 and 800.
-            target = np.random.uniform(600, 800)
-            factor = row["calories"] / target  # scaling factor (>1)
-            row["protein"] = row["protein"] / factor
-            row["carbs"]   = row["carbs"] / factor
-            row["fat"]     = row["fat"] / factor
-            # Recalculate calories from scaled macronutrients.
-            row["calories"] = row["protein"] * 4 + row["carbs"] * 4 + row["fat"] * 9
-        return row
-    
-    df = df.apply(scale_row, axis=1)
+    # Scale rows with calculated calories > 800 to a random 600-800
+    df = scale_high_calorie_rows(df, rng)
     
     # Define final column order for merging.
     desired_cols = ["recipe", "diet_type", "cuisine_type", "total_time_in_minutes", "calories", "fat", "carbs", "protein"]
@@ -136,7 +187,7 @@ def clean_diets_recipes_and_nutrients_data(df: pd.DataFrame) -> pd.DataFrame:
     df = df[desired_cols]
     return df.reset_index(drop=True)
 
-def clean_best_exercises_data(df: pd.DataFrame) -> pd.DataFrame:
+def clean_best_exercises_data(df: pd.DataFrame, rng=None) -> pd.DataFrame:
     keep_cols = [
         "Name of Exercise",
         "Sets",
@@ -165,15 +216,18 @@ def clean_best_exercises_data(df: pd.DataFrame) -> pd.DataFrame:
 
     return df.reset_index(drop=True)
 
-def clean_data(df: pd.DataFrame, dataset_key: str) -> pd.DataFrame:
-    if dataset_key == "keto_diet":
-        return clean_keto_diet_data(df)
-    elif dataset_key == "diets_recipes_and_nutrients":
-        return clean_diets_recipes_and_nutrients_data(df)
-    elif dataset_key == "best_50_exercises":
-        return clean_best_exercises_data(df)
-    else:
+CLEANERS = {
+    "keto_diet": clean_keto_diet_data,
+    "diets_recipes_and_nutrients": clean_diets_recipes_and_nutrients_data,
+    "best_50_exercises": clean_best_exercises_data,
+}
+
+
+def clean_data(df: pd.DataFrame, dataset_key: str, rng=None) -> pd.DataFrame:
+    """`rng` (a seed or np.random.Generator) drives the simulated columns, so a seed reproduces the output."""
+    if dataset_key not in CLEANERS:
         raise ValueError(f"Unsupported dataset key: {dataset_key}")
+    return CLEANERS[dataset_key](df, rng)
 
 
 def print_null_summary(df: pd.DataFrame, dataset_name: str) -> None:
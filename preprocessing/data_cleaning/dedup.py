@@ -0,0 +1,170 @@
+import re
+import zlib
+from typing import Iterator, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+# Recipes are near-duplicates when they share diet_type and cuisine_type (so
+# every filter keeps its choices), their normalized names agree on at least
+# NAME_SIMILARITY of their MinHash signature (an estimate of the Jaccard
+# similarity of their 3-gram shingles), their macro vectors (fat, carbs,
+# protein grams) differ by at most MACRO_TOLERANCE of the larger one and
+# their calories by at most CALORIE_TOLERANCE of the larger (the calories
+# column is not always the macros' 4/4/9 sum).
+NAME_SIMILARITY = 0.8
+MACRO_TOLERANCE = 0.05
+CALORIE_TOLERANCE = 0.05
+# MinHash signature length, split into LSH bands of BAND_ROWS values; pairs
+# agreeing on a whole band become candidates.
+NUM_PERM = 64
+BAND_ROWS = 4
+SHINGLE_SIZE = 3
+# Buckets larger than this only pair up neighbours, bounding candidate pairs.
+MAX_BUCKET = 64
+# Recipes hashed per block, bounding the (shingles x NUM_PERM) hash matrix.
+HASH_BLOCK_ROWS = 20_000
+BLOCK_COLUMNS = ["diet_type", "cuisine_type"]
+MACRO_COLUMNS = ["fat", "carbs", "protein"]
+STOP_WORDS = {"a", "an", "and", "the", "with", "of", "in", "recipe", "recipes", "easy", "best", "simple",
+              "quick", "healthy", "homemade", "style"}
+
+
+#####################################################
+# Name Signatures: normalized shingles and MinHash
+#####################################################
+def normalize_name(name) -> str:
+    """Lowercase words of a recipe name without punctuation or STOP_WORDS, sorted so word order doesn't matter."""
+    words = re.sub(r"[^a-z0-9]+", " ", str(name).lower()).split()
+    return " ".join(sorted(w for w in words if w not in STOP_WORDS))
+
+
+def shingles(name: str) -> np.ndarray:
+    """CRC32 hashes of the distinct SHINGLE_SIZE-character substrings of a normalized name."""
+    padded = f" {name} "
+    grams = {padded[i:i + SHINGLE_SIZE] for i in range(max(len(padded) - SHINGLE_SIZE + 1, 1))}
+    return np.array(sorted(zlib.crc32(g.encode()) for g in grams), dtype=np.uint64)
+
+
+def minhash_signatures(names, seed: int = 0) -> np.ndarray:
+    """
+    (len(names), NUM_PERM) MinHash signatures of the names' shingle sets,
+    using multiply-shift hashes (a * x + b) >> 32 with odd random a.
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2**63, size=NUM_PERM, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 2**63, size=NUM_PERM, dtype=np.uint64)
+    signatures = np.empty((len(names), NUM_PERM), dtype=np.uint64)
+    for start in range(0, len(names), HASH_BLOCK_ROWS):
+        sets = [shingles(name) for name in names[start:start + HASH_BLOCK_ROWS]]
+        counts = np.array([len(s) for s in sets])
+        values = np.concatenate(sets)
+        with np.errstate(over="ignore"):
+            hashed = (values[:, None] * a + b) >> np.uint64(32)
+        signatures[start:start + len(sets)] = np.minimum.reduceat(hashed, np.cumsum(counts) - counts, axis=0)
+    return signatures
+
+
+#####################################################
+# Candidate Pairs: LSH buckets per diet/cuisine block
+#####################################################
+def candidate_pairs(signatures: np.ndarray, blocks: np.ndarray) -> np.ndarray:
+    """
+    (k, 2) row pairs of the same block that agree on some band of their
+    signatures. Buckets over MAX_BUCKET rows only pair consecutive rows.
+    """
+    pairs = []
+    for start in range(0, NUM_PERM, BAND_ROWS):
+        band = np.column_stack([blocks.astype(np.uint64), signatures[:, start:start + BAND_ROWS]])
+        _, bucket = np.unique(band, axis=0, return_inverse=True)
+        order = np.argsort(bucket.ravel(), kind="stable")
+        bucket = bucket.ravel()[order]
+        bounds = np.flatnonzero(np.diff(np.r_[-1, bucket, -1]))
+        for first, end in zip(bounds[:-1], bounds[1:]):
+            members = order[first:end]
+            if len(members) < 2:
+                continue
+            if len(members) > MAX_BUCKET:
+                pairs.append(np.column_stack([members[:-1], members[1:]]))
+            else:
+                i, j = np.triu_indices(len(members), k=1)
+                pairs.append(np.column_stack([members[i], members[j]]))
+    if not pairs:
+        return np.zeros((0, 2), dtype=np.int64)
+    return np.unique(np.sort(np.concatenate(pairs), axis=1), axis=0)
+
+
+def macro_close(macros: np.ndarray, calories: np.ndarray, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+    """
+    Whether rows i and j have macro vectors within MACRO_TOLERANCE of the
+    larger one and calories within CALORIE_TOLERANCE of the larger.
+    """
+    distance = np.linalg.norm(macros[i] - macros[j], axis=1)
+    scale = np.maximum(np.linalg.norm(macros[i], axis=1), np.linalg.norm(macros[j], axis=1))
+    calorie_gap = np.abs(calories[i] - calories[j])
+    calorie_scale = np.maximum(np.abs(calories[i]), np.abs(calories[j]))
+    return ((distance <= MACRO_TOLERANCE * scale + 1e-9)
+            & (calorie_gap <= CALORIE_TOLERANCE * calorie_scale + 1e-9))
+
+
+#####################################################
+# Dedup: canonical rows and their variants
+#####################################################
+def find_duplicates(df: pd.DataFrame, seed: int = 0) -> np.ndarray:
+    """
+    Canonical row position of every row of `df`: near-duplicates (see the
+    module constants) are grouped, and each group's canonical row is its
+    quickest recipe (then the first). Members whose macros or calories are
+    not close to their canonical row's (groups chain through pairs) stay
+    canonical.
+    """
+    n = len(df)
+    names = [normalize_name(name) for name in df["recipe"].to_numpy(dtype=object)]
+    blocks = pd.MultiIndex.from_frame(df[BLOCK_COLUMNS].astype(str)).factorize()[0]
+    macros = df[MACRO_COLUMNS].to_numpy(dtype=float)
+    calories = df["calories"].to_numpy(dtype=float)
+    signatures = minhash_signatures(names, seed)
+
+    pairs = candidate_pairs(signatures, blocks)
+    i, j = pairs[:, 0], pairs[:, 1]
+    similar = (signatures[i] == signatures[j]).mean(axis=1) >= NAME_SIMILARITY
+    keep = similar & (blocks[i] == blocks[j]) & macro_close(macros, calories, i, j)
+    graph = coo_matrix((np.ones(keep.sum()), (i[keep], j[keep])), shape=(n, n))
+    _, group = connected_components(graph, directed=False)
+
+    prep_time = df["total_time_in_minutes"].to_numpy(dtype=float)
+    order = np.lexsort((np.arange(n), np.nan_to_num(prep_time, nan=np.inf), group))
+    first = np.r_[True, group[order][1:] != group[order][:-1]]
+    canonical = np.empty(n, dtype=np.int64)
+    canonical[order] = order[first][np.cumsum(first) - 1]
+    far = ~macro_close(macros, calories, np.arange(n), canonical)
+    canonical[far] = np.flatnonzero(far)
+    return canonical
+
+
+def dedup_diets(df: pd.DataFrame, seed: int = 0) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Collapses near-duplicate recipes of a diet catalog into canonical rows.
+    Returns (the catalog without the duplicates, in its order; the variants:
+    every removed row with the "canonical" recipe it maps to, first).
+    """
+    df = df.reset_index(drop=True)
+    canonical = find_duplicates(df, seed)
+    removed = canonical != np.arange(len(df))
+    variants = df[removed].copy()
+    variants.insert(0, "canonical", df["recipe"].to_numpy(dtype=object)[canonical[removed]])
+    return df[~removed].reset_index(drop=True), variants.reset_index(drop=True)
+
+
+def dedup_stream(frames, variants_csv, seed: int = 0) -> Iterator[pd.DataFrame]:
+    """
+    dedup_diets over frames that each hold whole BLOCK_COLUMNS blocks (e.g.
+    streaming.iter_partitions by diet_type): yields every frame's kept rows
+    and writes the variants to `variants_csv` as it goes.
+    """
+    for i, frame in enumerate(frames):
+        kept, variants = dedup_diets(frame, seed)
+        variants.to_csv(variants_csv, mode="w" if i == 0 else "a", header=i == 0, index=False)
+        yield kept
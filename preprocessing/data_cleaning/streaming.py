@@ -0,0 +1,103 @@
+import os
+import shutil
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from preprocessing.data_cleaning.data_cleaning import clean_data, input_files
+
+# Column the cleaned datasets are partitioned by, when they have it
+PARTITION_COLUMN = "diet_type"
+
+
+#####################################################
+# Chunked Cleaning: raw CSVs to partitioned Parquet
+#####################################################
+def iter_chunks(file_path, chunksize: int, target_folder=None, target_filename=None) -> Iterator[pd.DataFrame]:
+    """The rows load_data would read, as DataFrames of at most `chunksize` rows, one file at a time."""
+    for csv_file in input_files(file_path, target_folder, target_filename):
+        yield from pd.read_csv(csv_file, chunksize=chunksize)
+
+
+def clean_stream(dataset_key: str, file_path, out_dir, chunksize: int, rng=None, **load_args) -> int:
+    """
+    Cleans a raw dataset `chunksize` rows at a time through the same
+    transforms as clean_data and writes it under `out_dir` as Parquet, one
+    file per chunk and partition: <PARTITION_COLUMN>=<value>/part-<chunk>.parquet
+    (or part-<chunk>.parquet without the column). One rng drives every chunk,
+    so a seed and chunksize reproduce the output. Returns the row count.
+    """
+    rng = np.random.default_rng(rng)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(out_dir)
+    rows = 0
+    for i, chunk in enumerate(iter_chunks(file_path, chunksize, **load_args)):
+        cleaned = clean_data(chunk, dataset_key, rng)
+        rows += len(cleaned)
+        if PARTITION_COLUMN not in cleaned.columns:
+            cleaned.to_parquet(os.path.join(out_dir, f"part-{i:05d}.parquet"), index=False)
+            continue
+        for value, part in cleaned.groupby(PARTITION_COLUMN, dropna=False, sort=True):
+            directory = os.path.join(out_dir, f"{PARTITION_COLUMN}={quote(str(value), safe='')}")
+            os.makedirs(directory, exist_ok=True)
+            part.to_parquet(os.path.join(directory, f"part-{i:05d}.parquet"), index=False)
+    return rows
+
+
+#####################################################
+# Reading Back: partition by partition
+#####################################################
+def partition_files(out_dir) -> Dict[Optional[str], List[str]]:
+    """Parquet files of a clean_stream output by partition directory name (None: unpartitioned), in chunk order."""
+    files: Dict[Optional[str], List[str]] = {}
+    for name in sorted(os.listdir(out_dir)):
+        path = os.path.join(out_dir, name)
+        if os.path.isdir(path):
+            files[name] = [os.path.join(path, f) for f in sorted(os.listdir(path)) if f.endswith(".parquet")]
+        elif name.endswith(".parquet"):
+            files.setdefault(None, []).append(path)
+    return files
+
+
+def stream_rows(out_dirs) -> int:
+    """Row count of clean_stream outputs, from the Parquet footers."""
+    return sum(pq.ParquetFile(f).metadata.num_rows
+               for out_dir in out_dirs for paths in partition_files(out_dir).values() for f in paths)
+
+
+def _by_partition(out_dirs) -> List[List[str]]:
+    """The Parquet files of clean_stream outputs, one list per partition value (across `out_dirs`, in order)."""
+    by_partition: Dict[Optional[str], List[str]] = {}
+    for out_dir in out_dirs:
+        for partition, paths in partition_files(out_dir).items():
+            by_partition.setdefault(partition, []).extend(paths)
+    return [by_partition[p] for p in sorted(by_partition, key=lambda p: (p is not None, p or ""))]
+
+
+def iter_cleaned(out_dirs) -> Iterator[pd.DataFrame]:
+    """
+    The chunks of clean_stream outputs, grouped by partition: every chunk of
+    one partition value (across `out_dirs`, in order) before the next, so
+    the rows sharing a PARTITION_COLUMN value come out contiguous.
+    """
+    for paths in _by_partition(out_dirs):
+        for path in paths:
+            yield pd.read_parquet(path)
+
+
+def iter_partitions(out_dirs) -> Iterator[pd.DataFrame]:
+    """Like iter_cleaned, but one DataFrame per partition value: the largest partition must fit in memory."""
+    for paths in _by_partition(out_dirs):
+        yield pd.concat([pd.read_parquet(path) for path in paths], ignore_index=True)
+
+
+def write_csv_stream(chunks, csv_path) -> int:
+    """Writes DataFrame chunks as one CSV, appending chunk by chunk; returns the row count."""
+    rows = 0
+    for i, chunk in enumerate(chunks):
+        chunk.to_csv(csv_path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+        rows += len(chunk)
+    return rows
@@ -1,14 +1,26 @@
 import os
-import kagglehub
-from pandasgui import show
 from config import RAW_DATA_DIR, KAGGLE_DATASETS
 
 def download_dataset(dataset_key="exercises"):
+    import kagglehub
+
     os.makedirs(RAW_DATA_DIR, exist_ok=True)
     dataset = KAGGLE_DATASETS[dataset_key]
     path = kagglehub.dataset_download(dataset)
     return path
 
+def cached_dataset_path(dataset_key):
+    """Latest completely downloaded version of a dataset in the kagglehub cache (None if there is none)."""
+    dataset_dir = os.path.join(RAW_DATA_DIR, "datasets", KAGGLE_DATASETS[dataset_key])
+    versions_dir = os.path.join(dataset_dir, "versions")
+    if not os.path.isdir(versions_dir):
+        return None
+    versions = [int(v) for v in os.listdir(versions_dir)
+                if v.isdigit() and os.path.exists(os.path.join(dataset_dir, f"{v}.complete"))]
+    return os.path.join(versions_dir, str(max(versions))) if versions else None
+
 def view_data(df):
-    show(df)
+    # pandasgui is optional (it pulls in PyQt)
+    from pandasgui import show
 
+    show(df)
@@ -0,0 +1,89 @@
+"""
+Times the data-cleaning pipeline (load_data + clean_data) on the raw Kaggle
+diet datasets scaled up, and reports its peak memory.
+
+Every scale writes the raw CSV `scale` times over (recipe names numbered per
+copy, so text columns keep scaling in distinct values) into --files CSVs in
+a temporary directory, which load_data reads as a multi-file dataset. For
+each scale and --workers setting:
+    load_s / clean_s      wall time of loading and of cleaning
+    load_mb / clean_mb    peak memory allocated by each stage (tracemalloc, a
+                          separate run so tracing doesn't skew the timings)
+
+Run from the repository root:
+    python -m preprocessing.scripts.bench_cleaning --scales 1 10 100 --workers 1 4 --json
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from config import CLEANING_SEED, RAW_DATA_DIR
+from preprocessing.data_cleaning.data_cleaning import clean_data, load_data
+
+DATASETS = {
+    "keto_diet": ("hamadkhan345/keto-diet-recipes-dataset/versions/2/Keto diet recipes.csv", "recipe"),
+    "diets_recipes_and_nutrients": ("thedevastator/healthy-diet-recipes-a-comprehensive-dataset/versions/2/All_Diets.csv",
+                                    "Recipe_name"),
+}
+
+
+def write_scaled(raw: pd.DataFrame, name_col: str, scale: int, files: int, directory: str) -> int:
+    """Writes `scale` numbered copies of `raw` split over `files` CSVs; returns the row count."""
+    copies = []
+    for i in range(scale):
+        copy = raw.copy()
+        copy[name_col] = copy[name_col].astype(str) + f" #{i}"
+        copies.append(copy)
+    df = pd.concat(copies, ignore_index=True)
+    for i, part in enumerate(np.array_split(np.arange(len(df)), files)):
+        df.iloc[part].to_csv(os.path.join(directory, f"part_{i:03d}.csv"), index=False)
+    return len(df)
+
+
+def run_stages(directory: str, key: str, workers: int, trace: bool) -> dict:
+    result = {}
+    df = None
+    for stage in ("load", "clean"):
+        if trace:
+            tracemalloc.start()
+        start = time.perf_counter()
+        if stage == "load":
+            df = load_data(directory, workers=workers)
+        else:
+            df = clean_data(df, key, CLEANING_SEED)
+        result[f"{stage}_s"] = round(time.perf_counter() - start, 3)
+        if trace:
+            result[f"{stage}_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+            tracemalloc.stop()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--files", type=int, default=8, help="CSVs each scaled dataset is split into")
+    parser.add_argument("--json", action="store_true", help="Emit results as JSON lines")
+    args = parser.parse_args()
+
+    for key, (path, name_col) in DATASETS.items():
+        raw = pd.read_csv(os.path.join(RAW_DATA_DIR, "datasets", path))
+        for scale in args.scales:
+            with tempfile.TemporaryDirectory() as directory:
+                rows = write_scaled(raw, name_col, scale, args.files, directory)
+                for workers in args.workers:
+                    row = {"dataset": key, "scale": scale, "rows": rows, "workers": workers}
+                    timed = run_stages(directory, key, workers, trace=False)
+                    traced = run_stages(directory, key, workers, trace=True)
+                    row.update(timed, load_mb=traced["load_mb"], clean_mb=traced["clean_mb"])
+                    print(json.dumps(row) if args.json else "  ".join(f"{k}={v}" for k, v in row.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Measures what near-duplicate dedup buys: how much the diet catalog shrinks
+and how the solve changes on the deduped catalog.
+
+The server's diet CSV is deduped (dedup_diets), reporting:
+    rows / kept / variants   catalog rows before and after, rows removed
+    dedup_s                  wall time of the dedup
+Then a few users (one per diet filter, --days horizon) are solved by a
+backend process on the original catalog and on the deduped one with its
+variants CSV (DIETS_CSV override, CSV catalogs), reporting per user:
+    meals                    meals the user's filters select
+    solve_s / status         wall time and status of solve_optimization
+    deviation_kcal           mean |daily net calories - daily target|
+    distinct_meals           distinct recipes served over the plan
+    variants_served          meals served as a restored variant
+
+Run from the repository root:
+    python -m preprocessing.scripts.bench_dedup --days 7 --json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+from config import BACKEND_DIR, CLEANING_SEED
+from preprocessing.data_cleaning.dedup import dedup_diets
+
+DIETS_CSV = os.path.join(BACKEND_DIR, "data", "processed_final_diets.csv")
+FILTERS = [
+    (["mediterranean"], ["mediterranean", "italian"]),
+    (["vegan"], ["american"]),
+    (["dash"], ["world", "american"]),
+    (["paleo"], ["american", "french"]),
+]
+
+WORKER = r"""
+import json, logging, sys, time
+logging.disable(logging.INFO)
+from data.preprocessing import select_diets
+from optimization.optimizer import solve_optimization
+from optimization.variety import canonical_names
+from utils.calculations import compute_user_metrics
+users, time_limit = json.loads(sys.argv[1]), float(sys.argv[2])
+variants = canonical_names()
+for user in users:
+    start = time.perf_counter()
+    result = solve_optimization(user, use_cache=False, solver_params={"TimeLimit": time_limit})
+    solve_s = time.perf_counter() - start
+    target = compute_user_metrics(user)["target_calorie_per_day"]
+    served = [m.recipe for day in result.plan for m in day.selected_meals]
+    print(json.dumps({
+        "diet": user["dietRestrictions"][0],
+        "meals": len(select_diets(user)),
+        "solve_s": round(solve_s, 3),
+        "status": result.status,
+        "deviation_kcal": round(sum(abs(d.total_net_calories - target) for d in result.plan)
+                                / max(len(result.plan), 1), 1),
+        "distinct_meals": len(set(served)),
+        "variants_served": sum(recipe in variants for recipe in served),
+    }), flush=True)
+"""
+
+
+def user(days: int, diets, cuisines) -> dict:
+    return {
+        "activityLevel": "Moderately Active", "age": 30, "daysWeek": 3, "dietRestrictions": diets,
+        "fitnessLevel": "intermediate", "freeTime": 3, "gender": "male",
+        "goalTargetDate": (datetime.now(timezone.utc) + timedelta(days=days, hours=-1)).isoformat(),
+        "goalType": "weight_loss", "goalWeight": 69.5, "height": 175, "mealPrepTime": 60, "mealsPerDay": 3,
+        "name": "bench", "preferredLocation": "gym", "preferredWorkoutType": "general",
+        "varietyPreferences": cuisines, "weight": 70,
+    }
+
+
+def solve(diets_csv: str, days: int, time_limit: float):
+    users = [user(days, diets, cuisines) for diets, cuisines in FILTERS]
+    env = dict(os.environ, DIETS_CSV=diets_csv, CATALOG_FORMAT="csv", PYTHONPATH=BACKEND_DIR)
+    report = subprocess.run([sys.executable, "-c", WORKER, json.dumps(users), str(time_limit)], cwd=BACKEND_DIR,
+                            env=env, capture_output=True, text=True, check=True).stdout
+    return [json.loads(line) for line in report.splitlines() if line.startswith("{")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=7, help="Plan horizon of the solved users")
+    parser.add_argument("--time-limit", type=float, default=60, help="Solver time limit (seconds) per user")
+    parser.add_argument("--json", action="store_true", help="Emit results as JSON lines")
+    args = parser.parse_args()
+
+    def emit(row):
+        print(json.dumps(row) if args.json else "  ".join(f"{k}={v}" for k, v in row.items()))
+
+    df = pd.read_csv(DIETS_CSV)
+    start = time.perf_counter()
+    kept, variants = dedup_diets(df, CLEANING_SEED)
+    emit({"stage": "dedup", "rows": len(df), "kept": len(kept), "variants": len(variants),
+          "dedup_s": round(time.perf_counter() - start, 3)})
+
+    with tempfile.TemporaryDirectory() as directory:
+        deduped_csv = os.path.join(directory, os.path.basename(DIETS_CSV))
+        kept.to_csv(deduped_csv, index=False)
+        variants.to_csv(deduped_csv.replace(".csv", "_variants.csv"), index=False)
+        for catalog, path in (("original", DIETS_CSV), ("deduped", deduped_csv)):
+            for row in solve(path, args.days, args.time_limit):
+                emit({"stage": "solve", "catalog": catalog, **row})
+
+
+if __name__ == "__main__":
+    main()
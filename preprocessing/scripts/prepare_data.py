@@ -1,52 +1,225 @@
+"""
+Downloads, cleans and merges the KAGGLE_DATASETS into the final catalog CSVs.
+
+The build is incremental: each cleaned dataset is cached in INTERIM_DATA_DIR
+(Parquet) with a stamp of its raw files, cleaning code and seed, and is only
+re-cleaned when one of them changed, so a newly added source is the only one
+processed. The final diet CSV gets only new or changed rows appended, and
+FINAL_DATA_DIR/manifest.json records its checksum and catalog version.
+
+Near-duplicate recipes (same diet and cuisine, similar names and macros, see
+preprocessing/data_cleaning/dedup.py) are collapsed into one canonical row of
+the final diet CSV; the removed rows go to processed_final_diets_variants.csv,
+which the server uses to vary repeated meals after solving. --no-dedup keeps
+every row.
+
+With --chunksize, datasets larger than memory are streamed instead: each is
+cleaned that many rows at a time into Parquet partitioned by diet_type
+(INTERIM_DATA_DIR/<key>.parts), the final diet CSV is rewritten from the
+partitions, grouping each diet type's rows, and the binary catalog is
+exported in chunks. Dedup then runs one diet type at a time.
+
+Run from the repository root:
+    python -m preprocessing.scripts.prepare_data [--offline] [--force] [--chunksize 500000] [--no-dedup]
+"""
+import argparse
 import os
+import subprocess
+import sys
+import zlib
+import numpy as np
 import pandas as pd
-from preprocessing.data_import.kaggle_import import download_dataset, view_data
-from preprocessing.data_cleaning.data_cleaning import load_data, clean_data, print_null_summary, save_processed_data
-from config import KAGGLE_DATASETS, PROCESSED_DATA_DIR, FINAL_DATA_DIR
+from preprocessing.data_import.kaggle_import import cached_dataset_path, download_dataset, view_data
+from preprocessing.data_cleaning.data_cleaning import CLEANERS, load_data, clean_data, print_null_summary, save_processed_data
+from preprocessing.data_cleaning.build_cache import (CACHE_FORMAT_VERSION, StageCache, code_fingerprint, file_digest,
+                                                     frame_digest, source_stamp, update_final_csv, write_manifest)
+from preprocessing.data_cleaning.dedup import dedup_diets, dedup_stream
+from preprocessing.data_cleaning.streaming import (clean_stream, iter_cleaned, iter_partitions, stream_rows,
+                                                   write_csv_stream)
+from config import KAGGLE_DATASETS, INTERIM_DATA_DIR, PROCESSED_DATA_DIR, FINAL_DATA_DIR, BACKEND_DIR, CLEANING_SEED
+
+# Datasets merged, in this order, into the final diet catalog
+DIET_DATASETS = ["keto_diet", "diets_recipes_and_nutrients"]
+# load_data arguments per dataset; the aggregated diets load only "All_Diets.csv"
+LOAD_ARGS = {"diets_recipes_and_nutrients": {"target_filename": "All_Diets.csv"}}
+FINAL_DIETS_CSV = "processed_final_diets.csv"
+# Rows dedup removed from FINAL_DIETS_CSV, with their canonical recipe
+VARIANTS_CSV = "processed_final_diets_variants.csv"
+
+
+def export_catalog(chunksize=None):
+    """
+    Writes the final CSVs as the server's binary catalogs (one memory-mappable
+    file per column) to FINAL_DATA_DIR/catalog; see backend_server/data/export_catalog.py.
+    """
+    out_dir = os.path.join(FINAL_DATA_DIR, "catalog")
+    command = [sys.executable, "-m", "data.export_catalog", "--csv-dir", FINAL_DATA_DIR, "--out", out_dir]
+    if chunksize:
+        command += ["--chunksize", str(chunksize)]
+    subprocess.run(command, cwd=BACKEND_DIR, check=True)
+
+
+def raw_dataset_path(key, offline):
+    if not offline:
+        return download_dataset(key)
+    path = cached_dataset_path(key)
+    if path is None:
+        raise FileNotFoundError(f"Dataset '{key}' has not been downloaded yet; run without --offline.")
+    return path
+
+
+def dataset_rng(key):
+    # One stream per dataset, so adding a dataset doesn't change the others
+    return np.random.default_rng([CLEANING_SEED, zlib.crc32(key.encode())])
+
+
+def clean_dataset(key, raw_file_path, load_args):
+    df_raw = load_data(raw_file_path, **load_args)
+    print_null_summary(df_raw, f"{key} Raw Data")
+
+    df_clean = clean_data(df_raw, key, dataset_rng(key))
+    print_null_summary(df_clean, f"{key} Clean Data")
+
+    output_file = os.path.join(PROCESSED_DATA_DIR, f"processed_{key}.csv")
+    save_processed_data(df_clean, output_file)
+    return df_clean
+
+
+def dedup_stamp():
+    return {"format": CACHE_FORMAT_VERSION, "dedup": code_fingerprint(dedup_diets), "seed": CLEANING_SEED}
+
+
+def dedup_final(merged, cache, no_dedup):
+    """
+    The merged diet rows without their near-duplicates, writing the variants
+    CSV (or removing it with `no_dedup`). Cached by the rows and the dedup code.
+    """
+    variants_file = os.path.join(FINAL_DATA_DIR, VARIANTS_CSV)
+    if no_dedup:
+        if os.path.exists(variants_file):
+            os.remove(variants_file)
+        return merged
+    stamp = dict(dedup_stamp(), rows=frame_digest(merged))
+    kept, variants = cache.get("dedup_kept", stamp), cache.get("dedup_variants", stamp)
+    if kept is None or variants is None:
+        kept, variants = dedup_diets(merged, CLEANING_SEED)
+        cache.put("dedup_kept", stamp, kept)
+        cache.put("dedup_variants", stamp, variants)
+    variants.to_csv(variants_file, index=False)
+    print(f"Dedup kept {len(kept)} of {len(merged)} diet rows; {len(variants)} variants in {variants_file}")
+    return kept
+
+
+def build_streaming(args, cache):
+    """The --chunksize build: chunked cleaning to partitioned Parquet, and streamed merge and export."""
+    diet_parts, sources = [], {}
+    for key in KAGGLE_DATASETS:
+        print(f"Processing dataset for key: {key}")
+        if key not in CLEANERS:
+            print(f"Skipping cleaning for dataset key '{key}': no cleaning function")
+            continue
+        raw_file_path = raw_dataset_path(key, args.offline)
+        load_args = LOAD_ARGS.get(key, {})
+        stamp = dict(source_stamp(key, raw_file_path, load_args, CLEANING_SEED), chunksize=args.chunksize)
+
+        parts_key = f"{key}.parts"
+        out_dir = cache.path(parts_key)
+        if args.force or not cache.valid(parts_key, stamp):
+            cache.invalidate(parts_key)
+            rows = clean_stream(key, raw_file_path, out_dir, args.chunksize, dataset_rng(key), **load_args)
+            write_csv_stream(iter_cleaned([out_dir]), os.path.join(PROCESSED_DATA_DIR, f"processed_{key}.csv"))
+            cache.mark(parts_key, stamp)
+            print(f"Finished processing dataset '{key}': {rows} rows in {out_dir}\n")
+        else:
+            print(f"Dataset '{key}' is unchanged, using the cached clean data\n")
+        sources[key] = dict(stamp, rows=stream_rows([out_dir]))
+        if key in DIET_DATASETS:
+            diet_parts.append(out_dir)
+
+    if len(diet_parts) < len(DIET_DATASETS):
+        print("Not all diet datasets were processed. Final merge skipped.")
+        return
+    os.makedirs(FINAL_DATA_DIR, exist_ok=True)
+    final_output_file = os.path.join(FINAL_DATA_DIR, FINAL_DIETS_CSV)
+    variants_file = os.path.join(FINAL_DATA_DIR, VARIANTS_CSV)
+    final_stamp = {"sources": {key: sources[key] for key in DIET_DATASETS},
+                   "dedup": None if args.no_dedup else dedup_stamp()}
+    if (not args.force and os.path.exists(final_output_file)
+            and cache.valid("final_diets.parts", dict(final_stamp, csv=file_digest(final_output_file)))):
+        print(f"Final merged diet dataset {final_output_file} is up to date")
+        write_manifest(FINAL_DATA_DIR, sources)
+        return
+    cache.invalidate("final_diets.parts")
+    if args.no_dedup:
+        if os.path.exists(variants_file):
+            os.remove(variants_file)
+        rows = write_csv_stream(iter_cleaned(diet_parts), final_output_file)
+    else:
+        # Dedup blocks never span diet types, so each partition is deduped on its own.
+        rows = write_csv_stream(dedup_stream(iter_partitions(diet_parts), variants_file, CLEANING_SEED),
+                                final_output_file)
+    cache.mark("final_diets.parts", dict(final_stamp, csv=file_digest(final_output_file)))
+    manifest = write_manifest(FINAL_DATA_DIR, sources)
+    print(f"Final merged diet dataset saved to {final_output_file}: {rows} rows; "
+          f"catalog version {manifest['catalog_version']}")
+    export_catalog(args.chunksize)
 
 
 def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--offline", action="store_true",
+                        help="Use the datasets already downloaded instead of checking Kaggle")
+    parser.add_argument("--force", action="store_true", help="Re-clean every dataset, ignoring the cache")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="Stream every dataset this many rows at a time (datasets larger than memory)")
+    parser.add_argument("--no-dedup", action="store_true", help="Keep near-duplicate recipes in the final catalog")
+    args = parser.parse_args()
     os.makedirs(PROCESSED_DATA_DIR, exist_ok=True)
-    
+    cache = StageCache(INTERIM_DATA_DIR)
+    if args.chunksize:
+        build_streaming(args, cache)
+        return
+
     # Dictionary to collect processed diet datasets for later merging.
     diet_dfs = {}
-    
+    # Stamps of the cleaned datasets, recorded in the manifest.
+    sources = {}
+
     for key in KAGGLE_DATASETS:
         print(f"Processing dataset for key: {key}")
-        raw_file_path = download_dataset(key)
-        
-        if key == "diets_recipes_and_nutrients":
-            # For the aggregated diets, load only the file "All_Diets.csv"
-            df_raw = load_data(raw_file_path, target_filename="All_Diets.csv")
-        else:
-            df_raw = load_data(raw_file_path)
-        
-        print_null_summary(df_raw, f"{key} Raw Data")
-        
-        try:
-            df_clean = clean_data(df_raw, key)
-        except ValueError as e:
-            print(f"Skipping cleaning for dataset key '{key}': {e}")
+        if key not in CLEANERS:
+            print(f"Skipping cleaning for dataset key '{key}': no cleaning function")
             continue
-        
-        print_null_summary(df_clean, f"{key} Clean Data")
-        
-        output_file = os.path.join(PROCESSED_DATA_DIR, f"processed_{key}.csv")
-        save_processed_data(df_clean, output_file)
-        print(f"Finished processing dataset '{key}'\n")
-        
+        raw_file_path = raw_dataset_path(key, args.offline)
+        load_args = LOAD_ARGS.get(key, {})
+        stamp = source_stamp(key, raw_file_path, load_args, CLEANING_SEED)
+
+        df_clean = None if args.force else cache.get(key, stamp)
+        if df_clean is None:
+            df_clean = clean_dataset(key, raw_file_path, load_args)
+            cache.put(key, stamp, df_clean)
+            print(f"Finished processing dataset '{key}'\n")
+        else:
+            print(f"Dataset '{key}' is unchanged, using the cached clean data\n")
+        sources[key] = dict(stamp, rows=len(df_clean))
+
         # If this dataset is one of our diets of interest, store it.
-        if key in ["keto_diet", "diets_recipes_and_nutrients"]:
+        if key in DIET_DATASETS:
             diet_dfs[key] = df_clean
 
-    # Final merge step: merge the two diet datasets (if both are available) using the same headers.
-    if "keto_diet" in diet_dfs and "diets_recipes_and_nutrients" in diet_dfs:
-        merged_df = pd.concat([diet_dfs["keto_diet"], diet_dfs["diets_recipes_and_nutrients"]], ignore_index=True)
+    # Final merge step: merge the diet datasets (if all are available) using the same headers.
+    if all(key in diet_dfs for key in DIET_DATASETS):
+        merged_df = pd.concat([diet_dfs[key] for key in DIET_DATASETS], ignore_index=True)
         # Ensure the final directory exists:
         os.makedirs(FINAL_DATA_DIR, exist_ok=True)
-        final_output_file = os.path.join(FINAL_DATA_DIR, "processed_final_diets.csv")
-        merged_df.to_csv(final_output_file, index=False)
-        print(f"Final merged diet dataset saved to {final_output_file}")
+        merged_df = dedup_final(merged_df, cache, args.no_dedup)
+        final_output_file = os.path.join(FINAL_DATA_DIR, FINAL_DIETS_CSV)
+        update = update_final_csv(merged_df, final_output_file, cache)
+        manifest = write_manifest(FINAL_DATA_DIR, sources)
+        print(f"Final merged diet dataset {final_output_file}: {update['appended']} rows appended, "
+              f"{update['removed']} removed; catalog version {manifest['catalog_version']}")
+        if update["appended"] or update["removed"] or not os.path.isdir(os.path.join(FINAL_DATA_DIR, "catalog")):
+            export_catalog()
     else:
         print("Not all diet datasets were processed. Final merge skipped.")
 